@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Benchmark capture_stats-style counting on Session and on PacketBatch.
+
+The packets from testdata/test1.pcap are replicated into a large pcapng file,
+which is then parsed into a Session, and into a columnar PacketBatch. Parsing
+and counting are timed separately.
+"""
+
+import collections
+import os
+import tempfile
+import time
+
+import click
+import replicate
+
+import usbmon.pcapng
+
+
+@click.command()
+@click.option(
+    "--count",
+    default=200_000,
+    show_default=True,
+    help="Number of packets to write in the replicated capture.",
+)
+@click.option(
+    "--jobs",
+    default=1,
+    show_default=True,
+    help="Number of worker processes to parse the capture with.",
+)
+def main(*, count: int, jobs: int) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        capture_path = os.path.join(temp_dir, "replicated.pcap")
+        replicate.write_replicated_capture(capture_path, count)
+
+        start = time.perf_counter()
+        session = usbmon.pcapng.parse_file(capture_path, jobs=jobs)
+        parsed = time.perf_counter()
+        direction_counter = collections.Counter(packet.direction for packet in session)
+        address_counter = collections.Counter(packet.address for packet in session)
+        xfer_type_counter = collections.Counter(packet.xfer_type for packet in session)
+        counted = time.perf_counter()
+        print(
+            f"Session:      parse {parsed - start:8.3f}s"
+            f"  count {counted - parsed:8.3f}s"
+        )
+
+        start = time.perf_counter()
+        packet_batch = usbmon.pcapng.parse_file_batch(capture_path, jobs=jobs)
+        parsed = time.perf_counter()
+        assert packet_batch.count_by_direction() == direction_counter
+        assert packet_batch.count_by_address() == address_counter
+        assert packet_batch.count_by_xfer_type() == xfer_type_counter
+        counted = time.perf_counter()
+        print(
+            f"PacketBatch:  parse {parsed - start:8.3f}s"
+            f"  count {counted - parsed:8.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
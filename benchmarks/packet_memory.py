@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Benchmark the memory used by decoded packets.
+
+The packets from testdata/test1.pcap are replicated and decoded, and the memory
+allocated for them is reported per packet. For comparison, the same fields are
+also copied into objects carrying a per-instance __dict__, the way packets were
+laid out before they used __slots__.
+"""
+
+import tracemalloc
+from typing import Callable, List
+
+import click
+import replicate
+
+from usbmon.capture import usbmon_mmap
+
+
+class _DictPacket:
+    """Stand-in for the previous, __dict__-based, packet layout."""
+
+
+def _all_slots(cls: type) -> List[str]:
+    return [slot for klass in cls.__mro__ for slot in getattr(klass, "__slots__", ())]
+
+
+def _measure(count: int, build: Callable[[int], object]) -> float:
+    """Return the bytes allocated per object by calling build() count times."""
+    tracemalloc.start()
+    objects = [build(index) for index in range(count)]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(objects) == count
+    return allocated / count
+
+
+@click.command()
+@click.option(
+    "--count",
+    default=100_000,
+    show_default=True,
+    help="Number of packets to decode.",
+)
+def main(*, count: int) -> None:
+    raw_packets = replicate.replicate_packets(count)
+    slots = _all_slots(usbmon_mmap.UsbmonMmapPacket)
+
+    def slotted_packet(index: int) -> object:
+        return usbmon_mmap.UsbmonMmapPacket("<", raw_packets[index])
+
+    def dict_packet(index: int) -> object:
+        packet = usbmon_mmap.UsbmonMmapPacket("<", raw_packets[index])
+        dict_packet = _DictPacket()
+        for slot in slots:
+            setattr(dict_packet, slot, getattr(packet, slot))
+        return dict_packet
+
+    print(f"__dict__ layout:   {_measure(count, dict_packet):8.1f} bytes/packet")
+    print(f"__slots__ layout:  {_measure(count, slotted_packet):8.1f} bytes/packet")
+
+
+if __name__ == "__main__":
+    main()
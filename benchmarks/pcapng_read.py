@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Benchmark the native pcapng reader against python-pcapng.
+
+The packets from testdata/test1.pcap are replicated into a large pcapng file,
+which is then read with either reader, decoding the usbmon packets without
+pairing them into a Session.
+"""
+
+import os
+import tempfile
+import time
+
+import click
+import replicate
+
+import usbmon.pcapng
+
+
+@click.command()
+@click.option(
+    "--count",
+    default=200_000,
+    show_default=True,
+    help="Number of packets to write in the replicated capture.",
+)
+def main(*, count: int) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        capture_path = os.path.join(temp_dir, "replicated.pcap")
+        replicate.write_replicated_capture(capture_path, count)
+
+        for name, native in (("python-pcapng", False), ("native", True)):
+            start = time.perf_counter()
+            with open(capture_path, "rb") as capture_file:
+                for _ in usbmon.pcapng.read_packets(capture_file, native=native):
+                    pass
+            elapsed = time.perf_counter() - start
+            print(f"{name:14} {elapsed:8.3f}s  {count / elapsed:12,.0f} packets/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Helpers to build large captures for benchmarks out of the test data."""
+
+import os
+import struct
+from typing import List, Tuple
+
+TEST1_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "testdata", "test1.pcap"
+)
+
+
+def _split_test1() -> Tuple[bytes, List[bytes], List[bytes]]:
+    """Return the header blocks, packet blocks and packet data of test1.pcap."""
+    with open(TEST1_PATH, "rb") as test1_file:
+        original = test1_file.read()
+
+    headers = b""
+    packets: List[bytes] = []
+    packet_blocks: List[bytes] = []
+    offset = 0
+    while offset < len(original):
+        block_type, block_length = struct.unpack_from("<II", original, offset)
+        block_end = offset + block_length
+        block = original[offset:block_end]
+        if block_type == 0x00000006:  # Enhanced Packet Block
+            (captured_length,) = struct.unpack_from("<I", block, 20)
+            packet_end = 28 + captured_length
+            packets.append(block[28:packet_end])
+            packet_blocks.append(block)
+        elif not packet_blocks:
+            headers += block
+        offset = block_end
+
+    return headers, packet_blocks, packets
+
+
+def replicate_packets(count: int) -> List[bytes]:
+    """Return count raw usbmon packets, replicated from test1.pcap."""
+    _, _, packets = _split_test1()
+    return [packets[index % len(packets)] for index in range(count)]
+
+
+def write_replicated_capture(path: str, count: int) -> List[bytes]:
+    """Write a pcapng file with count packets, replicated from test1.pcap."""
+    headers, packet_blocks, _ = _split_test1()
+    with open(path, "wb") as capture_file:
+        capture_file.write(headers)
+        for index in range(count):
+            capture_file.write(packet_blocks[index % len(packet_blocks)])
+
+    return replicate_packets(count)
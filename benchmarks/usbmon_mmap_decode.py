@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Benchmark the usbmon mmap packet decoder.
+
+The packets from testdata/test1.pcap are replicated into a large pcapng file,
+and then decoded both with the construct-based structure the decoder used
+originally, and with the current usbmon.capture.usbmon_mmap implementation.
+"""
+
+import os
+import tempfile
+import time
+
+import click
+import construct
+import replicate
+
+import usbmon.pcapng
+from usbmon import constants
+from usbmon.capture import usbmon_mmap
+
+
+def _legacy_structure(endianness):
+    """The construct.Struct() that the decoder rebuilt for each packet."""
+    return construct.Struct(
+        id=construct.FormatField(endianness, "Q"),
+        type=construct.Mapping(
+            construct.Byte, {e: ord(e.value) for e in constants.PacketType}
+        ),
+        xfer_type=construct.Mapping(
+            construct.Byte, {e: e.value for e in constants.XferType}
+        ),
+        epnum=construct.Byte,
+        devnum=construct.Byte,
+        busnum=construct.FormatField(endianness, "H"),
+        flag_setup=construct.Byte,
+        flag_data=construct.PaddedString(1, "ascii"),
+        ts_sec=construct.FormatField(endianness, "q"),
+        ts_usec=construct.FormatField(endianness, "l"),
+        status=construct.FormatField(endianness, "l"),
+        length=construct.FormatField(endianness, "L"),
+        len_cap=construct.FormatField(endianness, "L"),
+        s=construct.Union(
+            0,
+            setup=construct.Bytes(8),
+            iso=construct.Struct(
+                error_count=construct.FormatField(endianness, "l"),
+                numdesc=construct.FormatField(endianness, "l"),
+            ),
+        ),
+        interval=construct.FormatField(endianness, "l"),
+        start_frame=construct.FormatField(endianness, "l"),
+        xfer_flags=construct.FormatField(endianness, "L"),
+        ndesc=construct.FormatField(endianness, "L"),
+        payload=construct.GreedyBytes,
+    )
+
+
+def _rate(count: int, elapsed: float) -> str:
+    return f"{count / elapsed:12,.0f} packets/s ({elapsed:.3f}s)"
+
+
+@click.command()
+@click.option(
+    "--count",
+    default=200_000,
+    show_default=True,
+    help="Number of packets to write in the replicated capture.",
+)
+def main(*, count: int) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        capture_path = os.path.join(temp_dir, "replicated.pcap")
+        raw_packets = replicate.write_replicated_capture(capture_path, count)
+        print(
+            f"Replicated capture: {count} packets, "
+            f"{os.path.getsize(capture_path):,} bytes"
+        )
+
+        start = time.perf_counter()
+        for raw_packet in raw_packets:
+            _legacy_structure("<").parse(raw_packet)
+        print(f"construct decode:      {_rate(count, time.perf_counter() - start)}")
+
+        start = time.perf_counter()
+        for raw_packet in raw_packets:
+            usbmon_mmap.UsbmonMmapPacket("<", raw_packet)
+        print(f"UsbmonMmapPacket:      {_rate(count, time.perf_counter() - start)}")
+
+        start = time.perf_counter()
+        usbmon.pcapng.parse_file(capture_path)
+        print(f"pcapng.parse_file():   {_rate(count, time.perf_counter() - start)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import dataclasses
+from typing import Callable, Dict
 
 
 @dataclasses.dataclass(frozen=True, eq=True, order=True)
@@ -28,6 +29,10 @@ class DeviceAddress:
         bus, device = address.split(".", 1)
         return cls(int(bus), int(device))
 
+    @property
+    def key(self) -> int:
+        return pack(self.bus, self.device)
+
     def __str__(self) -> str:
         return f"{self.bus}.{self.device}"
 
@@ -43,9 +48,73 @@ class EndpointAddress:
         bus, device, endpoint = address.split(".", 2)
         return cls(int(bus), int(device), int(endpoint))
 
+    @property
+    def key(self) -> int:
+        return pack(self.bus, self.device, self.endpoint)
+
     @property
     def device_address(self) -> DeviceAddress:
-        return DeviceAddress(self.bus, self.device)
+        return device_from_key(self.key)
 
     def __str__(self) -> str:
         return f"{self.bus}.{self.device}.{self.endpoint}"
+
+
+# Addresses are packed into a single integer as bus << 16 | device << 8 |
+# endpoint, which is cheaper to build, hash and compare than the dataclasses,
+# for the per-packet work. Device keys have a zero endpoint, so that the device
+# key of an endpoint is found by masking out the endpoint.
+_ENDPOINT_MASK = 0xFF
+
+# Canonical addresses for each key, so that the same address objects are handed
+# out for all the packets, rather than new ones.
+_ENDPOINT_ADDRESSES: Dict[int, EndpointAddress] = {}
+_DEVICE_ADDRESSES: Dict[int, DeviceAddress] = {}
+
+
+def pack(bus: int, device: int, endpoint: int = 0) -> int:
+    """Pack an address into an integer key."""
+    return bus << 16 | device << 8 | endpoint
+
+
+def device_key(key: int) -> int:
+    """Return the key of the device an endpoint key belongs to."""
+    return key & ~_ENDPOINT_MASK
+
+
+def endpoint_from_key(key: int) -> EndpointAddress:
+    """Return the canonical endpoint address for a key."""
+    address = _ENDPOINT_ADDRESSES.get(key)
+    if address is None:
+        address = _ENDPOINT_ADDRESSES.setdefault(
+            key, EndpointAddress(key >> 16, (key >> 8) & 0xFF, key & _ENDPOINT_MASK)
+        )
+    return address
+
+
+def device_from_key(key: int) -> DeviceAddress:
+    """Return the canonical device address for a key, or an endpoint key."""
+    key = device_key(key)
+    address = _DEVICE_ADDRESSES.get(key)
+    if address is None:
+        address = _DEVICE_ADDRESSES.setdefault(
+            key, DeviceAddress(key >> 16, (key >> 8) & 0xFF)
+        )
+    return address
+
+
+def prefix_matcher(prefix: str) -> Callable[[int], bool]:
+    """Return a check of whether an endpoint key's address starts with prefix.
+
+    The result is remembered for each key, rather than formatting the address
+    of every packet.
+    """
+    matches: Dict[int, bool] = {}
+
+    def matcher(key: int) -> bool:
+        result = matches.get(key)
+        if result is None:
+            result = matches[key] = str(endpoint_from_key(key)).startswith(prefix)
+        return result
+
+    return matcher
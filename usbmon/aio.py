@@ -0,0 +1,337 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Asynchronous iteration over captured packets, for asyncio applications.
+
+Decoding (and pairing) runs in an executor, off the event loop, and is handed
+over to the loop in batches of packets. At most queue_size batches are decoded
+ahead of the consumer, so that a slow consumer holds back the decoding rather
+than letting it buffer the whole capture:
+
+    async for first, second in aio.pairs("capture.pcapng"):
+        ...
+
+Since each capture is decoded by its own executor thread, a single event loop
+can watch several captures concurrently.
+"""
+
+import asyncio
+import concurrent.futures
+import io
+import os
+import threading
+import typing
+from typing import AsyncIterator, BinaryIO, Callable, Iterator, List, Optional
+
+from usbmon import capture_session, filters, packet, pcapng, tail
+
+if typing.TYPE_CHECKING:
+    # Only imported when reading live captures, which are Linux-specific.
+    from usbmon.capture import live
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_QUEUE_SIZE = 4
+
+# Anything packets can be read from: the path of a capture file, a capture file
+# opened in binary mode, an asyncio stream, or a live capture.
+Source = typing.Union[
+    str, "os.PathLike[str]", BinaryIO, asyncio.StreamReader, "live.RingSource"
+]
+
+_T = typing.TypeVar("_T")
+
+# Put in the queue after the last batch.
+_END = object()
+
+
+class _AsyncStreamReader(io.RawIOBase):
+    """A blocking stream reading from an asyncio stream, from another thread."""
+
+    def __init__(self, stream: asyncio.StreamReader, loop: asyncio.AbstractEventLoop):
+        super().__init__()
+        self._stream = stream
+        self._loop = loop
+        self._read: Optional[concurrent.futures.Future] = None
+        self._cancelled = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._cancelled:
+            return 0
+        self._read = asyncio.run_coroutine_threadsafe(
+            self._stream.read(len(buffer)), self._loop
+        )
+        try:
+            data = self._read.result()
+        except concurrent.futures.CancelledError:
+            return 0
+        buffer[: len(data)] = data
+        return len(data)
+
+    def cancel(self) -> None:
+        """Stop reading, as the consumer is gone."""
+        self._cancelled = True
+        if self._read is not None:
+            self._read.cancel()
+
+
+class _Reader(typing.NamedTuple):
+    """How to read the packets of a source, and stop doing so early."""
+
+    read: Callable[[], Iterator[packet.Packet]]
+    cancel: Optional[Callable[[], None]]
+
+
+def _follow(
+    stream: BinaryIO,
+    packet_filter: Optional[filters.PacketFilter],
+    owned: bool,
+) -> _Reader:
+    """Read a capture as it grows, until the consumer stops following it."""
+    followed: tail.FollowedStream
+    if isinstance(stream, tail.FollowedStream):
+        # Already followed, for example with an idle timeout.
+        followed = stream
+    else:
+        followed = tail.FollowedStream(stream)
+
+    def read_followed() -> Iterator[packet.Packet]:
+        try:
+            yield from pcapng.read_packets(
+                typing.cast(BinaryIO, followed),
+                packet_filter=packet_filter,
+                follow=True,
+            )
+        finally:
+            if followed is not stream:
+                followed.close()
+            if owned:
+                stream.close()
+
+    return _Reader(read_followed, followed.stop)
+
+
+def _open_source(
+    source: Source,
+    loop: asyncio.AbstractEventLoop,
+    packet_filter: Optional[filters.PacketFilter],
+    follow: bool,
+) -> _Reader:
+    from usbmon.capture import live
+
+    if isinstance(source, live.RingSource):
+        return _Reader(lambda: live.read_packets(source, packet_filter), None)
+    if isinstance(source, asyncio.StreamReader):
+        raw = _AsyncStreamReader(source, loop)
+        stream = typing.cast(BinaryIO, io.BufferedReader(raw))
+        return _Reader(
+            lambda: pcapng.read_packets(stream, packet_filter=packet_filter),
+            raw.cancel,
+        )
+    if isinstance(source, (str, os.PathLike)):
+        if follow:
+            # Opened right away, so that the consumer can stop following the file
+            # even before it is first read.
+            return _follow(open(source, "rb"), packet_filter, owned=True)
+        path = source
+
+        def read_path() -> Iterator[packet.Packet]:
+            with open(path, "rb") as capture_file:
+                yield from pcapng.read_packets(
+                    capture_file, packet_filter=packet_filter
+                )
+
+        return _Reader(read_path, None)
+    binary_stream = source
+    if follow:
+        return _follow(binary_stream, packet_filter, owned=False)
+    return _Reader(
+        lambda: pcapng.read_packets(binary_stream, packet_filter=packet_filter), None
+    )
+
+
+def _produce(
+    items: Iterator[_T],
+    batch_size: int,
+    queue: "asyncio.Queue[object]",
+    loop: asyncio.AbstractEventLoop,
+    slots: threading.Semaphore,
+    stop: threading.Event,
+) -> None:
+    """Hand the items over to the event loop in batches, from an executor."""
+
+    def put(item: object) -> bool:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop was closed, with nothing left to consume the items.
+            return False
+        return True
+
+    def put_batch(batch: List[_T]) -> bool:
+        slots.acquire()
+        return not stop.is_set() and put(batch)
+
+    # Whatever happens, the consumer is told that no more batches are coming,
+    # so that it does not wait forever.
+    end: object = _END
+    try:
+        batch: List[_T] = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                if not put_batch(batch):
+                    return
+                batch = []
+        if batch and not put_batch(batch):
+            return
+    except Exception as error:
+        end = error
+    except BaseException as error:
+        end = RuntimeError(f"Reading packets was interrupted: {error!r}")
+        end.__cause__ = error
+        raise
+    finally:
+        put(end)
+
+
+async def _iterate(
+    items: Callable[[], Iterator[_T]],
+    cancel: Optional[Callable[[], None]],
+    batch_size: int,
+    queue_size: int,
+    executor: Optional[concurrent.futures.Executor],
+) -> AsyncIterator[_T]:
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[object]" = asyncio.Queue()
+    # Bounds the batches decoded ahead of the consumer.
+    slots = threading.Semaphore(queue_size)
+    stop = threading.Event()
+
+    def produce() -> None:
+        _produce(items(), batch_size, queue, loop, slots, stop)
+
+    loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is _END:
+                return
+            if isinstance(batch, Exception):
+                raise batch
+            slots.release()
+            for item in typing.cast(List[_T], batch):
+                yield item
+    finally:
+        # If the consumer stopped early, let the producer notice it as soon as
+        # it hands over its next batch.
+        stop.set()
+        slots.release()
+        if cancel is not None:
+            cancel()
+
+
+def _default_batch_size(source: Source, follow: bool) -> int:
+    from usbmon.capture import live
+
+    # Live sources and followed captures hand packets over as soon as they are
+    # captured, rather than waiting for a batch worth of them.
+    if follow or isinstance(source, (live.RingSource, asyncio.StreamReader)):
+        return 1
+    return DEFAULT_BATCH_SIZE
+
+
+async def packets(
+    source: Source,
+    packet_filter: Optional[filters.PacketFilter] = None,
+    *,
+    follow: bool = False,
+    batch_size: Optional[int] = None,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> AsyncIterator[packet.Packet]:
+    """Iterate asynchronously over the packets of a capture, in capture order.
+
+    Args:
+      source: The capture to read, either the path of a pcapng or libpcap file,
+        a file opened in binary mode, an asyncio stream providing the content
+        of such a file, or a live capture source.
+      packet_filter: If provided, only yield packets matching it.
+      follow: Whether to keep waiting for packets appended to capture files,
+        as with usbmon.pcapng.read_packets().
+      batch_size: How many packets to decode before handing them over to the
+        event loop. By default, packets from live captures, asyncio streams and
+        followed captures are handed over one at a time, and others in
+        batches.
+      queue_size: How many batches to decode ahead of the consumer.
+      executor: The executor to decode packets in, by default the event loop's.
+        Each capture being iterated over occupies one of its workers.
+    """
+    reader = _open_source(source, asyncio.get_running_loop(), packet_filter, follow)
+    async for decoded_packet in _iterate(
+        reader.read,
+        reader.cancel,
+        batch_size or _default_batch_size(source, follow),
+        queue_size,
+        executor,
+    ):
+        yield decoded_packet
+
+
+async def pairs(
+    source: Source,
+    retag_urbs: bool = True,
+    packet_filter: Optional[filters.PacketFilter] = None,
+    *,
+    follow: bool = False,
+    batch_size: Optional[int] = None,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    executor: Optional[concurrent.futures.Executor] = None,
+) -> AsyncIterator[packet.PacketPair]:
+    """Iterate asynchronously over the submission/callback pairs of a capture.
+
+    Pairs are matched in the executor as well, as with
+    usbmon.capture_session.Session.stream(): each pair is yielded once it
+    completes, and the unmatched packets at the end of the capture.
+
+    Args:
+      source: The capture to read, as for packets().
+      retag_urbs: Whether to replace URB tags with sequence numbers.
+      packet_filter: If provided, only pair packets matching it.
+      follow: Whether to keep waiting for packets appended to capture files.
+      batch_size: How many pairs to match before handing them over to the
+        event loop, as for packets().
+      queue_size: How many batches to match ahead of the consumer.
+      executor: The executor to decode and match packets in.
+    """
+    reader = _open_source(source, asyncio.get_running_loop(), packet_filter, follow)
+
+    def read_pairs() -> Iterator[packet.PacketPair]:
+        session = capture_session.Session(retag_urbs=retag_urbs)
+        return session.stream(reader.read())
+
+    async for pair in _iterate(
+        read_pairs,
+        reader.cancel,
+        batch_size or _default_batch_size(source, follow),
+        queue_size,
+        executor,
+    ):
+        yield pair
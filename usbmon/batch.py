@@ -0,0 +1,375 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Columnar representation of usbmon captures, backed by NumPy arrays.
+
+This module requires NumPy, which is an optional dependency of usbmon-tools
+(install the "batch" extra to pull it in.)
+"""
+
+import array
+import mmap
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy
+
+from usbmon import addresses, capture_session, constants, packet
+from usbmon.capture import usbmon_mmap
+
+_HEADER_SIZE = 64
+_NO_PACKET = -1
+
+
+def _header_dtype(endianness: str) -> numpy.dtype:
+    """Return a NumPy dtype matching the 64-byte usbmon mmap header."""
+    return numpy.dtype(
+        [
+            ("tag", endianness + "u8"),
+            ("type", "u1"),
+            ("xfer_type", "u1"),
+            ("epnum", "u1"),
+            ("devnum", "u1"),
+            ("busnum", endianness + "u2"),
+            ("flag_setup", "u1"),
+            ("flag_data", "S1"),
+            ("ts_sec", endianness + "i8"),
+            ("ts_usec", endianness + "i4"),
+            ("status", endianness + "i4"),
+            ("length", endianness + "u4"),
+            ("len_cap", endianness + "u4"),
+            ("setup", "V8"),
+            ("interval", endianness + "i4"),
+            ("start_frame", endianness + "i4"),
+            ("xfer_flags", endianness + "u4"),
+            ("ndesc", endianness + "u4"),
+        ]
+    )
+
+
+class PacketBatch:
+    """A set of usbmon packets, stored as parallel arrays.
+
+    Each column is a NumPy array with one element per packet, in capture order.
+    The payloads of all the packets are concatenated in a single shared buffer,
+    with payload_offsets[i]:payload_offsets[i + 1] delimiting the payload of
+    packet i.
+    """
+
+    def __init__(self, endianness: str, headers: bytes, payloads: bytes):
+        """Build a batch out of concatenated usbmon mmap headers and payloads.
+
+        Args:
+          endianness: The struct-style byte order of the headers.
+          headers: The 64-byte usbmon headers of all the packets, concatenated.
+          payloads: The captured data of all the packets, concatenated.
+        """
+        self._endianness = endianness
+        self._headers = headers
+        self._payloads = payloads
+        self._pairs: Optional[Tuple[numpy.ndarray, numpy.ndarray, int]] = None
+
+        decoded = numpy.frombuffer(headers, dtype=_header_dtype(endianness))
+
+        self.tag = decoded["tag"].astype(numpy.uint64)
+        self.type = decoded["type"]
+        self.xfer_type = decoded["xfer_type"]
+        self.epnum = decoded["epnum"]
+        self.devnum = decoded["devnum"]
+        self.busnum = decoded["busnum"].astype(numpy.uint16)
+        self.timestamp_ns = (
+            decoded["ts_sec"].astype(numpy.int64) * 1_000_000_000
+            + decoded["ts_usec"].astype(numpy.int64) * 1_000
+        )
+        self.status = decoded["status"].astype(numpy.int32)
+        self.length = decoded["length"].astype(numpy.uint32)
+
+        len_cap = decoded["len_cap"].astype(numpy.int64)
+        self.payload_offsets = numpy.zeros(len(decoded) + 1, dtype=numpy.int64)
+        numpy.cumsum(len_cap, out=self.payload_offsets[1:])
+        if self.payload_offsets[-1] != len(payloads):
+            raise ValueError(
+                f"Capped lengths ({self.payload_offsets[-1]}) do not match payloads"
+                f" length ({len(payloads)})"
+            )
+
+    def __len__(self) -> int:
+        return len(self.tag)
+
+    @property
+    def endpoint(self) -> numpy.ndarray:
+        return self.epnum & 0x7F
+
+    @property
+    def is_in(self) -> numpy.ndarray:
+        """Mask of the packets with IN direction."""
+        return (self.epnum & 0x80) != 0
+
+    @property
+    def payload_buffer(self) -> bytes:
+        return self._payloads
+
+    def __getitem__(self, index: int) -> packet.Packet:
+        """Return a Packet view of a single packet in the batch."""
+        header_start = index * _HEADER_SIZE
+        header_end = header_start + _HEADER_SIZE
+        payload_start = self.payload_offsets[index]
+        payload_end = self.payload_offsets[index + 1]
+
+        view = usbmon_mmap.UsbmonMmapPacket(
+            self._endianness,
+            self._headers[header_start:header_end],
+            payload=self._payloads[payload_start:payload_end],
+        )
+        view.tag = int(self.tag[index])
+        return view
+
+    def __iter__(self) -> Iterator[packet.Packet]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def address_mask(
+        self,
+        address: Union[addresses.DeviceAddress, addresses.EndpointAddress],
+    ) -> numpy.ndarray:
+        """Return the mask of packets to or from the provided address."""
+        mask = (self.busnum == address.bus) & (self.devnum == address.device)
+        if isinstance(address, addresses.EndpointAddress):
+            mask &= self.endpoint == address.endpoint
+        return mask
+
+    def select(self, mask: numpy.ndarray) -> "PacketBatch":
+        """Return a new batch with only the packets selected by the mask."""
+        (indices,) = numpy.nonzero(mask)
+
+        header_indices = (
+            indices[:, None] * _HEADER_SIZE + numpy.arange(_HEADER_SIZE)
+        ).ravel()
+        headers = numpy.frombuffer(self._headers, dtype=numpy.uint8)[header_indices]
+
+        payload_lengths = numpy.diff(self.payload_offsets)[indices]
+        output_offsets = numpy.cumsum(payload_lengths) - payload_lengths
+        payload_indices = numpy.repeat(
+            self.payload_offsets[indices] - output_offsets, payload_lengths
+        ) + numpy.arange(payload_lengths.sum())
+        payloads = numpy.frombuffer(self._payloads, dtype=numpy.uint8)[payload_indices]
+
+        selected = PacketBatch(self._endianness, headers.tobytes(), payloads.tobytes())
+        selected.tag = self.tag[indices]
+        return selected
+
+    def count_by_direction(self) -> Dict[constants.Direction, int]:
+        in_count = int(numpy.count_nonzero(self.is_in))
+        counts = {
+            constants.Direction.IN: in_count,
+            constants.Direction.OUT: len(self) - in_count,
+        }
+        return {direction: count for direction, count in counts.items() if count}
+
+    def count_by_address(self) -> Dict[addresses.EndpointAddress, int]:
+        packed = (
+            self.busnum.astype(numpy.uint32) << 16
+            | self.devnum.astype(numpy.uint32) << 8
+            | self.endpoint
+        )
+        keys, counts = numpy.unique(packed, return_counts=True)
+        return {
+            addresses.EndpointAddress(
+                int(key) >> 16, (int(key) >> 8) & 0xFF, int(key) & 0xFF
+            ): int(count)
+            for key, count in zip(keys, counts)
+        }
+
+    def count_by_xfer_type(self) -> Dict[constants.XferType, int]:
+        keys, counts = numpy.unique(self.xfer_type, return_counts=True)
+        return {
+            constants.XferType(int(key)): int(count) for key, count in zip(keys, counts)
+        }
+
+    def pair_indices(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Match submissions and callbacks, the same way Session.add() does.
+
+        Returns:
+          A tuple of two arrays (first, second), with one element per pair, in
+          the same order in which Session.in_pairs() would return them. The
+          second array contains -1 for unmatched packets.
+        """
+        if self._pairs is None:
+            self._pairs = self._match_pairs()
+        first, second, _ = self._pairs
+        return first, second
+
+    def _match_pairs(self) -> Tuple[numpy.ndarray, numpy.ndarray, int]:
+        """Match submissions and callbacks.
+
+        Returns:
+          The (first, second) arrays described in pair_indices(), and the number
+          of leading pairs that Session would have completed, rather than report
+          as left over at the end of the capture.
+        """
+        count = len(self)
+        order = numpy.argsort(self.tag, kind="stable")
+        sorted_tags = self.tag[order]
+        sorted_timestamps = self.timestamp_ns[order]
+        sorted_types = self.type[order]
+
+        # Consecutive packets with the same tag are candidate pairs, unless the
+        # first one is a callback that arrived long before its submission.
+        candidate = sorted_tags[:-1] == sorted_tags[1:]
+        anticipation = numpy.abs(sorted_timestamps[1:] - sorted_timestamps[:-1])
+        rejected = (
+            candidate
+            & (sorted_types[:-1] == ord(constants.PacketType.CALLBACK.value))
+            & (anticipation > capture_session._MAX_CALLBACK_ANTICIPATION_NS)
+        )
+        valid = candidate & ~rejected
+
+        # Session pairs packets greedily, so within each run of valid candidate
+        # pairs, only every other one is taken.
+        positions = numpy.arange(count - 1 if count else 0)
+        run_starts = valid.copy()
+        run_starts[1:] &= ~valid[:-1]
+        run_start_positions = numpy.maximum.accumulate(
+            numpy.where(run_starts, positions, 0)
+        )
+        taken = valid & ((positions - run_start_positions) % 2 == 0)
+
+        paired = numpy.zeros(count, dtype=bool)
+        paired[:-1] |= taken
+        paired[1:] |= taken
+
+        # Rejected callbacks are emitted as singletons when their replacement
+        # arrives; everything else left over is emitted at the end, in the
+        # order it was received.
+        singleton = ~paired
+        singleton_rejected = numpy.zeros(count, dtype=bool)
+        singleton_rejected[:-1] = rejected & singleton[:-1]
+
+        (taken_positions,) = numpy.nonzero(taken)
+        (rejected_positions,) = numpy.nonzero(singleton_rejected)
+        (leftover_positions,) = numpy.nonzero(singleton & ~singleton_rejected)
+
+        first = numpy.concatenate(
+            (
+                order[taken_positions],
+                order[rejected_positions],
+                order[leftover_positions],
+            )
+        )
+        second = numpy.concatenate(
+            (
+                order[taken_positions + 1],
+                numpy.full(len(rejected_positions), _NO_PACKET),
+                numpy.full(len(leftover_positions), _NO_PACKET),
+            )
+        )
+        emitted_at = numpy.concatenate(
+            (
+                order[taken_positions + 1],
+                order[rejected_positions + 1],
+                count + order[leftover_positions],
+            )
+        )
+
+        emission_order = numpy.argsort(emitted_at, kind="stable")
+        completed_count = len(first) - len(leftover_positions)
+        return first[emission_order], second[emission_order], completed_count
+
+    def retag(self) -> None:
+        """Replace the URB tags with sequence numbers, like Session does.
+
+        As with Session, only completed pairs are renumbered: events that are
+        still waiting for their match at the end of the batch keep their
+        original URB tag.
+        """
+        if self._pairs is None:
+            self._pairs = self._match_pairs()
+        first, second, completed_count = self._pairs
+        first = first[:completed_count]
+        second = second[:completed_count]
+        sequence = numpy.arange(completed_count, dtype=numpy.uint64)
+        self.tag[first] = sequence
+        paired = second != _NO_PACKET
+        self.tag[second[paired]] = sequence[paired]
+
+    def in_pairs(self) -> Iterator[packet.PacketPair]:
+        first, second = self.pair_indices()
+        for first_index, second_index in zip(first, second):
+            second_packet: Optional[packet.Packet] = None
+            if second_index != _NO_PACKET:
+                second_packet = self[second_index]
+            yield (self[first_index], second_packet)
+
+
+def from_packets(
+    endianness: str, raw_packets: Sequence[Union[bytes, memoryview]]
+) -> PacketBatch:
+    """Build a PacketBatch out of raw usbmon mmap packets."""
+    for index, raw_packet in enumerate(raw_packets):
+        if len(raw_packet) < _HEADER_SIZE:
+            raise ValueError(
+                f"Packet {index} ({len(raw_packet)} bytes) is shorter than the"
+                f" {_HEADER_SIZE}-byte usbmon header."
+            )
+    headers = b"".join(raw_packet[:_HEADER_SIZE] for raw_packet in raw_packets)
+    payloads = b"".join(raw_packet[_HEADER_SIZE:] for raw_packet in raw_packets)
+    return PacketBatch(endianness, headers, payloads)
+
+
+def from_buffer(
+    endianness: str,
+    buffer: Union[bytes, mmap.mmap],
+    data_offsets: Sequence[array.array],
+    data_lengths: Sequence[array.array],
+) -> PacketBatch:
+    """Build a PacketBatch out of raw usbmon mmap packets located in a buffer.
+
+    Args:
+      endianness: The struct-style byte order of the packets.
+      buffer: The buffer containing the packets, such as a memory-mapped file.
+      data_offsets: Arrays of offsets of the packets within the buffer.
+      data_lengths: Arrays of lengths of the packets, matching data_offsets.
+    """
+    if not data_offsets:
+        return PacketBatch(endianness, b"", b"")
+
+    raw = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    offsets = numpy.concatenate(
+        [numpy.frombuffer(chunk, dtype=numpy.uint64) for chunk in data_offsets]
+    ).astype(numpy.int64)
+    lengths = numpy.concatenate(
+        [numpy.frombuffer(chunk, dtype=numpy.uint64) for chunk in data_lengths]
+    ).astype(numpy.int64)
+    (short_packets,) = numpy.nonzero(lengths < _HEADER_SIZE)
+    if len(short_packets):
+        index = short_packets[0]
+        raise ValueError(
+            f"Packet {index} ({lengths[index]} bytes) is shorter than the"
+            f" {_HEADER_SIZE}-byte usbmon header."
+        )
+
+    header_indices = (offsets[:, None] + numpy.arange(_HEADER_SIZE)).ravel()
+    headers = raw[header_indices]
+
+    payload_lengths = lengths - _HEADER_SIZE
+    output_offsets = numpy.cumsum(payload_lengths) - payload_lengths
+    payload_indices = numpy.repeat(
+        offsets + _HEADER_SIZE - output_offsets, payload_lengths
+    ) + numpy.arange(payload_lengths.sum())
+    payloads = raw[payload_indices]
+
+    return PacketBatch(endianness, headers.tobytes(), payloads.tobytes())
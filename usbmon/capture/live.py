@@ -0,0 +1,360 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Live capture from the Linux usbmon binary (mmap) interface.
+
+The kernel queues the events of a bus in a ring buffer, which is mapped in
+memory from /dev/usbmonN. MON_IOCX_MFETCH releases the events already
+processed and returns the offsets of the next batch of events in the ring,
+as described in Documentation/usb/usbmon.rst in the Linux sources.
+
+The ring is accessed through a RingSource, so that an EmulatedRing, replaying
+the events of a capture file, can stand in for the kernel device:
+
+    with live.DeviceRing(bus=1) as source:
+        session = capture_session.Session()
+        for first, second in session.stream(live.read_packets(source)):
+            ...
+"""
+
+import abc
+import array
+import collections
+import mmap
+import struct
+import sys
+from typing import BinaryIO, Deque, Iterable, Iterator, Optional, Tuple, Union
+
+from usbmon import filters, pcapng
+from usbmon.capture import usbmon_mmap
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where only EmulatedRing works.
+    fcntl = None  # type: ignore
+
+# Ioctls of the usbmon binary interface, from Linux's drivers/usb/mon/mon_bin.c.
+_MON_IOC_MAGIC = 0x92
+_IOC_WRITE = 1
+_IOC_READ = 2
+
+
+def _ioc(direction: int, number: int, size: int) -> int:
+    return direction << 30 | size << 16 | _MON_IOC_MAGIC << 8 | number
+
+
+# struct mon_bin_stats { u32 queued; u32 dropped; }
+_STATS = struct.Struct("II")
+# struct mon_bin_mfetch { u32 *offvec; u32 nfetch; u32 nflush; }
+_MFETCH = struct.Struct("PII")
+
+_MON_IOCG_STATS = _ioc(_IOC_READ, 3, _STATS.size)
+_MON_IOCT_RING_SIZE = _ioc(0, 4, 0)
+_MON_IOCQ_RING_SIZE = _ioc(0, 5, 0)
+_MON_IOCX_MFETCH = _ioc(_IOC_READ | _IOC_WRITE, 7, _MFETCH.size)
+
+# Events in the ring are 64-byte headers followed by their captured data,
+# aligned to 64 bytes. The kernel never splits an event at the end of the ring,
+# filling the remaining space with a filler event instead.
+_HEADER_SIZE = 64
+_EVENT_ALIGNMENT = 64
+_TYPE_OFFSET = 8
+_LEN_CAP_OFFSET = 36
+_FILLER_TYPE = ord("@")
+
+_NATIVE_ENDIANNESS = "<" if sys.byteorder == "little" else ">"
+
+DEFAULT_BATCH_SIZE = 256
+# The kernel's own default ring size (CHUNK_SIZE * 75 in mon_bin.c.)
+DEFAULT_RING_SIZE = 300 * 1024
+
+
+def _event_size(len_cap: int) -> int:
+    return (_HEADER_SIZE + len_cap + _EVENT_ALIGNMENT - 1) & ~(_EVENT_ALIGNMENT - 1)
+
+
+class RingSource(abc.ABC):
+    """A ring of usbmon events, in the layout of the kernel's mmap interface."""
+
+    # The struct-style byte order of the events in the ring.
+    endianness: str
+
+    @property
+    @abc.abstractmethod
+    def buffer(self) -> mmap.mmap:
+        """The memory of the ring, which the offsets returned by fetch() index."""
+
+    @abc.abstractmethod
+    def fetch(self, offsets: array.array, flush_count: int) -> int:
+        """Release processed events, and return the offsets of the next ones.
+
+        Like MON_IOCX_MFETCH, this first releases the oldest flush_count events,
+        which must have been returned by the previous call, then waits for
+        events to be available.
+
+        Args:
+          offsets: An array of unsigned 32-bit integers, filled in with the
+            offsets of the events, oldest first.
+          flush_count: The number of events to release from the ring.
+
+        Returns:
+          The number of offsets filled in, or 0 if no more events will ever be
+          available.
+        """
+
+    @property
+    def dropped(self) -> int:
+        """The number of events dropped because the ring was full."""
+        return 0
+
+    def close(self) -> None:
+        """Release the resources held by the source."""
+
+    def __enter__(self) -> "RingSource":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class DeviceRing(RingSource):
+    """The ring of a usbmon character device, such as /dev/usbmon1."""
+
+    def __init__(
+        self,
+        bus: int = 0,
+        ring_size: Optional[int] = None,
+        path: Optional[str] = None,
+    ):
+        """Open and map a usbmon device.
+
+        Args:
+          bus: The bus to capture, or 0 to capture all of them.
+          ring_size: If provided, resize the kernel's ring to this many bytes.
+          path: The path of the device, if not /dev/usbmon<bus>.
+        """
+        if fcntl is None or not sys.platform.startswith("linux"):
+            raise OSError("usbmon devices are only available on Linux.")
+        self.endianness = _NATIVE_ENDIANNESS
+        self._device = open(path or f"/dev/usbmon{bus}", "rb", buffering=0)
+        try:
+            if ring_size is not None:
+                fcntl.ioctl(self._device, _MON_IOCT_RING_SIZE, ring_size)
+            size = fcntl.ioctl(self._device, _MON_IOCQ_RING_SIZE)
+            self._mapped = mmap.mmap(
+                self._device.fileno(), size, mmap.MAP_SHARED, mmap.PROT_READ
+            )
+        except OSError:
+            self._device.close()
+            raise
+
+    @property
+    def buffer(self) -> mmap.mmap:
+        return self._mapped
+
+    def fetch(self, offsets: array.array, flush_count: int) -> int:
+        address, length = offsets.buffer_info()
+        request = bytearray(_MFETCH.pack(address, length, flush_count))
+        fcntl.ioctl(self._device, _MON_IOCX_MFETCH, request, True)
+        _, fetched, _ = _MFETCH.unpack(request)
+        return fetched
+
+    @property
+    def dropped(self) -> int:
+        stats = bytearray(_STATS.size)
+        fcntl.ioctl(self._device, _MON_IOCG_STATS, stats, True)
+        _, dropped = _STATS.unpack(stats)
+        return dropped
+
+    def close(self) -> None:
+        self._mapped.close()
+        self._device.close()
+
+
+class EmulatedRing(RingSource):
+    """A ring fed with recorded events, laid out as the kernel does.
+
+    Events are queued as space is released in the ring, including the filler
+    events at its end, so that readers see the same offsets they would for a
+    live device. Once all the events have been fetched and released, fetch()
+    returns 0.
+    """
+
+    def __init__(
+        self,
+        endianness: str,
+        events: Iterable[Union[bytes, memoryview]],
+        ring_size: int = DEFAULT_RING_SIZE,
+    ):
+        """Build a ring from raw events.
+
+        Args:
+          endianness: The struct-style byte order of the events.
+          events: The events, each a usbmon header followed by captured data.
+          ring_size: The size of the ring, in bytes. Must be a multiple of 64.
+        """
+        if ring_size % _EVENT_ALIGNMENT:
+            raise ValueError(f"Ring size must be a multiple of {_EVENT_ALIGNMENT}.")
+        self.endianness = endianness
+        self._ring = mmap.mmap(-1, ring_size)
+        self._events = iter(events)
+        self._next_event: Optional[Union[bytes, memoryview]] = None
+        self._dropped = 0
+        # Offsets and sizes of the events in the ring, oldest first.
+        self._queued: Deque[Tuple[int, int]] = collections.deque()
+        self._in = 0
+        self._count = 0
+
+    @classmethod
+    def from_capture(
+        cls, stream: BinaryIO, ring_size: int = DEFAULT_RING_SIZE
+    ) -> "EmulatedRing":
+        """Build a ring replaying a usbmon pcapng or libpcap capture."""
+        packets = pcapng.read_usbmon_data(stream)
+        first = next(packets, None)
+        if first is None:
+            return cls(_NATIVE_ENDIANNESS, (), ring_size)
+
+        endianness, first_data = first
+
+        def events() -> Iterator[memoryview]:
+            yield first_data
+            for packet_endianness, packet_data in packets:
+                if packet_endianness != endianness:
+                    raise Exception("Mixed-endianness captures are not supported.")
+                yield packet_data
+
+        return cls(endianness, events(), ring_size)
+
+    @property
+    def buffer(self) -> mmap.mmap:
+        return self._ring
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def _queue(self, offset: int, size: int) -> None:
+        self._queued.append((offset, size))
+        self._in = (offset + size) % len(self._ring)
+        self._count += size
+
+    def _fill(self, event: Union[bytes, memoryview]) -> bool:
+        """Queue an event if there is space for it in the ring, as the kernel does.
+
+        Returns:
+          Whether the event was queued.
+        """
+        size = _event_size(len(event) - _HEADER_SIZE)
+        ring_size = len(self._ring)
+        filler_size = ring_size - self._in if self._in + size > ring_size else 0
+        if self._count + filler_size + size > ring_size:
+            return False
+
+        if filler_size:
+            filler = self._in
+            filler_end = filler + _HEADER_SIZE
+            self._ring[filler:filler_end] = bytes(_HEADER_SIZE)
+            self._ring[filler + _TYPE_OFFSET] = _FILLER_TYPE
+            struct.pack_into(
+                self.endianness + "I",
+                self._ring,
+                filler + _LEN_CAP_OFFSET,
+                filler_size - _HEADER_SIZE,
+            )
+            self._queue(filler, filler_size)
+
+        offset = self._in
+        event_end = offset + len(event)
+        self._ring[offset:event_end] = event
+        self._queue(offset, size)
+        return True
+
+    def fetch(self, offsets: array.array, flush_count: int) -> int:
+        for _ in range(min(flush_count, len(self._queued))):
+            _, size = self._queued.popleft()
+            self._count -= size
+
+        while True:
+            if self._next_event is None:
+                self._next_event = next(self._events, None)
+                if self._next_event is None:
+                    break
+            if not self._fill(self._next_event):
+                if self._queued:
+                    break
+                # The event would not fit even once the ring is released, which
+                # the kernel would also have dropped it for.
+                self._dropped += 1
+            self._next_event = None
+
+        fetched = min(len(offsets), len(self._queued))
+        for index in range(fetched):
+            offsets[index] = self._queued[index][0]
+        return fetched
+
+    def close(self) -> None:
+        self._ring.close()
+
+
+def read_packets(
+    source: RingSource,
+    packet_filter: Optional[filters.PacketFilter] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[usbmon_mmap.UsbmonMmapPacket]:
+    """Yield the packets from a ring, as they are captured.
+
+    This is meant to be combined with usbmon.capture_session.Session.stream().
+    Events are fetched from the ring in batches, and only released once the
+    whole batch has been consumed, so packets copy their data out of the ring.
+
+    Args:
+      source: The ring to read the events from.
+      packet_filter: If provided, only yield packets matching it. Packets are
+        filtered based on their raw header, before they are copied and built.
+      batch_size: The maximum number of events to fetch at once.
+
+    Yields:
+      usbmon.capture.usbmon_mmap.UsbmonMmapPacket objects, in capture order.
+    """
+    endianness = source.endianness
+    len_cap_struct = struct.Struct(endianness + "I")
+    ring = memoryview(source.buffer)
+    offsets = array.array("I", bytes(4 * batch_size))
+
+    fetched = 0
+    try:
+        while True:
+            fetched = source.fetch(offsets, fetched)
+            if not fetched:
+                return
+            for index in range(fetched):
+                offset = offsets[index]
+                if ring[offset + _TYPE_OFFSET] == _FILLER_TYPE:
+                    continue
+                if packet_filter is not None and not packet_filter.matches_usbmon(
+                    endianness, ring, offset
+                ):
+                    continue
+                (len_cap,) = len_cap_struct.unpack_from(ring, offset + _LEN_CAP_OFFSET)
+                event_end = offset + _HEADER_SIZE + len_cap
+                yield usbmon_mmap.UsbmonMmapPacket(
+                    endianness, ring[offset:event_end].tobytes()
+                )
+    finally:
+        ring.release()
@@ -0,0 +1,122 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.capture.live."""
+
+import os
+import struct
+import sys
+from unittest import mock
+
+from absl.testing import absltest
+
+import usbmon.capture.live
+import usbmon.capture_session
+import usbmon.filters
+import usbmon.pcapng
+
+_TEST1_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../../testdata/test1.pcap"
+)
+
+
+def _emulated_ring(ring_size=usbmon.capture.live.DEFAULT_RING_SIZE):
+    with open(_TEST1_PATH, "rb") as capture_file:
+        return usbmon.capture.live.EmulatedRing.from_capture(
+            capture_file, ring_size=ring_size
+        )
+
+
+class LiveTest(absltest.TestCase):
+    def test_read_packets(self):
+        expected = [
+            str(packet) for packet in usbmon.pcapng.parse_file(_TEST1_PATH, False)
+        ]
+        # Small rings wrap around, with filler events at their end, and small
+        # batches release the events a few at a time.
+        for ring_size, batch_size in ((1 << 16, 256), (512, 3), (256, 1)):
+            with self.subTest(ring_size=ring_size, batch_size=batch_size):
+                with _emulated_ring(ring_size) as source:
+                    packets = usbmon.capture.live.read_packets(
+                        source, batch_size=batch_size
+                    )
+
+                    self.assertEqual([str(packet) for packet in packets], expected)
+                    self.assertEqual(source.dropped, 0)
+
+    def test_session_stream(self):
+        expected = [
+            (first.tag, second and second.tag)
+            for first, second in usbmon.pcapng.parse_file(_TEST1_PATH).in_pairs()
+        ]
+
+        session = usbmon.capture_session.Session()
+        with _emulated_ring(512) as source:
+            pairs = [
+                (first.tag, second and second.tag)
+                for first, second in session.stream(
+                    usbmon.capture.live.read_packets(source)
+                )
+            ]
+
+        self.assertEqual(pairs, expected)
+
+    def test_packet_filter(self):
+        expression = usbmon.filters.FilterExpression("type==C and len>0")
+        expected = [
+            str(packet)
+            for packet in usbmon.pcapng.parse_file(_TEST1_PATH, False)
+            if expression.matches(packet)
+        ]
+
+        with _emulated_ring() as source:
+            packets = usbmon.capture.live.read_packets(
+                source, usbmon.filters.PacketFilter(expression=expression)
+            )
+
+            self.assertEqual([str(packet) for packet in packets], expected)
+
+    def test_dropped(self):
+        all_packets = [
+            str(packet) for packet in usbmon.pcapng.parse_file(_TEST1_PATH, False)
+        ]
+
+        # Events with data do not fit a ring this small, once it wrapped.
+        with _emulated_ring(128) as source:
+            packets = [
+                str(packet) for packet in usbmon.capture.live.read_packets(source)
+            ]
+
+            self.assertNotEmpty(packets)
+            self.assertGreater(source.dropped, 0)
+            self.assertLen(packets, len(all_packets) - source.dropped)
+            self.assertContainsSubsequence(all_packets, packets)
+
+    @absltest.skipUnless(sys.platform.startswith("linux"), "Requires Linux")
+    @absltest.skipUnless(struct.calcsize("P") == 8, "Requires a 64-bit platform")
+    def test_ioctls(self):
+        # From the definitions in Linux's drivers/usb/mon/mon_bin.c.
+        self.assertEqual(usbmon.capture.live._MON_IOCG_STATS, 0x80089203)
+        self.assertEqual(usbmon.capture.live._MON_IOCT_RING_SIZE, 0x9204)
+        self.assertEqual(usbmon.capture.live._MON_IOCQ_RING_SIZE, 0x9205)
+        self.assertEqual(usbmon.capture.live._MON_IOCX_MFETCH, 0xC0109207)
+
+    def test_device_ring_unsupported(self):
+        with mock.patch.object(usbmon.capture.live, "fcntl", None):
+            with self.assertRaisesRegex(OSError, "only available on Linux"):
+                usbmon.capture.live.DeviceRing(bus=1)
@@ -18,6 +18,7 @@
 """Tests for usbmon.capture.usbmon_mmap."""
 
 import binascii
+import struct
 
 from absl.testing import absltest
 
@@ -100,3 +101,28 @@ class TestPacket(absltest.TestCase):
             "<", binascii.a2b_base64(_INTERRUPT_S_BASE64)
         )
         self.assertEqual("EINPROGRESS", packet.error)
+
+    def test_big_endian(self):
+        little_endian = binascii.a2b_base64(_CONTROL_C_BASE64)
+        header = struct.unpack_from("<QBBBBHB1sqiiII8siiII", little_endian)
+        big_endian = struct.pack(">QBBBBHB1sqiiII8siiII", *header) + little_endian[64:]
+
+        packet = usbmon.capture.usbmon_mmap.UsbmonMmapPacket(">", big_endian)
+        self.assertEqual(
+            "00000000dacdaa00 1550331845119647 C Ci:1:001:0 0 18 = 12010002 09000140 6b1d0200 14040302 0101",
+            str(packet),
+        )
+
+    def test_capped_length_mismatch(self):
+        truncated_packet = binascii.a2b_base64(_CONTROL_C_BASE64)[:-2]
+        with self.assertRaises(ValueError):
+            usbmon.capture.usbmon_mmap.UsbmonMmapPacket("<", truncated_packet)
+
+    def test_memoryview(self):
+        raw_packet = binascii.a2b_base64(_CONTROL_C_BASE64)
+        packet = usbmon.capture.usbmon_mmap.UsbmonMmapPacket(
+            "<", memoryview(raw_packet)
+        )
+        self.assertIsInstance(packet.payload, bytes)
+        self.assertEqual(raw_packet[64:], packet.payload)
+        self.assertIsNone(packet.setup_packet)
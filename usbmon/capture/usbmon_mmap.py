@@ -17,111 +17,177 @@
 # SPDX-FileCopyrightText: © 2019 The usbmon-tools Authors
 # SPDX-License-Identifier: Apache-2.0
 
-import datetime
+import functools
+import struct
 from typing import Optional, Union
 
-import construct
 import hexdump
 
-from usbmon import constants, packet, setup
+from usbmon import constants, packet, payloads, setup
 
 _ERRORCODE_MAP = {-2: "ENOENT", -115: "EINPROGRESS"}
 
 
-def _usbmon_structure(endianness):
-    """Return a construct.Struct() object suitable to parse a usbmon packet."""
-
-    return construct.Struct(
-        id=construct.FormatField(endianness, "Q"),
-        type=construct.Mapping(
-            construct.Byte, {e: ord(e.value) for e in constants.PacketType}
-        ),
-        xfer_type=construct.Mapping(
-            construct.Byte, {e: e.value for e in constants.XferType}
-        ),
-        epnum=construct.Byte,
-        devnum=construct.Byte,
-        busnum=construct.FormatField(endianness, "H"),
-        flag_setup=construct.Byte,
-        flag_data=construct.PaddedString(1, "ascii"),
-        ts_sec=construct.FormatField(endianness, "q"),
-        ts_usec=construct.FormatField(endianness, "l"),
-        status=construct.FormatField(endianness, "l"),
-        length=construct.FormatField(endianness, "L"),
-        len_cap=construct.FormatField(endianness, "L"),
-        s=construct.Union(
-            0,
-            setup=construct.Bytes(8),
-            iso=construct.Struct(
-                error_count=construct.FormatField(endianness, "l"),
-                numdesc=construct.FormatField(endianness, "l"),
-            ),
-        ),
-        interval=construct.FormatField(endianness, "l"),
-        start_frame=construct.FormatField(endianness, "l"),
-        xfer_flags=construct.FormatField(endianness, "L"),
-        ndesc=construct.FormatField(endianness, "L"),
-        payload=construct.GreedyBytes,
-    )
+# Layout of the 64-byte header of the usbmon mmap (binary) interface, as
+# described by struct mon_bin_hdr in Linux's drivers/usb/mon/mon_bin.c. The
+# setup/iso union is kept as raw bytes, and decoded separately as needed.
+_HEADER_FORMAT = "QBBBBHB1sqiiII8siiII"
+_ISO_FORMAT = "ii"
+_HEADER_SIZE = struct.calcsize("<" + _HEADER_FORMAT)
+_SETUP_OFFSET = 40
+_SETUP_END = _SETUP_OFFSET + 8
 
+_PACKET_TYPES = {ord(e.value): e for e in constants.PacketType}
+_XFER_TYPES = {e.value: e for e in constants.XferType}
+
+
+@functools.lru_cache(maxsize=None)
+def _header_struct(endianness: str) -> struct.Struct:
+    """Return a precompiled struct.Struct() suitable to parse a usbmon header."""
+    return struct.Struct(endianness + _HEADER_FORMAT)
 
-class UsbmonMmapPacket(packet.Packet):
-    def __init__(
-        self, endianness: str, raw_packet: bytes, payload: Optional[bytes] = None
-    ):
-        super().__init__()
-        constructed_object = _usbmon_structure(endianness).parse(raw_packet)
 
-        self.tag = constructed_object.id
+@functools.lru_cache(maxsize=None)
+def _iso_struct(endianness: str) -> struct.Struct:
+    """Return a precompiled struct.Struct() to parse the isochronous descriptor."""
+    return struct.Struct(endianness + _ISO_FORMAT)
 
-        self.type = constructed_object.type
 
-        self.xfer_type = constructed_object.xfer_type
+# Sentinel for lazily-decoded fields that have not been accessed yet, as None is
+# a valid value for some of them.
+_UNDECODED = object()
 
-        self.devnum = constructed_object.devnum
-        self.busnum = constructed_object.busnum
 
-        self.flag_setup = constructed_object.flag_setup
-        if self.flag_setup == 0:
-            self.setup_packet = setup.SetupPacket(constructed_object.s.setup)
-        else:  # No setup for this kind of URB, or unable to capture setup packet.
-            self.setup_packet = None
+class UsbmonMmapPacket(packet.Packet):
+    __slots__ = (
+        "flag_setup",
+        "flag_data",
+        "interval",
+        "error_count",
+        "numdesc",
+        "start_frame",
+        "xfer_flags",
+        "ndesc",
+        "_raw",
+        "_setup_packet",
+        "_payload",
+    )
 
-        self.flag_data = constructed_object.flag_data
+    # Only meaningful for INTERRUPT and ISOCHRONOUS transfers, None otherwise.
+    interval: Optional[int]
+    # Only meaningful for ISOCHRONOUS transfers, None otherwise.
+    error_count: Optional[int]
+    numdesc: Optional[int]
+    start_frame: Optional[int]
+
+    def __init__(
+        self,
+        endianness: str,
+        raw_packet: Union[bytes, memoryview],
+        payload: Union[bytes, payloads.DataRef, None] = None,
+    ):
+        """Decode a usbmon packet from its binary representation.
+
+        The fixed header fields are decoded immediately, but the setup packet,
+        timestamp (as a datetime) and payload are only built when first accessed, from
+        raw_packet, which is kept alive as long as the packet is.
+
+        Args:
+          endianness: The struct-style byte order of raw_packet ("<" or ">").
+          raw_packet: The 64-byte usbmon header, followed by captured data.
+          payload: The captured data, if provided separately from the header.
+            When parsing headers only, this is instead the location of the
+            whole raw packet in the capture, to read the captured data from.
+        """
+        super().__init__()
+        header = _header_struct(endianness)
+        (
+            self.tag,
+            packet_type,
+            xfer_type,
+            self.epnum,
+            self.devnum,
+            self.busnum,
+            self.flag_setup,
+            flag_data,
+            ts_sec,
+            ts_usec,
+            self.status,
+            self.length,
+            len_cap,
+            _,
+            interval,
+            start_frame,
+            self.xfer_flags,
+            self.ndesc,
+        ) = header.unpack_from(raw_packet)
+
+        try:
+            self.type = _PACKET_TYPES[packet_type]
+            self.xfer_type = _XFER_TYPES[xfer_type]
+        except KeyError as lookup_error:
+            raise ValueError(
+                f"Invalid packet type ({packet_type}) or transfer type ({xfer_type})"
+            ) from lookup_error
+
+        self._raw = raw_packet
+        self._setup_packet: Union[Optional[setup.SetupPacket], object] = _UNDECODED
+        self.timestamp_ns = ts_sec * 1_000_000_000 + ts_usec * 1000
+        self._timestamp = None
+
+        self.flag_data = flag_data.rstrip(b"\x00").decode("ascii")
         if not self.flag_data:
             self.flag_data = "="
 
-        self.timestamp = datetime.datetime.fromtimestamp(
-            constructed_object.ts_sec + (1e-6 * constructed_object.ts_usec)
-        )
-        self.status = constructed_object.status
-
         if self.xfer_type in (
             constants.XferType.INTERRUPT,
             constants.XferType.ISOCHRONOUS,
         ):
-            self.interval = constructed_object.interval
+            self.interval = interval
+        else:
+            self.interval = None
 
         if self.xfer_type == constants.XferType.ISOCHRONOUS:
-            self.error_count = constructed_object.s.iso.error_count
-            self.numdesc = constructed_object.s.iso.numdesc
-            self.start_frame = constructed_object.start_frame
-
-        self.xfer_flags = constructed_object.xfer_flags
-        self.ndesc = constructed_object.ndesc
-        self.length = constructed_object.length
-        self.payload = constructed_object.payload
-        self.epnum = constructed_object.epnum
-
-        if payload is not None:
-            assert not constructed_object.payload
-            self.payload = payload
+            self.error_count, self.numdesc = _iso_struct(endianness).unpack_from(
+                raw_packet, _SETUP_OFFSET
+            )
+            self.start_frame = start_frame
+        else:
+            self.error_count = self.numdesc = self.start_frame = None
+
+        self._payload: Union[bytes, payloads.DataRef, None] = payload
+        if isinstance(payload, payloads.DataRef):
+            payload_length = payload.length - header.size
+        elif payload is not None:
+            assert len(raw_packet) == header.size
+            payload_length = len(payload)
+        else:
+            payload_length = len(raw_packet) - header.size
 
-        if constructed_object.len_cap != len(self.payload):
+        if len_cap != payload_length:
             raise ValueError(
-                f"Capped length ({constructed_object.len_cap}) does not match payload length ({len(self.payload)})"
+                f"Capped length ({len_cap}) does not match payload length ({payload_length})"
             )
 
+    @property
+    def setup_packet(self) -> Optional[setup.SetupPacket]:
+        if self._setup_packet is _UNDECODED:
+            if self.flag_setup == 0:
+                self._setup_packet = setup.parse(
+                    bytes(self._raw[_SETUP_OFFSET:_SETUP_END])
+                )
+            else:  # No setup for this kind of URB, or unable to capture setup packet.
+                self._setup_packet = None
+        return self._setup_packet  # type: ignore
+
+    @property
+    def payload(self) -> bytes:
+        if self._payload is None:
+            self._payload = bytes(self._raw[_HEADER_SIZE:])
+        elif isinstance(self._payload, payloads.DataRef):
+            self._payload = self._payload.read(_HEADER_SIZE)
+        return self._payload
+
     @property
     def error(self) -> Union[str, int, None]:
         """Returns a standard errno symbol for error status."""
@@ -156,7 +222,7 @@ class UsbmonMmapPacket(packet.Packet):
         payload_string = hexdump.dump(self.payload, size=8).lower()
 
         return (
-            f"{self.tag:016x} {self.timestamp.timestamp() * 1e6:.0f} "
+            f"{self.tag:016x} {self.timestamp_us} "
             f"{self.type.value} {self.type_mnemonic}{self.direction.value}:{self.busnum}:{self.devnum:03d}:{self.endpoint} "
             f"{self.setup_packet_string} {self.length} {self.flag_data} {payload_string}"
         ).rstrip()
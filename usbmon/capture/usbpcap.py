@@ -17,16 +17,15 @@
 # SPDX-FileCopyrightText: © 2020 The usbmon-tools Authors
 # SPDX-License-Identifier: Apache-2.0
 
-import datetime
 import enum
 import logging
-from typing import Dict, Union
+import struct
+from typing import Dict, Optional, Union
 
-import construct
 import hexdump
 import pcapng
 
-from usbmon import constants, packet, setup
+from usbmon import constants, packet, payloads, pcapng_reader, setup
 
 
 @enum.unique
@@ -50,88 +49,111 @@ class UsbcapXferType(enum.IntEnum):
     UNKNOWN = 0xFF
 
 
-_USBPCAP_XFER_TYPE_MAPPING: Dict[Union[UsbcapXferType, constants.XferType], int] = {
-    e: e.value for e in UsbcapXferType
+_USBPCAP_XFER_TYPES: Dict[int, Union[UsbcapXferType, constants.XferType]] = {
+    e.value: e for e in UsbcapXferType
 }
-_USBPCAP_XFER_TYPE_MAPPING.update({e: e.value for e in constants.XferType})
+_USBPCAP_XFER_TYPES.update({e.value: e for e in constants.XferType})
 
 
 class UnsupportedCaptureData(ValueError):
     """Raised when an unsupported capture data struct is being parsed."""
 
 
-_STRUCT = construct.Struct(
-    headerLen=construct.Int16ul,
-    id=construct.Int64ul,
-    status=construct.Int32ul,
-    function=construct.Int16ul,
-    info=construct.Byte,
-    busnum=construct.Int16ul,
-    devnum=construct.Int16ul,
-    epnum=construct.Byte,
-    xfer_type=construct.Mapping(construct.Byte, _USBPCAP_XFER_TYPE_MAPPING),
-    dataLength=construct.Int32ul,
-    # Start of additional headers.
-    control_header=construct.If(
-        construct.this.xfer_type == constants.XferType.CONTROL,
-        construct.Struct(
-            control_stage=construct.Mapping(
-                construct.Byte, {e: e.value for e in ControlStage}
-            ),
-            setup_packet=construct.If(
-                construct.this.control_stage == ControlStage.SETUP, construct.Bytes(8)
-            ),
-        ),
-    ),
-    payload=construct.GreedyBytes,
-)
+# Fixed part of the USBPCAP_BUFFER_PACKET_HEADER structure, which is followed by
+# the control stage (for CONTROL transfers) and the 8-byte setup packet (for the
+# SETUP stage.)
+_HEADER = struct.Struct("<HQIHBHHBBI")
+_CONTROL_STAGE_OFFSET = _HEADER.size
+_SETUP_OFFSET = _CONTROL_STAGE_OFFSET + 1
+_SETUP_END = _SETUP_OFFSET + 8
 
 
 class UsbpcapPacket(packet.Packet):
-    def __init__(self, block: pcapng.blocks.EnhancedPacket):
+    __slots__ = (
+        "_raw",
+        "_has_setup",
+        "_payload_offset",
+        "_setup_packet",
+        "_payload",
+    )
+
+    def __init__(
+        self,
+        block: Union[pcapng.blocks.EnhancedPacket, pcapng_reader.EnhancedPacket],
+    ):
+        """Decode a USBPcap packet from a pcapng Enhanced Packet Block.
+
+        As for usbmon packets, the setup packet, timestamp and payload are only
+        built when first accessed, from the block's packet data. When parsing
+        headers only, the payload is read back from the capture instead.
+        """
         super().__init__()
 
-        self.timestamp = datetime.datetime.fromtimestamp(block.timestamp)
-
-        constructed_object = _STRUCT.parse(block.packet_data)
-
-        if not isinstance(constructed_object.xfer_type, constants.XferType):
+        self.timestamp_ns = pcapng_reader.timestamp_ns(block)
+        self._timestamp = None
+
+        self._raw = raw_packet = block.packet_data
+        (
+            _,  # headerLen
+            self.tag,
+            self.status,
+            _,  # function
+            info,
+            self.busnum,
+            self.devnum,
+            self.epnum,
+            xfer_type,
+            self.length,
+        ) = _HEADER.unpack_from(raw_packet)
+
+        mapped_xfer_type = _USBPCAP_XFER_TYPES.get(xfer_type, xfer_type)
+        if not isinstance(mapped_xfer_type, constants.XferType):
             raise UnsupportedCaptureData(
-                f"Unable to parse capture data of type {constructed_object.xfer_type!r}"
+                f"Unable to parse capture data of type {mapped_xfer_type!r}"
             )
-
-        self.tag = constructed_object.id
+        self.xfer_type = mapped_xfer_type
 
         # This appears to be an approximation.
-        if constructed_object.info == 0x01:
+        if info == 0x01:
             self.type = constants.PacketType.CALLBACK
         else:
             self.type = constants.PacketType.SUBMISSION
 
-        self.xfer_type = constructed_object.xfer_type
-
-        self.devnum = constructed_object.devnum
-        self.busnum = constructed_object.busnum
-
-        self.status = constructed_object.status
-
-        self.length = constructed_object.dataLength
-
-        self.setup_packet = None
+        self._has_setup = False
+        self._setup_packet: Optional[setup.SetupPacket] = None
+        self._payload_offset = _HEADER.size
         if self.xfer_type == constants.XferType.CONTROL:
-            if constructed_object.control_header.setup_packet:
-                self.setup_packet = setup.SetupPacket(
-                    constructed_object.control_header.setup_packet
-                )
+            control_stage = ControlStage(raw_packet[_CONTROL_STAGE_OFFSET])
+            self._payload_offset = _SETUP_OFFSET
+            if control_stage == ControlStage.SETUP:
+                self._has_setup = True
+                self._payload_offset = _SETUP_END
                 self.length -= 8  # size of setup packet.
 
-        self.epnum = constructed_object.epnum
+        self._payload: Union[bytes, payloads.DataRef, None] = getattr(
+            block, "data_ref", None
+        )
+        if isinstance(self._payload, payloads.DataRef):
+            payload_length = self._payload.length - self._payload_offset
+        else:
+            payload_length = len(raw_packet) - self._payload_offset
+        if self.length != payload_length:
+            logging.warning("expected %d bytes, found %d", self.length, payload_length)
 
-        self.payload = constructed_object.payload
-        if self.length != len(self.payload):
-            logging.warning(
-                "expected %d bytes, found %d", self.length, len(self.payload)
-            )
+    @property
+    def setup_packet(self) -> Optional[setup.SetupPacket]:
+        if self._setup_packet is None and self._has_setup:
+            self._setup_packet = setup.parse(bytes(self._raw[_SETUP_OFFSET:_SETUP_END]))
+        return self._setup_packet
+
+    @property
+    def payload(self) -> bytes:
+        if self._payload is None:
+            payload_offset = self._payload_offset
+            self._payload = bytes(self._raw[payload_offset:])
+        elif isinstance(self._payload, payloads.DataRef):
+            self._payload = self._payload.read(self._payload_offset)
+        return self._payload
 
     @property
     def setup_packet_string(self) -> str:
@@ -160,7 +182,7 @@ class UsbpcapPacket(packet.Packet):
             payload_string = "?"
 
         return (
-            f"{self.tag:016x} {self.timestamp.timestamp() * 1e6:.0f} "
+            f"{self.tag:016x} {self.timestamp_us} "
             f"{self.type.value} {self.type_mnemonic}{self.direction.value}:{self.busnum}:{self.devnum:03d}:{self.endpoint} "
             f"{self.setup_packet_string} {self.length} {payload_string}"
         ).rstrip()
@@ -0,0 +1,289 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Sidecar index of pcapng captures, to skip over irrelevant parts of them.
+
+The index splits a capture into chunks of whole blocks, and records for each
+of them the range of timestamps, and a Bloom filter of the device and endpoint
+addresses, of the packets it contains. It is stored next to the capture, with
+an additional .usbidx suffix, and is only used as long as the size and
+modification time of the capture match the ones recorded in it.
+"""
+
+import datetime
+import logging
+import os
+import struct
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from usbmon import addresses, packet, pcapng_reader
+
+INDEX_SUFFIX = ".usbidx"
+
+# Chunks are indexed in about this size, which keeps the index a small fraction
+# of the size of the capture.
+CHUNK_SIZE = 1 << 20
+
+_MAGIC = b"USBIDX\x00\x02"
+_HEADER = struct.Struct("<8sQqII")
+_INTERFACE = struct.Struct("<HBB")
+_CHUNK = struct.Struct("<QQcxxxIIqq64s")
+
+_FILTER_BITS = 512
+
+Address = Union[addresses.DeviceAddress, addresses.EndpointAddress]
+
+
+def _filter_bits(key: int) -> int:
+    """Return the Bloom filter bits set for a key, as an integer bitmap."""
+    hashed = (key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    return (1 << ((hashed >> 16) % _FILTER_BITS)) | (
+        1 << ((hashed >> 40) % _FILTER_BITS)
+    )
+
+
+def _address_filter_bits(address: Address) -> int:
+    if isinstance(address, addresses.EndpointAddress):
+        key = 1 << 24 | address.bus << 16 | address.device << 8 | address.endpoint
+    else:
+        key = address.bus << 8 | address.device
+    return _filter_bits(key)
+
+
+class IndexedChunk(NamedTuple):
+    """A chunk of a capture, with a summary of the packets within it."""
+
+    chunk: pcapng_reader.Chunk
+    # Timestamps are in nanoseconds since the epoch, as the packets' timestamp_ns.
+    min_timestamp: int
+    max_timestamp: int
+    address_filter: int
+
+    @property
+    def has_packets(self) -> bool:
+        return self.min_timestamp <= self.max_timestamp
+
+    def may_contain(self, address: Address) -> bool:
+        """Check whether packets to or from the address may be in the chunk.
+
+        This can return false positives, but never false negatives.
+        """
+        bits = _address_filter_bits(address)
+        return self.address_filter & bits == bits
+
+    def overlaps(
+        self,
+        start: Optional[datetime.datetime],
+        end: Optional[datetime.datetime],
+    ) -> bool:
+        """Check whether the chunk contains packets in the given time range."""
+        if start is not None and self.max_timestamp < packet.to_nanoseconds(start):
+            return False
+        if end is not None and self.min_timestamp > packet.to_nanoseconds(end):
+            return False
+        return True
+
+
+def summarize(
+    chunk: pcapng_reader.Chunk, packets: Iterable[packet.Packet]
+) -> IndexedChunk:
+    """Build the index entry of a chunk, out of the packets decoded from it."""
+    # Start with an empty range, which is recognized by has_packets.
+    min_timestamp = 2**63 - 1
+    max_timestamp = -(2**63)
+    address_filter = 0
+    seen_addresses = set()
+    for chunk_packet in packets:
+        timestamp = chunk_packet.timestamp_ns
+        min_timestamp = min(min_timestamp, timestamp)
+        max_timestamp = max(max_timestamp, timestamp)
+
+        address_key = chunk_packet.address_key
+        if address_key not in seen_addresses:
+            seen_addresses.add(address_key)
+            endpoint_address = addresses.endpoint_from_key(address_key)
+            address_filter |= _address_filter_bits(endpoint_address)
+            address_filter |= _address_filter_bits(endpoint_address.device_address)
+
+    return IndexedChunk(chunk, min_timestamp, max_timestamp, address_filter)
+
+
+def select(
+    indexed_chunks: Iterable[IndexedChunk],
+    address: Optional[Address] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+) -> List[pcapng_reader.Chunk]:
+    """Return the chunks that may contain packets matching all the criteria."""
+    return [
+        indexed_chunk.chunk
+        for indexed_chunk in indexed_chunks
+        if indexed_chunk.has_packets
+        and indexed_chunk.overlaps(start, end)
+        and (address is None or indexed_chunk.may_contain(address))
+    ]
+
+
+def index_path(capture_path: str) -> str:
+    return capture_path + INDEX_SUFFIX
+
+
+def _file_identity(capture_stat: os.stat_result) -> Tuple[int, int]:
+    return capture_stat.st_size, capture_stat.st_mtime_ns
+
+
+def _serialize(identity: Tuple[int, int], indexed_chunks: List[IndexedChunk]) -> bytes:
+    interfaces: List[pcapng_reader.Interface] = []
+    chunk_records = []
+    previous_interfaces: Optional[Tuple[pcapng_reader.Interface, ...]] = None
+    first_interface = 0
+    for indexed_chunk in indexed_chunks:
+        chunk = indexed_chunk.chunk
+        # Consecutive chunks usually share the same interfaces, so they are
+        # only stored once.
+        if chunk.interfaces != previous_interfaces:
+            first_interface = len(interfaces)
+            interfaces.extend(chunk.interfaces)
+            previous_interfaces = chunk.interfaces
+
+        chunk_records.append(
+            _CHUNK.pack(
+                chunk.start,
+                chunk.end,
+                (chunk.endianness or "\0").encode("ascii"),
+                first_interface,
+                len(chunk.interfaces),
+                indexed_chunk.min_timestamp,
+                indexed_chunk.max_timestamp,
+                indexed_chunk.address_filter.to_bytes(_FILTER_BITS // 8, "little"),
+            )
+        )
+
+    size, mtime_ns = identity
+    return b"".join(
+        [_HEADER.pack(_MAGIC, size, mtime_ns, len(interfaces), len(chunk_records))]
+        + [
+            _INTERFACE.pack(
+                interface.link_type,
+                interface.timestamp_base,
+                interface.timestamp_exponent,
+            )
+            for interface in interfaces
+        ]
+        + chunk_records
+    )
+
+
+def _deserialize(
+    identity: Tuple[int, int], data: bytes
+) -> Optional[List[IndexedChunk]]:
+    if len(data) < _HEADER.size:
+        return None
+    magic, size, mtime_ns, interface_count, chunk_count = _HEADER.unpack_from(data)
+    if magic != _MAGIC or (size, mtime_ns) != identity:
+        return None
+    expected_size = (
+        _HEADER.size + interface_count * _INTERFACE.size + chunk_count * _CHUNK.size
+    )
+    if len(data) != expected_size:
+        return None
+
+    interfaces_offset = _HEADER.size
+    chunks_offset = interfaces_offset + interface_count * _INTERFACE.size
+    interfaces = [
+        pcapng_reader.Interface(*fields)
+        for fields in _INTERFACE.iter_unpack(data[interfaces_offset:chunks_offset])
+    ]
+
+    indexed_chunks = []
+    for (
+        start,
+        end,
+        endianness,
+        first_interface,
+        chunk_interface_count,
+        min_timestamp,
+        max_timestamp,
+        address_filter,
+    ) in _CHUNK.iter_unpack(data[chunks_offset:]):
+        last_interface = first_interface + chunk_interface_count
+        chunk = pcapng_reader.Chunk(
+            start,
+            end,
+            None if endianness == b"\0" else endianness.decode("ascii"),
+            tuple(interfaces[first_interface:last_interface]),
+        )
+        indexed_chunks.append(
+            IndexedChunk(
+                chunk,
+                min_timestamp,
+                max_timestamp,
+                int.from_bytes(address_filter, "little"),
+            )
+        )
+    return indexed_chunks
+
+
+def load(
+    capture_path: str, capture_stat: os.stat_result
+) -> Optional[List[IndexedChunk]]:
+    """Load the index of a capture, if present and still valid.
+
+    Args:
+      capture_path: The filesystem path to the capture file.
+      capture_stat: The result of os.stat() (or os.fstat()) on the capture.
+
+    Returns:
+      The list of indexed chunks, or None if the index is missing, corrupted,
+      or out of date with respect to the capture.
+    """
+    try:
+        with open(index_path(capture_path), "rb") as index_file:
+            data = index_file.read()
+    except OSError:
+        return None
+    return _deserialize(_file_identity(capture_stat), data)
+
+
+def save(
+    capture_path: str,
+    capture_stat: os.stat_result,
+    indexed_chunks: List[IndexedChunk],
+) -> bool:
+    """Store the index of a capture next to it.
+
+    Failing to write the index (for instance because the capture is in a
+    read-only directory) is not an error, as the index is just an optimization.
+
+    Args:
+      capture_path: The filesystem path to the capture file.
+      capture_stat: The result of os.stat() (or os.fstat()) on the capture, from
+        before the index was built.
+      indexed_chunks: The index to store.
+
+    Returns:
+      Whether the index was written.
+    """
+    data = _serialize(_file_identity(capture_stat), indexed_chunks)
+    try:
+        with open(index_path(capture_path), "wb") as index_file:
+            index_file.write(data)
+    except OSError as error:
+        logging.debug("Unable to write index for %s: %s", capture_path, error)
+        return False
+    return True
@@ -18,33 +18,272 @@
 # SPDX-License-Identifier: Apache-2.0
 """Abstraction to work with a collection of captured packets."""
 
+import array
+import bisect
 import datetime
+import heapq
 import itertools
 import logging
-from typing import Dict, Iterator, List, Mapping, Optional
+import typing
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from usbmon import addresses, constants, descriptors, packet
 
-_MAX_CALLBACK_ANTICIPATION = datetime.timedelta(seconds=0.2)
+_MAX_CALLBACK_ANTICIPATION_NS = 200_000_000
+
+# Packets are stored in the order their URB completed, which is only a little
+# off from their timestamp order, except for long-pending URBs.
+_DEFAULT_REORDER_WINDOW = datetime.timedelta(seconds=1)
+
+
+def _to_nanoseconds(delta: datetime.timedelta) -> int:
+    return delta // datetime.timedelta(microseconds=1) * 1000
+
+
+def _reorder(
+    packets: typing.Callable[[], Iterable[packet.Packet]], window: datetime.timedelta
+) -> Iterator[packet.Packet]:
+    """Yield the provided packets in timestamp order.
+
+    This expects the packets to be mostly sorted already: any packet that is not
+    more than window older than the most recent one seen before it is sorted
+    through a heap that only holds the packets within the window.
+
+    Packets further out of place are collected in a first pass over the input,
+    sorted separately, and merged with the rest. The result is the same as a
+    stable sort of the whole input.
+
+    Args:
+      packets: A callable returning the packets to sort, called twice.
+      window: How far out of order the packets are expected to be.
+    """
+    window_ns = _to_nanoseconds(window)
+    late_packets: List[Tuple[int, int, packet.Packet]] = []
+    newest: Optional[int] = None
+    for sequence, current_packet in enumerate(packets()):
+        timestamp = current_packet.timestamp_ns
+        if newest is None or timestamp > newest:
+            newest = timestamp
+        elif timestamp < newest - window_ns:
+            late_packets.append((timestamp, sequence, current_packet))
+    late_packets.sort(key=lambda entry: entry[:2])
+    late_sequences = {sequence for _, sequence, _ in late_packets}
+
+    def in_window() -> Iterator[Tuple[int, int, packet.Packet]]:
+        pending: List[Tuple[int, int, packet.Packet]] = []
+        newest: Optional[int] = None
+        for sequence, current_packet in enumerate(packets()):
+            if sequence in late_sequences:
+                continue
+            timestamp = current_packet.timestamp_ns
+            if newest is None or timestamp > newest:
+                newest = timestamp
+            heapq.heappush(pending, (timestamp, sequence, current_packet))
+            while pending[0][0] < newest - window_ns:
+                yield heapq.heappop(pending)
+        while pending:
+            yield heapq.heappop(pending)
+
+    for _, _, sorted_packet in heapq.merge(
+        in_window(), late_packets, key=lambda entry: entry[:2]
+    ):
+        yield sorted_packet
+
+
+Address = typing.Union[addresses.DeviceAddress, addresses.EndpointAddress]
+
+
+def _matches_address(captured_packet: packet.Packet, address: Address) -> bool:
+    if isinstance(address, addresses.EndpointAddress):
+        return captured_packet.address_key == address.key
+    return captured_packet.device_key == address.key
+
+
+class _SlicePart(typing.NamedTuple):
+    """The packets of a _PairIndex within a time range, in timestamp order."""
+
+    pairs: List[packet.PacketPair]
+    packets: List[packet.Packet]
+    packet_pairs: Sequence[int]
+
+
+class _PairIndex:
+    """A list of pairs, indexed by device address, endpoint address and tag.
+
+    The indexes hold the positions of the pairs in the list, in order, keyed by
+    packed addresses (see usbmon.addresses.pack()) and by the tag of the pairs
+    once matched.
+
+    The packets of the pairs are also kept sorted by timestamp, together with
+    the position of their pair, so that time ranges are found by bisecting.
+    Packets with the same timestamp stay in the order they were added in.
+
+    Pairs complete out of timestamp order, long-pending URBs in particular, so
+    keeping the packets sorted as they are added would mean inserting far from
+    the end. Instead, they are appended, and sorted again when a time range is
+    next looked up: the packets are still mostly sorted, which sorting handles
+    in close to linear time.
+    """
+
+    def __init__(self, pairs: List[packet.PacketPair]):
+        self.pairs = pairs
+        self._by_device: Dict[int, List[int]] = {}
+        self._by_endpoint: Dict[int, List[int]] = {}
+        self._by_tag: Dict[int, List[int]] = {}
+        # The packets, and the position of their pair, in the order added.
+        self._packets: List[packet.Packet] = []
+        self._packet_pairs = array.array("q")
+        # The same, sorted by timestamp, as of the last time range lookup.
+        self._sorted_timestamps = array.array("q")
+        self._sorted_packets: List[packet.Packet] = []
+        self._sorted_packet_pairs = array.array("q")
+        for position, pair in enumerate(pairs):
+            self._index(position, pair)
+
+    def _index(self, position: int, pair: packet.PacketPair) -> None:
+        # Both packets of a pair share the URB's address and tag.
+        first, second = pair
+        self._by_device.setdefault(first.device_key, []).append(position)
+        self._by_endpoint.setdefault(first.address_key, []).append(position)
+        self._by_tag.setdefault(first.tag, []).append(position)
+
+        self._packets.append(first)
+        self._packet_pairs.append(position)
+        if second is not None:
+            self._packets.append(second)
+            self._packet_pairs.append(position)
+
+    def _sort_packets(self) -> None:
+        if len(self._sorted_packets) == len(self._packets):
+            return
+        packets = self._packets
+        order = sorted(range(len(packets)), key=lambda i: packets[i].timestamp_ns)
+        self._sorted_packets = [packets[i] for i in order]
+        self._sorted_timestamps = array.array(
+            "q", (sorted_packet.timestamp_ns for sorted_packet in self._sorted_packets)
+        )
+        self._sorted_packet_pairs = array.array(
+            "q", (self._packet_pairs[i] for i in order)
+        )
+
+    def time_slice(self, start_ns: Optional[int], end_ns: Optional[int]) -> _SlicePart:
+        """Return the packets between start and end, inclusive."""
+        self._sort_packets()
+        timestamps = self._sorted_timestamps
+        low = 0 if start_ns is None else bisect.bisect_left(timestamps, start_ns)
+        high = (
+            len(timestamps)
+            if end_ns is None
+            else bisect.bisect_right(timestamps, end_ns)
+        )
+        return _SlicePart(
+            self.pairs,
+            self._sorted_packets[low:high],
+            self._sorted_packet_pairs[low:high],
+        )
+
+    def append(self, pair: packet.PacketPair) -> None:
+        self._index(len(self.pairs), pair)
+        self.pairs.append(pair)
+
+    def _at(self, positions: Optional[List[int]]) -> Iterator[packet.PacketPair]:
+        pairs = self.pairs
+        for position in positions or ():
+            yield pairs[position]
+
+    def for_address(self, address: Address) -> Iterator[packet.PacketPair]:
+        if isinstance(address, addresses.EndpointAddress):
+            return self._at(self._by_endpoint.get(address.key))
+        return self._at(self._by_device.get(address.key))
+
+    def for_tag(self, tag: int) -> Iterator[packet.PacketPair]:
+        return self._at(self._by_tag.get(tag))
+
+
+class TimeSlice:
+    """The packets of a session captured within a time range.
+
+    As returned by Session.between() and Session.around(), this supports the
+    same iteration as the session itself. Pairs are part of the slice if either
+    of their packets is. Packets added to the session after the slice was taken
+    are not part of it.
+    """
+
+    def __init__(
+        self,
+        parts: Sequence[_SlicePart],
+        unmatched_packets: Sequence[packet.Packet],
+    ):
+        self._parts = parts
+        self._unmatched_packets = unmatched_packets
+
+    def in_order(self) -> Iterator[packet.Packet]:
+        """Yield the packets in the slice, in their timestamp order."""
+        sorted_parts: List[Iterable[packet.Packet]] = [
+            part.packets for part in self._parts
+        ]
+        sorted_parts.append(
+            sorted(
+                self._unmatched_packets, key=lambda unmatched: unmatched.timestamp_ns
+            )
+        )
+        return heapq.merge(*sorted_parts, key=lambda merged: merged.timestamp_ns)
+
+    def __iter__(self) -> Iterator[packet.Packet]:
+        return self.in_order()
+
+    def in_pairs(self) -> Iterator[packet.PacketPair]:
+        """Yield the pairs in the slice, in the same order as Session.in_pairs()."""
+        for part in self._parts:
+            for position in sorted(set(part.packet_pairs)):
+                yield part.pairs[position]
+        for unmatched_packet in self._unmatched_packets:
+            yield (unmatched_packet, None)
+
+    def pairs_for(self, address: Address) -> Iterator[packet.PacketPair]:
+        """Yield the pairs in the slice to or from a device or endpoint address."""
+        for pair in self.in_pairs():
+            if _matches_address(pair[0], address):
+                yield pair
 
 
 class Session:
-    def __init__(self, retag_urbs: bool = True):
+    def __init__(
+        self,
+        retag_urbs: bool = True,
+        max_pending_age: Optional[datetime.timedelta] = None,
+    ):
         """Initialize the capture session.
 
         Args:
           retag_urbs: Whether to replace URB tags with sequence numbers.
+          max_pending_age: If provided, events still waiting for their match
+            after this much capture time are expired, and reported on their own.
         """
         self._packet_pairs: List[packet.PacketPair] = []
+        self._pair_index = _PairIndex(self._packet_pairs)
         self._submitted_packets: Dict[int, packet.Packet] = {}
         self._next_tag = 0
         self._retag_urbs: bool = retag_urbs
 
+        self._max_pending_age_ns = (
+            _to_nanoseconds(max_pending_age) if max_pending_age is not None else None
+        )
+        # Heap of (timestamp, sequence, packet) for the pending events, used to
+        # find the expired ones. Entries for events that have been matched in
+        # the meantime are left in place, and skipped once they surface.
+        self._pending_expiry: List[Tuple[int, int, packet.Packet]] = []
+        self._pending_sequence = itertools.count()
+        self._expired_count = 0
+        self._stuck_count = 0
+
         self._device_descriptors: Optional[
             Dict[addresses.DeviceAddress, descriptors.DeviceDescriptor]
         ] = None
 
-    def _append(self, first: packet.Packet, second: Optional[packet.Packet]) -> None:
+    def _complete(
+        self, first: packet.Packet, second: Optional[packet.Packet]
+    ) -> packet.PacketPair:
         if self._retag_urbs:
             # The original URB IDs are not as unique as they should be. Instead, we
             # apply an incremental sequence number. This allows for unique package
@@ -55,17 +294,17 @@ class Session:
             first.tag = tag
             if second is not None:
                 second.tag = tag
-        self._packet_pairs.append((first, second))
+        return (first, second)
 
-    def add(self, packet: packet.Packet) -> None:
-        """Add a packet to the session, matching with its previous event."""
+    def _match(self, packet: packet.Packet) -> Iterator[packet.PacketPair]:
+        """Match a packet with its previous event, yielding any completed pair."""
 
         # Events can be in either S;E, S;C, or C;S order. So we just keep a
         # "previous" packet for each tag, and once we matched two we reset the
         # URB.
         if packet.tag in self._submitted_packets:
             first = self._submitted_packets.pop(packet.tag)
-            time_distance = abs(first.timestamp - packet.timestamp)
+            time_distance = abs(first.timestamp_ns - packet.timestamp_ns)
 
             # Unfortunately, since the promise of the ID being unique is not
             # maintained by Linux, there may be false matches. To reduce the
@@ -73,38 +312,170 @@ class Session:
             # their matching S event.
             if (
                 first.type == constants.PacketType.CALLBACK
-                and time_distance > _MAX_CALLBACK_ANTICIPATION
+                and time_distance > _MAX_CALLBACK_ANTICIPATION_NS
             ):
                 logging.debug(
-                    "Callback (%r) arrived long before submit (%r): %s",
+                    "Callback (%r) arrived long before submit (%r): %dns",
                     first,
                     packet,
                     time_distance,
                 )
-                self._append(first, None)
-                self._submitted_packets[packet.tag] = packet
+                yield self._complete(first, None)
+                self._set_pending(packet)
             else:
-                self._append(first, packet)
+                yield self._complete(first, packet)
         else:
-            self._submitted_packets[packet.tag] = packet
+            self._set_pending(packet)
+
+        if self._max_pending_age_ns is not None:
+            yield from self._expire(packet.timestamp_ns - self._max_pending_age_ns)
+
+    def _set_pending(self, packet: packet.Packet) -> None:
+        self._submitted_packets[packet.tag] = packet
+        if self._max_pending_age_ns is not None:
+            heapq.heappush(
+                self._pending_expiry,
+                (packet.timestamp_ns, next(self._pending_sequence), packet),
+            )
+
+    def _expire(self, deadline_ns: int) -> Iterator[packet.PacketPair]:
+        """Yield the pending events captured before the deadline as singletons."""
+        while self._pending_expiry and self._pending_expiry[0][0] < deadline_ns:
+            _, _, pending_packet = heapq.heappop(self._pending_expiry)
+            if self._submitted_packets.get(pending_packet.tag) is not pending_packet:
+                continue  # Matched in the meantime.
+
+            del self._submitted_packets[pending_packet.tag]
+            self._expired_count += 1
+            if pending_packet.type == constants.PacketType.SUBMISSION:
+                self._stuck_count += 1
+                logging.debug("URB never completed: %r", pending_packet)
+            yield (pending_packet, None)
+
+    @property
+    def expired_count(self) -> int:
+        """Number of events that expired without being matched."""
+        return self._expired_count
+
+    @property
+    def stuck_count(self) -> int:
+        """Number of submitted URBs that expired without being completed."""
+        return self._stuck_count
+
+    def add(self, packet: packet.Packet) -> None:
+        """Add a packet to the session, matching with its previous event."""
+        for pair in self._match(packet):
+            self._pair_index.append(pair)
+
+    def stream(self, packets: Iterable[packet.Packet]) -> Iterator[packet.PacketPair]:
+        """Match the provided packets, yielding each pair as soon as it completes.
+
+        Unlike add(), the pairs are not retained in the session, only the events
+        still waiting for their match are, so that arbitrarily long captures
+        can be processed in constant memory. Once the packets are exhausted, the
+        unmatched ones are yielded on their own.
+
+        Device descriptors are collected as the pairs are yielded, and are
+        available through device_descriptors afterwards.
+        """
+        if self._device_descriptors is None:
+            self._scan_for_descriptors()
+        assert self._device_descriptors is not None
+
+        for captured_packet in packets:
+            for pair in self._match(captured_packet):
+                self._record_descriptor(pair)
+                yield pair
+
+        unmatched_packets = list(self._submitted_packets.values())
+        self._submitted_packets.clear()
+        self._pending_expiry.clear()
+        for unmatched_packet in unmatched_packets:
+            yield (unmatched_packet, None)
 
     def in_pairs(self) -> Iterator[packet.PacketPair]:
         yield from self._packet_pairs
         for unmatched_packet in self._submitted_packets.values():
             yield (unmatched_packet, None)
 
+    def pairs_for(self, address: Address) -> Iterator[packet.PacketPair]:
+        """Yield the pairs to or from a device or endpoint address.
+
+        The pairs are looked up in an index kept as packets are added, in the
+        same order as in_pairs(), rather than going through all of them.
+        """
+        yield from self._pair_index.for_address(address)
+        for unmatched_packet in self._submitted_packets.values():
+            if _matches_address(unmatched_packet, address):
+                yield (unmatched_packet, None)
+
+    def pairs_for_tag(self, tag: int) -> Iterator[packet.PacketPair]:
+        """Yield the pairs with the provided URB tag.
+
+        Unless URBs are retagged, the same tag can be reused by more than one
+        URB over a capture.
+        """
+        yield from self._pair_index.for_tag(tag)
+        unmatched_packet = self._submitted_packets.get(tag)
+        if unmatched_packet is not None:
+            yield (unmatched_packet, None)
+
+    def _pair_indexes(self) -> List[_PairIndex]:
+        """The indexes of the pairs, in the order in_pairs() yields them."""
+        return [self._pair_index]
+
+    def between(
+        self,
+        start: Optional[datetime.datetime],
+        end: Optional[datetime.datetime],
+    ) -> TimeSlice:
+        """Return the part of the session captured between start and end.
+
+        The bounds are inclusive, and either can be None to leave the range open
+        on that side. The packets are looked up by bisecting a sorted index kept
+        as they are added, rather than going through all of them.
+        """
+        start_ns = None if start is None else packet.to_nanoseconds(start)
+        end_ns = None if end is None else packet.to_nanoseconds(end)
+        parts = [index.time_slice(start_ns, end_ns) for index in self._pair_indexes()]
+        unmatched_packets = [
+            unmatched_packet
+            for unmatched_packet in self._submitted_packets.values()
+            if (start_ns is None or unmatched_packet.timestamp_ns >= start_ns)
+            and (end_ns is None or unmatched_packet.timestamp_ns <= end_ns)
+        ]
+        return TimeSlice(parts, unmatched_packets)
+
+    def around(
+        self, timestamp: datetime.datetime, window: datetime.timedelta
+    ) -> TimeSlice:
+        """Return the part of the session captured within window of timestamp."""
+        return self.between(timestamp - window, timestamp + window)
+
+    def _record_descriptor(self, pair: packet.PacketPair) -> None:
+        assert self._device_descriptors is not None
+        descriptor = descriptors.search_device_descriptor(pair)
+        if descriptor:
+            self._device_descriptors[descriptor.address] = descriptor
+
     def _scan_for_descriptors(self) -> None:
         self._device_descriptors = {}
         for pair in self.in_pairs():
-            descriptor = descriptors.search_device_descriptor(pair)
-            if descriptor:
-                self._device_descriptors[descriptor.address] = descriptor
+            self._record_descriptor(pair)
 
-    def in_order(self) -> Iterator[packet.Packet]:
-        """Yield the packets in their timestamp order."""
-        yield from sorted(
-            filter(None, itertools.chain(*self.in_pairs())),
-            key=lambda x: x.timestamp,
+    def in_order(
+        self, window: datetime.timedelta = _DEFAULT_REORDER_WINDOW
+    ) -> Iterator[packet.Packet]:
+        """Yield the packets in their timestamp order.
+
+        Args:
+          window: How far from their timestamp order the packets are expected to
+            be stored. Packets within the window are reordered in a streaming
+            fashion, the others are sorted separately, and merged back.
+        """
+        return _reorder(
+            lambda: filter(None, itertools.chain.from_iterable(self.in_pairs())),
+            window,
         )
 
     def __iter__(self) -> Iterator[packet.Packet]:
@@ -113,7 +484,7 @@ class Session:
     @property
     def device_descriptors(
         self,
-    ) -> Mapping[addresses.DeviceAddress, descriptors.DeviceDescriptor]:
+    ) -> typing.Mapping[addresses.DeviceAddress, descriptors.DeviceDescriptor]:
         if self._device_descriptors is None:
             self._scan_for_descriptors()
         assert self._device_descriptors is not None
@@ -0,0 +1,182 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Transparent decompression of archived captures.
+
+Captures compressed with gzip, xz or zstd are recognized by their magic bytes,
+rather than their file name, so that they can be read from any stream. They are
+decompressed on background threads, through a usbmon.pipeline.Pipeline: one
+thread reads the compressed data, and another decompresses it, ahead of the
+packets being decoded. Reading zstd-compressed captures requires the zstandard
+module.
+"""
+
+import functools
+import gzip
+import io
+import lzma
+from typing import BinaryIO, Iterator, Optional, cast
+
+from usbmon import pipeline
+
+GZIP = "gzip"
+XZ = "xz"
+ZSTD = "zstd"
+
+_MAGICS = {
+    GZIP: b"\x1f\x8b",
+    XZ: b"\xfd7zXZ\x00",
+    ZSTD: b"\x28\xb5\x2f\xfd",
+}
+_MAGIC_SIZE = max(len(magic) for magic in _MAGICS.values())
+
+
+def detect(stream: BinaryIO) -> Optional[str]:
+    """Identify the compression of the provided stream from its magic bytes.
+
+    The stream is not consumed: the magic is either peeked, for buffered
+    streams, or read and then seeked back over.
+
+    Returns:
+      One of GZIP, XZ or ZSTD, or None if the stream is not compressed, or
+      cannot be inspected without consuming it.
+    """
+    peek = getattr(stream, "peek", None)
+    if peek is not None:
+        magic = peek(_MAGIC_SIZE)[:_MAGIC_SIZE]
+    elif stream.seekable():
+        position = stream.tell()
+        magic = stream.read(_MAGIC_SIZE)
+        stream.seek(position)
+    else:
+        return None
+
+    for compression, compression_magic in _MAGICS.items():
+        if magic.startswith(compression_magic):
+            return compression
+    return None
+
+
+def _open_decompressor(compression: str, stream: BinaryIO) -> BinaryIO:
+    if compression == GZIP:
+        return cast(BinaryIO, gzip.GzipFile(fileobj=stream, mode="rb"))
+    elif compression == XZ:
+        return cast(BinaryIO, lzma.LZMAFile(stream))
+
+    try:
+        import zstandard
+    except ImportError as error:
+        raise ImportError(
+            "Reading zstd-compressed captures requires the zstandard module."
+        ) from error
+    return cast(
+        BinaryIO,
+        zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True),
+    )
+
+
+def _decompress(compression: str, chunk_size: int, stream: BinaryIO) -> Iterator[bytes]:
+    decompressor = _open_decompressor(compression, stream)
+    while True:
+        chunk = decompressor.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class DecompressedStream(io.RawIOBase):
+    """A stream over a compressed capture, decompressed on background threads.
+
+    Closing this stream stops the background threads, but leaves the
+    compressed stream open.
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        compression: str,
+        chunk_size: int = pipeline.DEFAULT_CHUNK_SIZE,
+        queue_size: int = pipeline.DEFAULT_QUEUE_SIZE,
+    ):
+        """Start decompressing the provided stream.
+
+        Args:
+          stream: The compressed stream, from its current position.
+          compression: The compression of the stream, as returned by detect().
+          chunk_size: How many bytes to read and decompress at a time.
+          queue_size: How many chunks to read, and decompress, ahead of the
+            consumer.
+        """
+        super().__init__()
+        self.compression = compression
+        self._pipeline = pipeline.Pipeline(
+            stream,
+            functools.partial(_decompress, compression, chunk_size),
+            chunk_size,
+            queue_size,
+            batch_size=1,
+        )
+        self._chunks = iter(self._pipeline)
+        self._chunk = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._chunk:
+            chunk = next(self._chunks, b"")
+            if not chunk:
+                return 0
+            self._chunk = memoryview(chunk)
+
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    def close(self) -> None:
+        self._pipeline.close()
+        super().close()
+
+
+def open_stream(
+    stream: BinaryIO,
+    chunk_size: int = pipeline.DEFAULT_CHUNK_SIZE,
+    queue_size: int = pipeline.DEFAULT_QUEUE_SIZE,
+) -> BinaryIO:
+    """Decompress the provided stream on the fly, if it is compressed.
+
+    Args:
+      stream: The stream to read a capture from, at its current position.
+      chunk_size: How many bytes to read and decompress at a time.
+      queue_size: How many chunks to read, and decompress, ahead of the
+        consumer.
+
+    Returns:
+      A buffered DecompressedStream if the stream is compressed, to be closed
+      once done, or the stream itself otherwise.
+    """
+    compression = detect(stream)
+    if compression is None:
+        return stream
+    return cast(
+        BinaryIO,
+        io.BufferedReader(
+            DecompressedStream(stream, compression, chunk_size, queue_size)
+        ),
+    )
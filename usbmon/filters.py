@@ -0,0 +1,588 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Filters on captured packets, checked before the packets are decoded.
+
+A PacketFilter is matched against the fixed-offset header fields of each
+captured record, so that the packets it rejects are never built.
+
+A FilterExpression is a filter written as text, such as:
+
+    bus==1 and dev in (5, 7) and xfer==BULK and dir==IN and len>64 and status<0
+
+The expression is parsed once, and compiled both into a predicate on single
+packets and into a mask over a usbmon.batch.PacketBatch.
+"""
+
+import dataclasses
+import datetime
+import re
+import struct
+import typing
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from usbmon import addresses, constants, packet
+
+if typing.TYPE_CHECKING:
+    import numpy
+
+    from usbmon import batch
+
+# Transfer type, endpoint, device, bus, and timestamp seconds and microseconds
+# from the usbmon header, as laid out in usbmon.capture.usbmon_mmap.
+_USBMON_FIELDS = {
+    endianness: struct.Struct(endianness + "9xBBBH2xqi") for endianness in ("<", ">")
+}
+# Bus, device, endpoint and transfer type from the USBPcap header, as laid out
+# in usbmon.capture.usbpcap.
+_USBPCAP_FIELDS = struct.Struct("<17xHHBB")
+
+# Packet type, transfer type, endpoint, device, bus, status and length from the
+# usbmon header, for filter expressions.
+_USBMON_EXPRESSION_FIELDS = {
+    endianness: struct.Struct(endianness + "8xBBBBH14xiI") for endianness in ("<", ">")
+}
+# Status, IRP information, bus, device, endpoint, transfer type and length from
+# the USBPcap header, for filter expressions.
+_USBPCAP_EXPRESSION_FIELDS = struct.Struct("<10xI2xBHHBBI")
+_USBPCAP_CONTROL_STAGE_OFFSET = _USBPCAP_EXPRESSION_FIELDS.size
+
+_SUBMISSION = ord(constants.PacketType.SUBMISSION.value)
+_CALLBACK = ord(constants.PacketType.CALLBACK.value)
+
+_DIRECTION_BITS = {constants.Direction.OUT: 0x00, constants.Direction.IN: 0x80}
+
+
+class FilterSyntaxError(ValueError):
+    """Raised when a filter expression cannot be parsed."""
+
+
+# The fields filter expressions can test, in the order the compiled predicates
+# take them as arguments. All of them are integers.
+_EXPRESSION_FIELDS = ("bus", "dev", "ep", "xfer", "dir", "type", "len", "status")
+
+_FIELD_ALIASES = {
+    "device": "dev",
+    "endpoint": "ep",
+    "direction": "dir",
+    "length": "len",
+}
+
+# Symbolic values accepted for some of the fields, with their integer value.
+_FIELD_SYMBOLS: Dict[str, Dict[str, int]] = {
+    "xfer": {xfer_type.name: xfer_type.value for xfer_type in constants.XferType},
+    "dir": {"OUT": 0, "IN": 1},
+    "type": {
+        **{
+            packet_type.name: ord(packet_type.value)
+            for packet_type in constants.PacketType
+        },
+        **{
+            packet_type.value: ord(packet_type.value)
+            for packet_type in constants.PacketType
+        },
+    },
+}
+
+_COMPARISONS = ("==", "!=", "<", "<=", ">", ">=")
+
+_TOKEN = re.compile(
+    r"\s*(?:(?P<number>-?(?:0[xX][0-9a-fA-F]+|[0-9]+))"
+    r"|(?P<name>[A-Za-z_][A-Za-z_0-9]*)"
+    r"|(?P<punctuation>==|!=|<=|>=|<|>|\(|\)|,))"
+)
+
+# The parsed expression, as nested tuples:
+#  ("or", [node, ...]), ("and", [node, ...]), ("not", node),
+#  ("compare", field, operator, value), ("in", field, (value, ...), negated).
+_Node = Tuple[Any, ...]
+
+
+class _Parser:
+    """Recursive descent parser for filter expressions."""
+
+    def __init__(self, text: str):
+        self._text = text
+        self._tokens = list(self._tokenize(text))
+        self._position = 0
+
+    def _tokenize(self, text: str) -> Iterator[Tuple[str, str]]:
+        position = 0
+        text = text.rstrip()
+        while position < len(text):
+            match = _TOKEN.match(text, position)
+            if not match:
+                raise FilterSyntaxError(
+                    f"Unexpected character {text[position:].lstrip()[0]!r} in"
+                    f" filter {self._text!r}"
+                )
+            kind = match.lastgroup
+            assert kind is not None
+            yield kind, match.group(kind)
+            position = match.end()
+
+    def _peek(self) -> Optional[str]:
+        if self._position < len(self._tokens):
+            return self._tokens[self._position][1]
+        return None
+
+    def _next(self, expected: str) -> Tuple[str, str]:
+        if self._position >= len(self._tokens):
+            raise FilterSyntaxError(
+                f"Expected {expected} at end of filter {self._text!r}"
+            )
+        token = self._tokens[self._position]
+        self._position += 1
+        return token
+
+    def _expect(self, punctuation: str) -> None:
+        _, value = self._next(repr(punctuation))
+        if value != punctuation:
+            raise FilterSyntaxError(
+                f"Expected {punctuation!r}, found {value!r} in filter {self._text!r}"
+            )
+
+    def parse(self) -> _Node:
+        node = self._or()
+        if self._position < len(self._tokens):
+            raise FilterSyntaxError(
+                f"Unexpected {self._peek()!r} in filter {self._text!r}"
+            )
+        return node
+
+    def _or(self) -> _Node:
+        operands = [self._and()]
+        while self._peek() == "or":
+            self._position += 1
+            operands.append(self._and())
+        return operands[0] if len(operands) == 1 else ("or", operands)
+
+    def _and(self) -> _Node:
+        operands = [self._not()]
+        while self._peek() == "and":
+            self._position += 1
+            operands.append(self._not())
+        return operands[0] if len(operands) == 1 else ("and", operands)
+
+    def _not(self) -> _Node:
+        if self._peek() == "not":
+            self._position += 1
+            return ("not", self._not())
+        if self._peek() == "(":
+            self._position += 1
+            node = self._or()
+            self._expect(")")
+            return node
+        return self._comparison()
+
+    def _comparison(self) -> _Node:
+        kind, name = self._next("a field name")
+        field = _FIELD_ALIASES.get(name, name)
+        if kind != "name" or field not in _EXPRESSION_FIELDS:
+            raise FilterSyntaxError(
+                f"Unknown field {name!r} in filter {self._text!r}; expected one of"
+                f" {', '.join(_EXPRESSION_FIELDS)}"
+            )
+
+        _, operator = self._next("a comparison")
+        negated = False
+        if operator == "not":
+            negated = True
+            _, operator = self._next("'in'")
+            if operator != "in":
+                raise FilterSyntaxError(
+                    f"Expected 'in' after 'not', found {operator!r} in filter"
+                    f" {self._text!r}"
+                )
+        if operator == "in":
+            self._expect("(")
+            values = [self._value(field)]
+            while self._peek() == ",":
+                self._position += 1
+                values.append(self._value(field))
+            self._expect(")")
+            return ("in", field, tuple(values), negated)
+        if operator not in _COMPARISONS:
+            raise FilterSyntaxError(
+                f"Expected a comparison after {name!r}, found {operator!r} in"
+                f" filter {self._text!r}"
+            )
+        return ("compare", field, operator, self._value(field))
+
+    def _value(self, field: str) -> int:
+        kind, value = self._next("a value")
+        if kind == "number":
+            # Addresses are printed zero-padded (1:005), so these are decimal
+            # unless explicitly hexadecimal.
+            return int(value, 16 if value.lower().lstrip("-").startswith("0x") else 10)
+        symbols = _FIELD_SYMBOLS.get(field, {})
+        if kind == "name" and value.upper() in symbols:
+            return symbols[value.upper()]
+        raise FilterSyntaxError(
+            f"Invalid value {value!r} for field {field!r} in filter {self._text!r}"
+        )
+
+
+def _scalar_code(node: _Node) -> str:
+    kind = node[0]
+    if kind in ("or", "and"):
+        return "(" + f" {kind} ".join(_scalar_code(child) for child in node[1]) + ")"
+    if kind == "not":
+        return f"(not {_scalar_code(node[1])})"
+    if kind == "in":
+        _, field, values, negated = node
+        operator = "not in" if negated else "in"
+        # Constant set displays are compiled into frozensets.
+        members = ", ".join(repr(value) for value in sorted(set(values)))
+        return f"({field} {operator} {{{members}}})"
+    _, field, operator, value = node
+    return f"({field} {operator} {value!r})"
+
+
+def _vector_code(node: _Node) -> str:
+    kind = node[0]
+    if kind in ("or", "and"):
+        operator = " | " if kind == "or" else " & "
+        return "(" + operator.join(_vector_code(child) for child in node[1]) + ")"
+    if kind == "not":
+        return f"(~{_vector_code(node[1])})"
+    if kind == "in":
+        _, field, values, negated = node
+        return f"isin({field}, {list(values)!r}, invert={negated!r})"
+    _, field, operator, value = node
+    return f"({field} {operator} {value!r})"
+
+
+def _compile(code: str, namespace: Dict[str, Any]) -> Callable[..., Any]:
+    # The code is generated from the parsed expression, so it only ever refers
+    # to the fields, integer constants and the provided namespace.
+    return eval(
+        f"lambda {', '.join(_EXPRESSION_FIELDS)}: {code}",
+        {"__builtins__": {}, **namespace},
+    )
+
+
+class FilterExpression:
+    """A filter on packets, parsed from its text form.
+
+    Expressions combine comparisons with "and", "or", "not" and parentheses.
+    Comparisons are either FIELD OP VALUE, with OP one of ==, !=, <, <=, >, >=,
+    or FIELD [not] in (VALUE, ...). The fields are:
+
+      bus, dev (device), ep (endpoint): the packet's address.
+      xfer: the transfer type, either a number or ISOCHRONOUS, INTERRUPT,
+        CONTROL or BULK.
+      dir (direction): IN or OUT.
+      type: S (SUBMISSION), C (CALLBACK) or E (ERROR).
+      len (length): the transfer's requested length.
+      status: the URB status.
+    """
+
+    def __init__(self, text: str):
+        """Parse and compile an expression.
+
+        Raises:
+          FilterSyntaxError: if the expression is not valid.
+        """
+        self.text = text
+        self._tree = _Parser(text).parse()
+        self._predicate: Callable[..., bool] = _compile(_scalar_code(self._tree), {})
+        self._vector_predicate: Optional[Callable[..., "numpy.ndarray"]] = None
+
+    def __repr__(self) -> str:
+        return f"FilterExpression({self.text!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, FilterExpression):
+            return NotImplemented
+        return self._tree == other._tree
+
+    def __hash__(self) -> int:
+        return hash(_scalar_code(self._tree))
+
+    def _required(self, field: str) -> Optional[int]:
+        """Return the value a field is compared equal to in all matches, if any."""
+        conditions = self._tree[1] if self._tree[0] == "and" else [self._tree]
+        for condition in conditions:
+            if condition[:3] == ("compare", field, "=="):
+                return condition[3]
+        return None
+
+    @property
+    def address(
+        self,
+    ) -> Optional[Union[addresses.DeviceAddress, addresses.EndpointAddress]]:
+        """The device or endpoint address all matching packets share, if any."""
+        bus, device, endpoint = (
+            self._required(field) for field in ("bus", "dev", "ep")
+        )
+        if bus is None or device is None:
+            return None
+        if endpoint is None:
+            return addresses.DeviceAddress(bus, device)
+        return addresses.EndpointAddress(bus, device, endpoint)
+
+    def matches_usbmon(
+        self, endianness: str, data: Union[bytes, memoryview], offset: int = 0
+    ) -> bool:
+        """Check a usbmon packet, from its binary representation.
+
+        Args:
+          endianness: The struct-style byte order of the packet.
+          data: The buffer holding the packet.
+          offset: The offset of the packet within data.
+        """
+        (
+            packet_type,
+            xfer_type,
+            epnum,
+            device,
+            bus,
+            status,
+            length,
+        ) = _USBMON_EXPRESSION_FIELDS[endianness].unpack_from(data, offset)
+        return self._predicate(
+            bus,
+            device,
+            epnum & 0x7F,
+            xfer_type,
+            epnum >> 7,
+            packet_type,
+            length,
+            status,
+        )
+
+    def matches_usbpcap(self, data: Union[bytes, memoryview], offset: int = 0) -> bool:
+        """Check a USBPcap packet, from its binary representation.
+
+        Args:
+          data: The buffer holding the packet.
+          offset: The offset of the packet within data.
+        """
+        (
+            status,
+            info,
+            bus,
+            device,
+            epnum,
+            xfer_type,
+            length,
+        ) = _USBPCAP_EXPRESSION_FIELDS.unpack_from(data, offset)
+        # As in usbmon.capture.usbpcap, the setup packet does not count towards
+        # the length of control transfers.
+        if (
+            xfer_type == constants.XferType.CONTROL
+            and data[offset + _USBPCAP_CONTROL_STAGE_OFFSET] == 0
+        ):
+            length -= 8
+        packet_type = _CALLBACK if info == 0x01 else _SUBMISSION
+        return self._predicate(
+            bus,
+            device,
+            epnum & 0x7F,
+            xfer_type,
+            epnum >> 7,
+            packet_type,
+            length,
+            status,
+        )
+
+    def matches(self, decoded_packet: packet.Packet) -> bool:
+        """Check an already decoded packet."""
+        epnum = decoded_packet.epnum
+        return self._predicate(
+            decoded_packet.busnum,
+            decoded_packet.devnum,
+            epnum & 0x7F,
+            decoded_packet.xfer_type,
+            epnum >> 7,
+            ord(decoded_packet.type.value),
+            decoded_packet.length,
+            decoded_packet.status,
+        )
+
+    def mask(self, packet_batch: "batch.PacketBatch") -> "numpy.ndarray":
+        """Return the mask of the packets in a batch that match the expression."""
+        import numpy
+
+        if self._vector_predicate is None:
+            self._vector_predicate = _compile(
+                _vector_code(self._tree), {"isin": numpy.isin}
+            )
+        epnum = packet_batch.epnum
+        mask = self._vector_predicate(
+            packet_batch.busnum,
+            packet_batch.devnum,
+            epnum & 0x7F,
+            packet_batch.xfer_type,
+            epnum >> 7,
+            packet_batch.type,
+            # Widened, so that comparisons with negative values hold.
+            packet_batch.length.astype(numpy.int64),
+            packet_batch.status,
+        )
+        return numpy.broadcast_to(mask, (len(packet_batch),))
+
+
+@dataclasses.dataclass(frozen=True)
+class PacketFilter:
+    """Criteria that packets need to match all of, to be included.
+
+    Criteria left as None match any packet. The start and end of the time range
+    are both inclusive.
+    """
+
+    bus: Optional[int] = None
+    device: Optional[int] = None
+    endpoint: Optional[int] = None
+    xfer_type: Optional[constants.XferType] = None
+    direction: Optional[constants.Direction] = None
+    start: Optional[datetime.datetime] = None
+    end: Optional[datetime.datetime] = None
+    expression: Optional[FilterExpression] = None
+
+    # Pre-computed forms of the criteria, to compare against the raw fields.
+    _direction_bit: Optional[int] = dataclasses.field(
+        init=False, repr=False, compare=False, default=None
+    )
+    _start_ns: Optional[int] = dataclasses.field(
+        init=False, repr=False, compare=False, default=None
+    )
+    _end_ns: Optional[int] = dataclasses.field(
+        init=False, repr=False, compare=False, default=None
+    )
+
+    def __post_init__(self):
+        if self.direction is not None:
+            object.__setattr__(self, "_direction_bit", _DIRECTION_BITS[self.direction])
+        if self.start is not None:
+            object.__setattr__(self, "_start_ns", packet.to_nanoseconds(self.start))
+        if self.end is not None:
+            object.__setattr__(self, "_end_ns", packet.to_nanoseconds(self.end))
+
+    @classmethod
+    def from_address(
+        cls,
+        address: Optional[Union[addresses.DeviceAddress, addresses.EndpointAddress]],
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+        expression: Optional[FilterExpression] = None,
+    ) -> "PacketFilter":
+        """Build a filter for the packets to or from an address, in a time range."""
+        if isinstance(address, addresses.EndpointAddress):
+            return cls(
+                address.bus,
+                address.device,
+                address.endpoint,
+                start=start,
+                end=end,
+                expression=expression,
+            )
+        elif address is not None:
+            return cls(
+                address.bus, address.device, start=start, end=end, expression=expression
+            )
+        return cls(start=start, end=end, expression=expression)
+
+    @property
+    def address(
+        self,
+    ) -> Optional[Union[addresses.DeviceAddress, addresses.EndpointAddress]]:
+        """The device or endpoint address all matching packets share, if any."""
+        if self.bus is None or self.device is None:
+            if self.expression is not None:
+                return self.expression.address
+            return None
+        if self.endpoint is None:
+            return addresses.DeviceAddress(self.bus, self.device)
+        return addresses.EndpointAddress(self.bus, self.device, self.endpoint)
+
+    def _matches_fields(
+        self, xfer_type: int, epnum: int, device: int, bus: int
+    ) -> bool:
+        if self.bus is not None and bus != self.bus:
+            return False
+        if self.device is not None and device != self.device:
+            return False
+        if self.endpoint is not None and epnum & 0x7F != self.endpoint:
+            return False
+        if self.xfer_type is not None and xfer_type != self.xfer_type:
+            return False
+        if self._direction_bit is not None and epnum & 0x80 != self._direction_bit:
+            return False
+        return True
+
+    def _matches_timestamp(self, timestamp_ns: int) -> bool:
+        if self._start_ns is not None and timestamp_ns < self._start_ns:
+            return False
+        if self._end_ns is not None and timestamp_ns > self._end_ns:
+            return False
+        return True
+
+    def matches_usbmon(
+        self, endianness: str, data: Union[bytes, memoryview], offset: int = 0
+    ) -> bool:
+        """Check a usbmon packet, from its binary representation.
+
+        Args:
+          endianness: The struct-style byte order of the packet.
+          data: The buffer holding the packet.
+          offset: The offset of the packet within data.
+        """
+        fields = _USBMON_FIELDS[endianness]
+        xfer_type, epnum, device, bus, ts_sec, ts_usec = fields.unpack_from(
+            data, offset
+        )
+        if not self._matches_fields(xfer_type, epnum, device, bus):
+            return False
+        if not self._matches_timestamp(ts_sec * 1_000_000_000 + ts_usec * 1000):
+            return False
+        return self.expression is None or self.expression.matches_usbmon(
+            endianness, data, offset
+        )
+
+    def matches_usbpcap(
+        self, data: Union[bytes, memoryview], timestamp_ns: int, offset: int = 0
+    ) -> bool:
+        """Check a USBPcap packet, from its binary representation and timestamp.
+
+        Args:
+          data: The buffer holding the packet.
+          timestamp_ns: The time the packet was captured at, in nanoseconds
+            since the epoch.
+          offset: The offset of the packet within data.
+        """
+        bus, device, epnum, xfer_type = _USBPCAP_FIELDS.unpack_from(data, offset)
+        if not self._matches_fields(xfer_type, epnum, device, bus):
+            return False
+        if not self._matches_timestamp(timestamp_ns):
+            return False
+        return self.expression is None or self.expression.matches_usbpcap(data, offset)
+
+    def matches(self, decoded_packet: packet.Packet) -> bool:
+        """Check an already decoded packet."""
+        if not self._matches_fields(
+            decoded_packet.xfer_type,
+            decoded_packet.epnum,
+            decoded_packet.devnum,
+            decoded_packet.busnum,
+        ):
+            return False
+        if not self._matches_timestamp(decoded_packet.timestamp_ns):
+            return False
+        return self.expression is None or self.expression.matches(decoded_packet)
@@ -34,21 +34,82 @@ _XFERTYPE_TO_MNEMONIC = {
 }
 
 
+def to_datetime(timestamp_ns: int) -> datetime.datetime:
+    """Convert nanoseconds since the epoch to a naive local time.
+
+    The time is rounded to the microsecond, without going through a float
+    number of seconds, which cannot represent it exactly.
+    """
+    seconds, microseconds = divmod((timestamp_ns + 500) // 1000, 1_000_000)
+    return datetime.datetime.fromtimestamp(seconds).replace(microsecond=microseconds)
+
+
+def to_nanoseconds(timestamp: datetime.datetime) -> int:
+    """Convert a datetime to nanoseconds since the epoch.
+
+    Naive datetimes are taken to be in local time, as the packets' timestamps.
+    """
+    seconds = int(timestamp.replace(microsecond=0).timestamp())
+    return seconds * 1_000_000_000 + timestamp.microsecond * 1000
+
+
 class Packet(abc.ABC):
+    # Captures easily contain millions of packets, so keep their layout fixed
+    # rather than carrying a per-instance __dict__.
+    __slots__ = (
+        "tag",
+        "type",
+        "xfer_type",
+        "devnum",
+        "busnum",
+        "status",
+        "length",
+        "epnum",
+        "timestamp_ns",
+        "_timestamp",
+    )
+
     tag: int
     type: constants.PacketType
     xfer_type: constants.XferType
     devnum: int
     busnum: int
-    setup_packet: Optional[setup.SetupPacket]
-    timestamp: datetime.datetime
     status: int
 
     length: int  # submitted length
-    payload: bytes
 
     epnum: int
 
+    # The capture time, in nanoseconds since the epoch. Sorting and time
+    # differences are computed on this, without building timestamp.
+    timestamp_ns: int
+    _timestamp: Optional[datetime.datetime]
+
+    # The following fields are comparatively expensive to build, and many
+    # analyses never look at them, so they are only decoded on first access.
+
+    @property
+    @abc.abstractmethod
+    def setup_packet(self) -> Optional[setup.SetupPacket]:
+        """The setup packet for CONTROL submissions, if captured."""
+
+    @property
+    def timestamp(self) -> datetime.datetime:
+        """The time at which the packet was captured, as a naive local time."""
+        if self._timestamp is None:
+            self._timestamp = to_datetime(self.timestamp_ns)
+        return self._timestamp
+
+    @property
+    def timestamp_us(self) -> int:
+        """The capture time in microseconds since the epoch, rounded."""
+        return (self.timestamp_ns + 500) // 1000
+
+    @property
+    @abc.abstractmethod
+    def payload(self) -> bytes:
+        """The captured data of the packet."""
+
     @property
     def endpoint(self) -> int:
         return self.epnum & 0x7F
@@ -60,9 +121,19 @@ class Packet(abc.ABC):
         else:
             return constants.Direction.OUT
 
+    @property
+    def address_key(self) -> int:
+        """The endpoint address packed into an integer, see addresses.pack()."""
+        return self.busnum << 16 | self.devnum << 8 | self.epnum & 0x7F
+
+    @property
+    def device_key(self) -> int:
+        """The device address packed into an integer, see addresses.pack()."""
+        return self.busnum << 16 | self.devnum << 8
+
     @property
     def address(self) -> addresses.EndpointAddress:
-        return addresses.EndpointAddress(self.busnum, self.devnum, self.endpoint)
+        return addresses.endpoint_from_key(self.address_key)
 
     @property
     def type_mnemonic(self) -> str:
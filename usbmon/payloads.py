@@ -0,0 +1,69 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Packet data left in capture files, to be read back if needed.
+
+When parsing headers only (see usbmon.pcapng.read_packets()), only the start of
+each packet's data is read from the capture, and the rest is skipped over. The
+packets record where their data is instead, and only read their payload back
+from the capture when it is accessed.
+"""
+
+import threading
+from typing import BinaryIO, NamedTuple
+
+# How much of the data of each packet is read when parsing headers only. This
+# covers the usbmon header, as well as the USBPcap header and setup packet.
+HEADER_SIZE = 64
+
+
+class CaptureReader:
+    """Reads data back from a seekable capture stream.
+
+    The stream is left at the position it was at, so that it can keep being
+    parsed in between reads. The stream needs to remain open for as long as
+    data is read back from it.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def read(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            position = self._stream.tell()
+            try:
+                self._stream.seek(offset)
+                data = self._stream.read(length)
+            finally:
+                self._stream.seek(position)
+        if len(data) < length:
+            raise ValueError(f"Truncated packet data at offset {offset}")
+        return data
+
+
+class DataRef(NamedTuple):
+    """The location of the data of a packet within its capture."""
+
+    reader: CaptureReader
+    offset: int
+    length: int
+
+    def read(self, start: int = 0) -> bytes:
+        """Read the packet data back from the capture, from start onwards."""
+        return self.reader.read(self.offset + start, self.length - start)
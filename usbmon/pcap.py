@@ -0,0 +1,339 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Classic libpcap file parser for usbmon tooling.
+
+Both microsecond and nanosecond resolution files are supported, in either byte
+order. The functions in usbmon.pcapng detect these files automatically, so
+this module only needs to be used directly to read captures known to be in
+the classic format.
+"""
+
+import dataclasses
+import io
+import mmap
+import struct
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Union
+
+import pcapng
+
+from usbmon import capture_session, filters, packet, payloads
+from usbmon.capture import usbmon_mmap, usbpcap
+
+MICROSECOND_MAGIC = 0xA1B2C3D4
+NANOSECOND_MAGIC = 0xA1B23C4D
+
+_MAGICS = {
+    struct.pack(endianness + "I", magic): (endianness, exponent)
+    for endianness in ("<", ">")
+    for magic, exponent in ((MICROSECOND_MAGIC, 6), (NANOSECOND_MAGIC, 9))
+}
+
+_FILE_HEADER_FORMAT = "IHHiIII"
+_FILE_HEADER_SIZE = struct.calcsize("<" + _FILE_HEADER_FORMAT)
+_RECORD_HEADERS = {
+    endianness: struct.Struct(endianness + "IIII") for endianness in ("<", ">")
+}
+_RECORD_HEADER_SIZE = 16
+
+
+@dataclasses.dataclass(frozen=True)
+class FileHeader:
+    """The parts of a libpcap file header relevant to its records."""
+
+    endianness: str
+    link_type: int
+    timestamp_exponent: int = 6
+
+    @property
+    def timestamp_resolution(self) -> float:
+        return 10 ** (-self.timestamp_exponent)
+
+
+class Record(NamedTuple):
+    """A single packet record from a libpcap file.
+
+    The attributes match the ones of python-pcapng's EnhancedPacket that the
+    packet decoders use, so that it can be provided to them.
+    """
+
+    file_header: FileHeader
+    timestamp_units: int
+    packet_data: memoryview
+    # When parsing headers only, and the packet data is longer than
+    # payloads.HEADER_SIZE, packet_data only holds its start, and the data is
+    # read back in full from there.
+    data_ref: Optional[payloads.DataRef] = None
+
+    @property
+    def endianness(self) -> str:
+        return self.file_header.endianness
+
+    @property
+    def link_type(self) -> int:
+        return self.file_header.link_type
+
+    @property
+    def timestamp(self) -> float:
+        return self.timestamp_units * self.file_header.timestamp_resolution
+
+    @property
+    def timestamp_ns(self) -> int:
+        return self.timestamp_units * 10 ** (9 - self.file_header.timestamp_exponent)
+
+
+def _parse_file_header(header: Union[bytes, memoryview]) -> FileHeader:
+    if len(header) < _FILE_HEADER_SIZE:
+        raise ValueError("Truncated libpcap file header")
+    try:
+        endianness, exponent = _MAGICS[bytes(header[:4])]
+    except KeyError:
+        raise ValueError(f"Not a libpcap capture: magic {bytes(header[:4]).hex()}")
+
+    *_, network = struct.unpack_from(endianness + _FILE_HEADER_FORMAT, header)
+    # The upper bits of the field are used for FCS information on some link
+    # types; only the lower 16 bits are the link type proper.
+    return FileHeader(endianness, network & 0xFFFF, exponent)
+
+
+def is_pcap_stream(stream: BinaryIO) -> bool:
+    """Check whether the provided stream starts with a libpcap file header.
+
+    The stream is not consumed: the magic is either peeked, for buffered
+    streams, or read and then seeked back over.
+    """
+    peek = getattr(stream, "peek", None)
+    if peek is not None:
+        magic = peek(4)[:4]
+    elif stream.seekable():
+        position = stream.tell()
+        magic = stream.read(4)
+        stream.seek(position)
+    else:
+        return False
+    return magic in _MAGICS
+
+
+def is_pcap_bytes(data: bytes) -> bool:
+    """Check whether the provided data starts with a libpcap file header."""
+    return data[:4] in _MAGICS
+
+
+def _buffer_records(
+    buffer: memoryview, start: Optional[int] = None
+) -> Iterator[Record]:
+    file_header = _parse_file_header(buffer)
+    record_header = _RECORD_HEADERS[file_header.endianness]
+    scale = 10**file_header.timestamp_exponent
+
+    offset = _FILE_HEADER_SIZE if start is None else start
+    end = len(buffer)
+    while offset < end:
+        if offset + _RECORD_HEADER_SIZE > end:
+            raise ValueError(f"Truncated libpcap record at offset {offset}")
+        ts_sec, ts_frac, captured_length, _ = record_header.unpack_from(buffer, offset)
+        data_start = offset + _RECORD_HEADER_SIZE
+        offset = data_start + captured_length
+        if offset > end:
+            raise ValueError(f"Truncated libpcap record at offset {data_start}")
+        yield Record(file_header, ts_sec * scale + ts_frac, buffer[data_start:offset])
+
+
+def _stream_records(stream: BinaryIO) -> Iterator[Record]:
+    file_header = _parse_file_header(stream.read(_FILE_HEADER_SIZE))
+    record_header = _RECORD_HEADERS[file_header.endianness]
+    scale = 10**file_header.timestamp_exponent
+
+    while True:
+        header = stream.read(_RECORD_HEADER_SIZE)
+        if not header:
+            return
+        if len(header) < _RECORD_HEADER_SIZE:
+            raise ValueError("Truncated libpcap record at end of stream")
+        ts_sec, ts_frac, captured_length, _ = record_header.unpack(header)
+        packet_data = stream.read(captured_length)
+        if len(packet_data) < captured_length:
+            raise ValueError("Truncated libpcap record at end of stream")
+        yield Record(file_header, ts_sec * scale + ts_frac, memoryview(packet_data))
+
+
+def _stream_record_headers(stream: BinaryIO) -> Iterator[Record]:
+    reader = payloads.CaptureReader(stream)
+    position = stream.tell()
+    # Seeking past the end of the stream does not fail, so skipped records are
+    # checked against its size instead.
+    stream_end = stream.seek(0, io.SEEK_END)
+    stream.seek(position)
+    file_header = _parse_file_header(stream.read(_FILE_HEADER_SIZE))
+    record_header = _RECORD_HEADERS[file_header.endianness]
+    scale = 10**file_header.timestamp_exponent
+
+    while True:
+        header = stream.read(_RECORD_HEADER_SIZE)
+        if not header:
+            return
+        if len(header) < _RECORD_HEADER_SIZE:
+            raise ValueError("Truncated libpcap record at end of stream")
+        ts_sec, ts_frac, captured_length, _ = record_header.unpack(header)
+        data_start = stream.tell()
+        kept_length = min(captured_length, payloads.HEADER_SIZE)
+        packet_data = stream.read(kept_length)
+        if len(packet_data) < kept_length:
+            raise ValueError("Truncated libpcap record at end of stream")
+        data_ref: Optional[payloads.DataRef] = None
+        if captured_length > kept_length:
+            data_end = data_start + captured_length
+            if data_end > stream_end:
+                raise ValueError("Truncated libpcap record at end of stream")
+            stream.seek(data_end)
+            data_ref = payloads.DataRef(reader, data_start, captured_length)
+        yield Record(
+            file_header, ts_sec * scale + ts_frac, memoryview(packet_data), data_ref
+        )
+
+
+def read_buffer(
+    buffer: Union[bytes, mmap.mmap, memoryview], start: Optional[int] = None
+) -> Iterator[Record]:
+    """Yield the packet records found in a buffer containing a libpcap file.
+
+    The packet data of the returned records references the buffer directly.
+
+    Args:
+      buffer: The buffer containing the libpcap file, from its file header.
+      start: The offset of the first record to read, by default the one right
+        after the file header.
+    """
+    return _buffer_records(memoryview(buffer), start)
+
+
+def read_records(stream: BinaryIO, headers_only: bool = False) -> Iterator[Record]:
+    """Yield the packet records found in a libpcap stream.
+
+    If the stream is backed by a regular file, this maps it in memory rather
+    than reading it, otherwise records are read one at a time.
+
+    If headers_only is set, and the stream is read rather than mapped but can
+    be seeked, only the start of the data of each record is read, as with
+    usbmon.pcapng_reader.read_stream().
+    """
+    try:
+        fileno = stream.fileno()
+        offset = stream.tell()
+        mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        if headers_only and stream.seekable():
+            return _stream_record_headers(stream)
+        return _stream_records(stream)
+
+    return _buffer_records(memoryview(mapped)[offset:])
+
+
+def _decode_packets(
+    records: Iterator[Record],
+    packet_filter: Optional[filters.PacketFilter] = None,
+) -> Iterator[packet.Packet]:
+    for record in records:
+        if record.link_type == pcapng.constants.link_types.LINKTYPE_USB_LINUX_MMAPPED:
+            if packet_filter is None or packet_filter.matches_usbmon(
+                record.endianness, record.packet_data
+            ):
+                yield usbmon_mmap.UsbmonMmapPacket(
+                    record.endianness, record.packet_data, record.data_ref
+                )
+        elif record.link_type == 249:
+            if packet_filter is not None and not packet_filter.matches_usbpcap(
+                record.packet_data, record.timestamp_ns
+            ):
+                continue
+            try:
+                yield usbpcap.UsbpcapPacket(record)
+            except usbpcap.UnsupportedCaptureData:
+                continue
+        else:
+            description = pcapng.constants.link_types.LINKTYPE_DESCRIPTIONS.get(
+                record.link_type, f"Unknown link type: 0x{record.link_type:04x}"
+            )
+            raise Exception(f"Expected USB capture, found {description}.")
+
+
+def read_packets(
+    stream: BinaryIO,
+    packet_filter: Optional[filters.PacketFilter] = None,
+    headers_only: bool = False,
+) -> Iterator[packet.Packet]:
+    """Parse the provided libpcap stream, yielding packets as they are decoded.
+
+    Args:
+      stream: a BinaryIO object that contains the libpcap data to parse.
+      packet_filter: If provided, only yield packets matching it. Packets are
+        filtered based on their raw header, before they are built.
+      headers_only: Whether to skip over the payloads of the packets, and only
+        read them back from the stream when accessed, as with
+        usbmon.pcapng.read_packets().
+
+    Yields:
+      usbmon.packet.Packet objects, in capture order.
+    """
+    return _decode_packets(read_records(stream, headers_only), packet_filter)
+
+
+def parse_file(path: str, retag_urbs: bool = True) -> capture_session.Session:
+    """Parse the provided libpcap file path into a Session object.
+
+    Args:
+      path: The filesystem path to the libpcap file to parse.
+      retag_urbs: Whether to re-generate tags for the URBs based on UUIDs.
+
+    Returns:
+      A usbmon.capture_session.Session object.
+    """
+    with open(path, "rb") as pcap_file:
+        return parse_stream(pcap_file, retag_urbs)
+
+
+def parse_bytes(data: bytes, retag_urbs: bool = True) -> capture_session.Session:
+    """Parse the provided bytes array into a Session object.
+
+    Args:
+      data: a bytes array that contains the libpcap data to parse.
+      retag_urbs: Whether to re-generate tags for the URBs based on UUIDs.
+
+    Returns:
+      A usbmon.capture_session.Session object.
+    """
+    session = capture_session.Session(retag_urbs)
+    for parsed_packet in _decode_packets(_buffer_records(memoryview(data))):
+        session.add(parsed_packet)
+    return session
+
+
+def parse_stream(stream: BinaryIO, retag_urbs: bool = True) -> capture_session.Session:
+    """Parse the provided binary stream into a Session object.
+
+    Args:
+      stream: a BinaryIO object that contains the libpcap data to parse.
+      retag_urbs: Whether to re-generate tags for the URBs based on UUIDs.
+
+    Returns:
+      A usbmon.capture_session.Session object.
+    """
+    session = capture_session.Session(retag_urbs)
+    for parsed_packet in read_packets(stream):
+        session.add(parsed_packet)
+    return session
@@ -16,61 +16,559 @@
 #
 # SPDX-FileCopyrightText: © 2019 The usbmon-tools Authors
 # SPDX-License-Identifier: Apache-2.0
-"""pcapng file parser for usbmon tooling."""
+"""pcapng file parser for usbmon tooling.
 
+Classic libpcap files are detected automatically by all the functions in this
+module, and parsed through usbmon.pcap instead.
+"""
+
+import array
+import collections
+import concurrent.futures
+import datetime
 import io
-from typing import BinaryIO, Optional
+import itertools
+import mmap
+import os
+import stat
+import typing
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
 
 import pcapng
 
-from usbmon import capture_session, packet
+import usbmon.capture_index
+import usbmon.compression
+import usbmon.pipeline
+import usbmon.session_cache
+import usbmon.tail
+from usbmon import capture_session, filters, packet, pcap, pcapng_reader
 from usbmon.capture import usbmon_mmap, usbpcap
 
+if typing.TYPE_CHECKING:
+    from usbmon import batch
+
 _SUPPORTED_LINKTYPES = (
     pcapng.constants.link_types.LINKTYPE_USB_LINUX_MMAPPED,
     # pcapng.constants.link_types.LINKTYPE_USBPCAP,
     249,
 )
 
+_IndexEntry = Union[pcapng_reader.Interface, pcapng_reader.PacketRun]
+
+# Chunks indexed by parallel workers are at least this big, so that the cost of
+# dispatching them remains negligible.
+_MINIMUM_CHUNK_SIZE = 1 << 20
+# Splitting the file in more chunks than workers balances the load when some
+# chunks take longer than others.
+_CHUNKS_PER_JOB = 4
+# How many chunks each worker is given at once. More than one keeps workers
+# busy while their results are being merged, while bounding memory usage.
+_PENDING_CHUNKS_PER_JOB = 2
+
+# The byte order of the batches of captures with no packets, which is moot.
+_EMPTY_BATCH_ENDIANNESS = "<"
 
-def parse_file(path: str, retag_urbs: bool = True) -> capture_session.Session:
+
+def _link_type_description(link_type: int) -> str:
+    try:
+        return pcapng.constants.link_types.LINKTYPE_DESCRIPTIONS[link_type]
+    except KeyError:
+        return f"Unknown link type: 0x{link_type:04x}"
+
+
+def parse_file(
+    path: str,
+    retag_urbs: bool = True,
+    native: bool = True,
+    jobs: int = 1,
+    address: Optional[usbmon.capture_index.Address] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    cache_dir: Optional[str] = None,
+    packet_filter: Optional[filters.PacketFilter] = None,
+) -> capture_session.Session:
     """Parse the provided pcang file path into a Session object.
 
     Args:
       path: The filesystem path to the pcapng file to parse.
       retag_urbs: Whether to re-generate tags for the URBs based on UUIDs.
+      native: Whether to use the built-in pcapng reader, which maps the file in
+        memory, rather than python-pcapng.
+      jobs: The number of worker processes to locate the packets in the file
+        with. The packets are still built and added to the Session in capture
+        order by the calling process, so the result does not depend on this.
+        Only used for pcapng files with the native reader, when no filter is
+        provided.
+      address: If provided, only the packets to or from this device or
+        endpoint address are included.
+      start: If provided, only the packets captured at or after this time are
+        included.
+      end: If provided, only the packets captured at or before this time are
+        included.
+      cache_dir: If provided, the session is stored in, or loaded from, the
+        session cache in this directory (see usbmon.session_cache). Cannot be
+        combined with any filter.
+      packet_filter: If provided, only the packets matching it are included.
+        Cannot be combined with address, start or end, which are shorthands
+        for it.
+
+    Packets are filtered based on their raw header, before they are built.
+    When any filter is provided, pcapng files are read
+    through their sidecar index (see usbmon.capture_index), which is built
+    and stored if missing or out of date, so that parts of the file without
+    matching packets are skipped. Note that URBs straddling the start or end
+    of the time range are left without their matching packet.
+
+    Files compressed with gzip, xz or zstd (see usbmon.compression) are
+    decompressed on background threads while being parsed. They are neither
+    indexed, split between jobs, nor cached.
 
     Returns:
       A usbmon.capture_session.Session object.
     """
+    filtered = (
+        address is not None
+        or start is not None
+        or end is not None
+        or packet_filter is not None
+    )
     with open(path, "rb") as pcap_file:
-        return parse_stream(pcap_file, retag_urbs)
+        if usbmon.compression.detect(pcap_file) is not None:
+            with usbmon.compression.open_stream(pcap_file) as decompressed_file:
+                return parse_stream(
+                    decompressed_file,
+                    retag_urbs,
+                    native,
+                    address,
+                    start,
+                    end,
+                    cache_dir,
+                    packet_filter,
+                )
+        if (
+            jobs > 1
+            and native
+            and not filtered
+            and cache_dir is None
+            and not pcap.is_pcap_stream(pcap_file)
+        ):
+            mapped = mmap.mmap(pcap_file.fileno(), 0, access=mmap.ACCESS_READ)
+            return _parse_mapped_file_parallel(path, mapped, retag_urbs, jobs)
+        return parse_stream(
+            pcap_file, retag_urbs, native, address, start, end, cache_dir, packet_filter
+        )
+
+
+def _index_chunk(path: str, chunk: pcapng_reader.Chunk) -> List[_IndexEntry]:
+    with open(path, "rb") as pcap_file:
+        mapped = mmap.mmap(pcap_file.fileno(), 0, access=mmap.ACCESS_READ)
+    with mapped:
+        return pcapng_reader.index_chunk(mapped, chunk)
+
+
+def _index_file_parallel(
+    path: str, mapped: mmap.mmap, jobs: int
+) -> Iterator[_IndexEntry]:
+    """Locate the interfaces and packets in a pcapng file, with worker processes.
+
+    The file is split into chunks of whole blocks, which are indexed in
+    parallel; the results are yielded in file order.
+    """
+    chunk_size = max(len(mapped) // (jobs * _CHUNKS_PER_JOB), _MINIMUM_CHUNK_SIZE)
+    chunks = pcapng_reader.split_buffer(mapped, chunk_size)
+
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        pending: typing.Deque[
+            "concurrent.futures.Future[List[_IndexEntry]]"
+        ] = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_index_chunk, path, chunk))
+            if len(pending) >= jobs * _PENDING_CHUNKS_PER_JOB:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _parse_mapped_file_parallel(
+    path: str, mapped: mmap.mmap, retag_urbs: bool, jobs: int
+) -> capture_session.Session:
+    view = memoryview(mapped)
+    session = capture_session.Session(retag_urbs)
+    for entry in _index_file_parallel(path, mapped, jobs):
+        if isinstance(entry, pcapng_reader.Interface):
+            _check_interface(entry)
+            continue
+
+        assert entry.interface_id == 0
+        if (
+            entry.interface.link_type
+            == pcapng.constants.link_types.LINKTYPE_USB_LINUX_MMAPPED
+        ):
+            for offset, length in zip(entry.data_offsets, entry.data_lengths):
+                end = offset + length
+                session.add(
+                    usbmon_mmap.UsbmonMmapPacket(entry.endianness, view[offset:end])
+                )
+        elif entry.interface.link_type == 249:
+            for timestamp_units, offset, length in zip(
+                entry.timestamp_units, entry.data_offsets, entry.data_lengths
+            ):
+                end = offset + length
+                block = pcapng_reader.EnhancedPacket(
+                    entry.interface_id,
+                    entry.interface,
+                    entry.endianness,
+                    timestamp_units,
+                    view[offset:end],
+                )
+                try:
+                    session.add(usbpcap.UsbpcapPacket(block))
+                except usbpcap.UnsupportedCaptureData:
+                    continue
+
+    return session
 
 
-def parse_bytes(data: bytes, retag_urbs: bool = True) -> capture_session.Session:
+def parse_bytes(
+    data: bytes, retag_urbs: bool = True, native: bool = True
+) -> capture_session.Session:
     """Parse the provided bytes array into a Session object.
 
     Args:
       data: a bytes array that contains the pcapng data to parse.
       retag_urbs: Whether to re-generate tags for the URBs based on UUIDs.
+      native: Whether to use the built-in pcapng reader rather than
+        python-pcapng.
 
     Returns:
       A usbmon.capture_session.Session object.
     """
-    return parse_stream(io.BytesIO(data), retag_urbs)
+    if pcap.is_pcap_bytes(data):
+        return pcap.parse_bytes(data, retag_urbs)
+    if native:
+        session = capture_session.Session(retag_urbs)
+        for parsed_packet in _decode_packets(pcapng_reader.read_buffer(data)):
+            session.add(parsed_packet)
+        return session
+    return parse_stream(io.BytesIO(data), retag_urbs, native)
 
 
-def parse_stream(stream: BinaryIO, retag_urbs: bool = True) -> capture_session.Session:
+def parse_stream(
+    stream: BinaryIO,
+    retag_urbs: bool = True,
+    native: bool = True,
+    address: Optional[usbmon.capture_index.Address] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    cache_dir: Optional[str] = None,
+    packet_filter: Optional[filters.PacketFilter] = None,
+    pipelined: bool = False,
+    headers_only: bool = False,
+) -> capture_session.Session:
     """Parse the provided binary stream into a Session object.
 
     Args:
       stream: a BinaryIO object that contains the pcapng data to parse.
       retag_urbs: Whether to re-generate tags for the URBs based on UUIDs.
+      native: Whether to use the built-in pcapng reader rather than
+        python-pcapng.
+      address: If provided, only include packets to or from this address.
+      start: If provided, only include packets captured at or after this time.
+      end: If provided, only include packets captured at or before this time.
+      cache_dir: If provided, and the stream is a regular file opened from its
+        start, the session is stored in, or loaded from, the session cache in
+        this directory (see usbmon.session_cache). Cannot be combined with any
+        filter.
+      packet_filter: If provided, only include packets matching it. Cannot be
+        combined with address, start or end.
+      pipelined: Whether to read and decode the stream on background threads,
+        as with read_packets_pipelined(), while packets are being paired.
+      headers_only: Whether to skip over the payloads of the packets, as with
+        read_packets(). Not used when pipelined.
 
     Returns:
       A usbmon.capture_session.Session object.
     """
+    if cache_dir is not None:
+        if (
+            address is not None
+            or start is not None
+            or end is not None
+            or packet_filter is not None
+        ):
+            raise ValueError("The session cache only holds unfiltered sessions.")
+        cached_session = usbmon.session_cache.parse_stream(
+            stream, cache_dir, retag_urbs
+        )
+        if cached_session is not None:
+            return cached_session
+
+    packets: Iterator[packet.Packet]
+    if pipelined:
+        if address is not None or start is not None or end is not None:
+            if packet_filter is not None:
+                raise ValueError(
+                    "packet_filter cannot be combined with address, start or end."
+                )
+            packet_filter = filters.PacketFilter.from_address(address, start, end)
+        packets = iter(read_packets_pipelined(stream, native, packet_filter))
+    else:
+        packets = read_packets(
+            stream,
+            native,
+            address,
+            start,
+            end,
+            packet_filter,
+            headers_only=headers_only,
+        )
+
     session = capture_session.Session(retag_urbs)
+    for parsed_packet in packets:
+        session.add(parsed_packet)
+    return session
+
+
+def read_packets(
+    stream: BinaryIO,
+    native: bool = True,
+    address: Optional[usbmon.capture_index.Address] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    packet_filter: Optional[filters.PacketFilter] = None,
+    follow: bool = False,
+    headers_only: bool = False,
+) -> Iterator[packet.Packet]:
+    """Parse the provided binary stream, yielding packets as they are decoded.
+
+    This is meant to be combined with usbmon.capture_session.Session.stream(),
+    to process captures without keeping all of their packets in memory.
+
+    Args:
+      stream: a BinaryIO object that contains the pcapng data to parse.
+      native: Whether to use the built-in pcapng reader rather than
+        python-pcapng. If the stream is backed by a regular file, the native
+        reader maps it in memory, and packets reference the mapping directly.
+      address: If provided, only yield packets to or from this address.
+      start: If provided, only yield packets captured at or after this time.
+      end: If provided, only yield packets captured at or before this time.
+      packet_filter: If provided, only yield packets matching it. Cannot be
+        combined with address, start or end, which are shorthands for it.
+      follow: Whether to keep waiting for packets appended to the stream,
+        like tail -f, rather than stopping at its end. This never returns
+        unless the stream is already a usbmon.tail.FollowedStream with an
+        idle timeout.
+      headers_only: Whether to skip over the payloads of the packets, for
+        analyses that do not need them. Only the headers are read, and the
+        payload of each packet is read back from the stream if it is accessed,
+        so the stream needs to remain open until then. This only changes how
+        seekable streams that cannot be mapped in memory are read with the
+        native reader: mapped packets already only copy their payload when
+        accessed, and other streams cannot be read back from.
+
+    Packets are filtered based on their raw header, before they are built.
+    When filtering on an address or time range, and the stream is a pcapng file
+    opened from its start, the file's sidecar index is used (and built if
+    needed) to skip over chunks with no matching packets.
+
+    Yields:
+      usbmon.packet.Packet objects, in capture order.
+    """
+    if address is not None or start is not None or end is not None:
+        if packet_filter is not None:
+            raise ValueError(
+                "packet_filter cannot be combined with address, start or end."
+            )
+        packet_filter = filters.PacketFilter.from_address(address, start, end)
+    if follow and not isinstance(stream, usbmon.tail.FollowedStream):
+        stream = typing.cast(BinaryIO, usbmon.tail.FollowedStream(stream))
+
+    packets: Optional[Iterator[packet.Packet]] = None
+    if pcap.is_pcap_stream(stream):
+        packets = pcap.read_packets(stream, packet_filter, headers_only)
+    elif not native:
+        packets = _read_pcapng_packets(stream, packet_filter)
+    elif packet_filter is not None and (
+        packet_filter.address is not None
+        or packet_filter.start is not None
+        or packet_filter.end is not None
+    ):
+        # The index can only skip chunks based on these criteria.
+        packets = _read_indexed_packets(stream, packet_filter)
+
+    if packets is None:
+        packets = _decode_packets(
+            pcapng_reader.read_stream(
+                stream, _packet_predicate(packet_filter), headers_only
+            )
+        )
+    return packets
+
+
+def read_packets_pipelined(
+    stream: BinaryIO,
+    native: bool = True,
+    packet_filter: Optional[filters.PacketFilter] = None,
+    chunk_size: int = usbmon.pipeline.DEFAULT_CHUNK_SIZE,
+    queue_size: int = usbmon.pipeline.DEFAULT_QUEUE_SIZE,
+) -> "usbmon.pipeline.Pipeline[packet.Packet]":
+    """Read the packets of the provided binary stream on background threads.
+
+    A reader thread reads the stream in chunks of chunk_size bytes, up to
+    queue_size chunks ahead of a decoder thread, which decodes them as
+    read_packets() does. Iterating over the returned pipeline yields the
+    packets in capture order, so that pairing and output overlap with reading
+    and decoding. The pipeline's counters tell which stage limits throughput.
+
+    This is meant for slow streams, such as files on network filesystems or
+    decompressed on the fly. Regular local files are better read directly, as
+    read_packets() maps them in memory instead.
+
+    Args:
+      stream: a BinaryIO object that contains the pcapng or libpcap data to
+        parse.
+      native: Whether to use the built-in pcapng reader rather than
+        python-pcapng.
+      packet_filter: If provided, only yield packets matching it. This is
+        checked by the decoder thread.
+      chunk_size: How many bytes to read from the stream at a time.
+      queue_size: How many chunks, and batches of packets, each stage can get
+        ahead of the next one.
+
+    Returns:
+      A usbmon.pipeline.Pipeline of usbmon.packet.Packet objects.
+    """
+
+    def decode(chunks: BinaryIO) -> Iterator[packet.Packet]:
+        return read_packets(chunks, native, packet_filter=packet_filter)
+
+    return usbmon.pipeline.Pipeline(stream, decode, chunk_size, queue_size)
+
+
+def _read_indexed_packets(
+    stream: BinaryIO, packet_filter: filters.PacketFilter
+) -> Optional[Iterator[packet.Packet]]:
+    """Read the chunks of a pcapng file that may match, based on its index.
+
+    Returns:
+      The packets from the selected chunks, or None if the stream is not a
+      regular file that can be indexed.
+    """
+    try:
+        path = stream.name
+        fileno = stream.fileno()
+        capture_stat = os.fstat(fileno)
+        if (
+            not isinstance(path, str)
+            or not stat.S_ISREG(capture_stat.st_mode)
+            or not os.path.samestat(capture_stat, os.stat(path))
+            or stream.tell() != 0
+        ):
+            return None
+        mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+    indexed_chunks = usbmon.capture_index.load(path, capture_stat)
+    if indexed_chunks is None:
+        indexed_chunks = [
+            usbmon.capture_index.summarize(
+                chunk, _decode_packets(pcapng_reader.read_chunk(mapped, chunk))
+            )
+            for chunk in pcapng_reader.split_buffer(
+                mapped, usbmon.capture_index.CHUNK_SIZE
+            )
+        ]
+        usbmon.capture_index.save(path, capture_stat, indexed_chunks)
+
+    selected_chunks = usbmon.capture_index.select(
+        indexed_chunks, packet_filter.address, packet_filter.start, packet_filter.end
+    )
+    for chunk in selected_chunks:
+        for interface in chunk.interfaces:
+            _check_interface(interface)
+
+    predicate = _packet_predicate(packet_filter)
+    return itertools.chain.from_iterable(
+        _decode_packets(pcapng_reader.read_chunk(mapped, chunk, predicate))
+        for chunk in selected_chunks
+    )
+
+
+def _packet_predicate(
+    packet_filter: Optional[filters.PacketFilter],
+) -> Optional[pcapng_reader.PacketPredicate]:
+    """Adapt a PacketFilter to check Enhanced Packet Blocks before decoding."""
+    if packet_filter is None:
+        return None
+
+    def predicate(
+        interface: pcapng_reader.Interface,
+        endianness: str,
+        buffer: memoryview,
+        data_offset: int,
+        timestamp_units: int,
+    ) -> bool:
+        if (
+            interface.link_type
+            == pcapng.constants.link_types.LINKTYPE_USB_LINUX_MMAPPED
+        ):
+            return packet_filter.matches_usbmon(endianness, buffer, data_offset)
+        elif interface.link_type == 249:
+            return packet_filter.matches_usbpcap(
+                buffer,
+                interface.to_nanoseconds(timestamp_units),
+                data_offset,
+            )
+        # Other link types are rejected once decoded.
+        return True
+
+    return predicate
+
+
+def _check_interface(interface: pcapng_reader.Interface) -> None:
+    if interface.link_type not in _SUPPORTED_LINKTYPES:
+        raise Exception(
+            "Expected USB capture, found"
+            f" {_link_type_description(interface.link_type)}."
+        )
+
+
+def _check_usbmon_interface(
+    interface: Union[pcapng_reader.Interface, pcapng_reader.EnhancedPacket, pcap.Record]
+) -> None:
+    if interface.link_type != pcapng.constants.link_types.LINKTYPE_USB_LINUX_MMAPPED:
+        raise Exception(
+            "Expected usbmon capture, found"
+            f" {_link_type_description(interface.link_type)}."
+        )
+
+
+def _decode_packets(
+    blocks: Iterator[pcapng_reader.Block],
+) -> Iterator[packet.Packet]:
+    for block in blocks:
+        if isinstance(block, pcapng_reader.Interface):
+            _check_interface(block)
+            continue
+
+        assert block.interface_id == 0
+        if block.link_type == pcapng.constants.link_types.LINKTYPE_USB_LINUX_MMAPPED:
+            yield usbmon_mmap.UsbmonMmapPacket(
+                block.endianness, block.packet_data, block.data_ref
+            )
+        elif block.link_type == 249:
+            try:
+                yield usbpcap.UsbpcapPacket(block)
+            except usbpcap.UnsupportedCaptureData:
+                continue
+
+
+def _read_pcapng_packets(
+    stream: BinaryIO,
+    packet_filter: Optional[filters.PacketFilter] = None,
+) -> Iterator[packet.Packet]:
     endianness: Optional[str] = None
     link_type: Optional[int] = None
     parsed_packet: Optional[packet.Packet] = None
@@ -86,18 +584,130 @@ def parse_stream(stream: BinaryIO, retag_urbs: bool = True) -> capture_session.S
             link_type = block.link_type
         elif isinstance(block, pcapng.blocks.EnhancedPacket):
             assert block.interface_id == 0
-            assert endianness is not None
-            assert link_type is not None
+            if endianness is None or link_type is None:
+                raise ValueError("Packet block found before its interface.")
             if link_type == pcapng.constants.link_types.LINKTYPE_USB_LINUX_MMAPPED:
+                if packet_filter is not None and not packet_filter.matches_usbmon(
+                    endianness, block.packet_data
+                ):
+                    continue
                 parsed_packet = usbmon_mmap.UsbmonMmapPacket(
                     endianness, block.packet_data
                 )
             elif link_type == 249:
+                if packet_filter is not None and not packet_filter.matches_usbpcap(
+                    block.packet_data, pcapng_reader.timestamp_ns(block)
+                ):
+                    continue
                 try:
                     parsed_packet = usbpcap.UsbpcapPacket(block)
                 except usbpcap.UnsupportedCaptureData:
-                    pass
+                    continue
 
             assert parsed_packet is not None
-            session.add(parsed_packet)
-    return session
+            yield parsed_packet
+
+
+def parse_file_batch(
+    path: str, retag_urbs: bool = True, jobs: int = 1
+) -> "batch.PacketBatch":
+    """Parse the provided pcapng file path into a columnar PacketBatch object.
+
+    This requires NumPy to be installed. Compressed files are decompressed
+    while being parsed, as with parse_file().
+
+    Args:
+      path: The filesystem path to the pcapng file to parse.
+      retag_urbs: Whether to re-generate tags for the URBs based on UUIDs.
+      jobs: The number of worker processes to locate the packets in the file
+        with. Only used for uncompressed pcapng files.
+
+    Returns:
+      A usbmon.batch.PacketBatch object.
+    """
+    with open(path, "rb") as pcap_file:
+        if usbmon.compression.detect(pcap_file) is not None:
+            with usbmon.compression.open_stream(pcap_file) as decompressed_file:
+                return parse_stream_batch(decompressed_file, retag_urbs)
+        if jobs > 1 and not pcap.is_pcap_stream(pcap_file):
+            mapped = mmap.mmap(pcap_file.fileno(), 0, access=mmap.ACCESS_READ)
+            return _parse_mapped_file_batch_parallel(path, mapped, retag_urbs, jobs)
+        return parse_stream_batch(pcap_file, retag_urbs)
+
+
+def _parse_mapped_file_batch_parallel(
+    path: str, mapped: mmap.mmap, retag_urbs: bool, jobs: int
+) -> "batch.PacketBatch":
+    from usbmon import batch
+
+    endianness: Optional[str] = None
+    data_offsets: List[array.array] = []
+    data_lengths: List[array.array] = []
+    for entry in _index_file_parallel(path, mapped, jobs):
+        if isinstance(entry, pcapng_reader.Interface):
+            _check_usbmon_interface(entry)
+            continue
+
+        assert entry.interface_id == 0
+        if endianness is not None and entry.endianness != endianness:
+            raise Exception("Mixed-endianness captures are not supported.")
+        endianness = entry.endianness
+        data_offsets.append(entry.data_offsets)
+        data_lengths.append(entry.data_lengths)
+
+    packet_batch = batch.from_buffer(
+        endianness or _EMPTY_BATCH_ENDIANNESS, mapped, data_offsets, data_lengths
+    )
+    if retag_urbs:
+        packet_batch.retag()
+    return packet_batch
+
+
+def parse_stream_batch(
+    stream: BinaryIO, retag_urbs: bool = True
+) -> "batch.PacketBatch":
+    """Parse the provided binary stream into a columnar PacketBatch object.
+
+    Only usbmon (Linux) captures are supported in columnar format. This requires
+    NumPy to be installed.
+
+    Args:
+      stream: a BinaryIO object that contains the pcapng data to parse.
+      retag_urbs: Whether to re-generate tags for the URBs based on UUIDs.
+
+    Returns:
+      A usbmon.batch.PacketBatch object.
+    """
+    from usbmon import batch
+
+    endianness: Optional[str] = None
+    raw_packets: List[memoryview] = []
+    for packet_endianness, packet_data in read_usbmon_data(stream):
+        if endianness is not None and packet_endianness != endianness:
+            raise Exception("Mixed-endianness captures are not supported.")
+        endianness = packet_endianness
+        raw_packets.append(packet_data)
+
+    packet_batch = batch.from_packets(
+        endianness or _EMPTY_BATCH_ENDIANNESS, raw_packets
+    )
+    if retag_urbs:
+        packet_batch.retag()
+    return packet_batch
+
+
+def read_usbmon_data(stream: BinaryIO) -> Iterator[Tuple[str, memoryview]]:
+    """Yield the endianness and raw data of the packets in a usbmon capture."""
+    blocks: Iterator[Union[pcap.Record, pcapng_reader.Block]]
+    if pcap.is_pcap_stream(stream):
+        blocks = pcap.read_records(stream)
+    else:
+        blocks = pcapng_reader.read_stream(stream)
+
+    for block in blocks:
+        _check_usbmon_interface(block)
+        if isinstance(block, pcapng_reader.Interface):
+            continue
+        if isinstance(block, pcapng_reader.EnhancedPacket):
+            assert block.interface_id == 0
+        yield block.endianness, block.packet_data
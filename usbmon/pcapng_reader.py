@@ -0,0 +1,548 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Minimal pcapng block reader, for the blocks needed by usbmon captures.
+
+Only Section Header, Interface Description and Enhanced Packet blocks are
+decoded; every other block type is skipped based on its length alone. Packet
+data is returned as memoryview slices of the original buffer, without copying.
+"""
+
+import array
+import dataclasses
+import io
+import mmap
+import struct
+import typing
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from usbmon import payloads
+
+SECTION_HEADER_BLOCK = 0x0A0D0D0A
+INTERFACE_DESCRIPTION_BLOCK = 0x00000001
+ENHANCED_PACKET_BLOCK = 0x00000006
+
+_SECTION_HEADER_MAGIC = b"\x0a\x0d\x0d\x0a"
+_LITTLE_ENDIAN_MAGIC = b"\x4d\x3c\x2b\x1a"
+_BIG_ENDIAN_MAGIC = b"\x1a\x2b\x3c\x4d"
+
+_BLOCK_HEADER_SIZE = 8
+_BLOCK_TRAILER_SIZE = 4
+# Every block has at least a header and trailer, and the Section Header Block
+# needs its byte-order magic to be read before anything else.
+_MINIMUM_BLOCK_SIZE = _BLOCK_HEADER_SIZE + _BLOCK_TRAILER_SIZE
+
+_BLOCK_HEADERS = {
+    endianness: struct.Struct(endianness + "II") for endianness in ("<", ">")
+}
+_ENHANCED_PACKET_HEADERS = {
+    endianness: struct.Struct(endianness + "IIIII") for endianness in ("<", ">")
+}
+_ENHANCED_PACKET_DATA_OFFSET = 28
+
+_OPTION_END = 0
+_OPTION_IF_TSRESOL = 9
+
+
+@dataclasses.dataclass(frozen=True)
+class Interface:
+    """The parts of an Interface Description Block relevant to packets."""
+
+    link_type: int
+    timestamp_base: int = 10
+    timestamp_exponent: int = 6
+
+    @classmethod
+    def from_tsresol(cls, link_type: int, resolution: int) -> "Interface":
+        """Build an interface out of the value of its if_tsresol option."""
+        return cls(link_type, 2 if resolution & 0x80 else 10, resolution & 0x7F)
+
+    @property
+    def timestamp_resolution(self) -> float:
+        return self.timestamp_base ** (-self.timestamp_exponent)
+
+    def to_nanoseconds(self, timestamp_units: int) -> int:
+        """Convert a timestamp in this interface's units to nanoseconds."""
+        if self.timestamp_base == 10:
+            if self.timestamp_exponent <= 9:
+                return timestamp_units * 10 ** (9 - self.timestamp_exponent)
+            return timestamp_units // 10 ** (self.timestamp_exponent - 9)
+        return (timestamp_units * 1_000_000_000) >> self.timestamp_exponent
+
+
+class EnhancedPacket(NamedTuple):
+    """A packet from an Enhanced Packet Block.
+
+    The attributes match the ones of python-pcapng's EnhancedPacket that the
+    packet decoders use, so that either can be provided to them.
+    """
+
+    interface_id: int
+    interface: Interface
+    endianness: str
+    timestamp_units: int
+    packet_data: memoryview
+    # When parsing headers only, and the packet data is longer than
+    # payloads.HEADER_SIZE, packet_data only holds its start, and the data is
+    # read back in full from there.
+    data_ref: Optional[payloads.DataRef] = None
+
+    @property
+    def link_type(self) -> int:
+        return self.interface.link_type
+
+    @property
+    def timestamp(self) -> float:
+        return self.timestamp_units * self.interface.timestamp_resolution
+
+    @property
+    def timestamp_ns(self) -> int:
+        return self.interface.to_nanoseconds(self.timestamp_units)
+
+
+Block = Union[Interface, EnhancedPacket]
+
+# Called with the interface, endianness, buffer, offset of the packet data and
+# timestamp of each packet before it is decoded; packets for which it returns
+# False are skipped.
+PacketPredicate = typing.Callable[[Interface, str, memoryview, int, int], bool]
+
+
+def _block_endianness(buffer: memoryview, offset: int) -> str:
+    """Return the endianness of a section, from the start of its header block."""
+    magic_start = offset + _BLOCK_HEADER_SIZE
+    magic_end = magic_start + 4
+    magic = bytes(buffer[magic_start:magic_end])
+    if magic == _LITTLE_ENDIAN_MAGIC:
+        return "<"
+    elif magic == _BIG_ENDIAN_MAGIC:
+        return ">"
+    raise ValueError(f"Invalid pcapng byte-order magic: {magic.hex()}")
+
+
+def _parse_interface(endianness: str, buffer: memoryview, offset: int) -> Interface:
+    _, block_length, link_type = struct.unpack_from(endianness + "IIH", buffer, offset)
+
+    option_offset = offset + 16
+    options_end = offset + block_length - _BLOCK_TRAILER_SIZE
+    while option_offset + 4 <= options_end:
+        code, length = struct.unpack_from(endianness + "HH", buffer, option_offset)
+        if code == _OPTION_END:
+            break
+        if code == _OPTION_IF_TSRESOL and length == 1:
+            return Interface.from_tsresol(link_type, buffer[option_offset + 4])
+        option_offset += 4 + ((length + 3) & ~3)
+
+    return Interface(link_type)
+
+
+def timestamp_ns(block: typing.Any) -> int:
+    """Return the timestamp of an Enhanced Packet Block, in nanoseconds.
+
+    This accepts anything providing timestamp_ns, as well as python-pcapng's
+    EnhancedPacket blocks, whose timestamp attribute is a float number of
+    seconds, too coarse for nanoseconds.
+    """
+    if hasattr(block, "timestamp_ns"):
+        return block.timestamp_ns
+    link_type = block.interface.link_type
+    options = block.interface.options
+    if "if_tsresol" in options:
+        # python-pcapng keeps the raw bytes of the option.
+        interface = Interface.from_tsresol(link_type, options["if_tsresol"][0])
+    else:
+        interface = Interface(link_type)
+    return interface.to_nanoseconds(block.timestamp_high << 32 | block.timestamp_low)
+
+
+# Each block is provided as (endianness, block_type, buffer, offset), with the
+# block starting at the given offset in the buffer.
+_RawBlock = Tuple[str, int, memoryview, int]
+
+
+def _decode_blocks(
+    blocks: Iterator[_RawBlock],
+    interfaces: typing.Sequence[Interface] = (),
+    predicate: Optional[PacketPredicate] = None,
+) -> Iterator[Block]:
+    interfaces = list(interfaces)
+    for endianness, block_type, buffer, offset in blocks:
+        if block_type == ENHANCED_PACKET_BLOCK:
+            (
+                interface_id,
+                timestamp_high,
+                timestamp_low,
+                captured_length,
+                _,
+            ) = _ENHANCED_PACKET_HEADERS[endianness].unpack_from(buffer, offset + 8)
+            interface = interfaces[interface_id]
+            timestamp_units = (timestamp_high << 32) | timestamp_low
+            data_start = offset + _ENHANCED_PACKET_DATA_OFFSET
+            if predicate is not None and not predicate(
+                interface, endianness, buffer, data_start, timestamp_units
+            ):
+                continue
+            data_end = data_start + captured_length
+            yield EnhancedPacket(
+                interface_id,
+                interface,
+                endianness,
+                timestamp_units,
+                buffer[data_start:data_end],
+            )
+        elif block_type == INTERFACE_DESCRIPTION_BLOCK:
+            interface = _parse_interface(endianness, buffer, offset)
+            interfaces.append(interface)
+            yield interface
+        elif block_type == SECTION_HEADER_BLOCK:
+            interfaces = []
+
+
+def _buffer_blocks(
+    buffer: memoryview,
+    start: int = 0,
+    end: Optional[int] = None,
+    endianness: Optional[str] = None,
+) -> Iterator[_RawBlock]:
+    block_header: Optional[struct.Struct] = None
+    if endianness is not None:
+        block_header = _BLOCK_HEADERS[endianness]
+    offset = start
+    if end is None:
+        end = len(buffer)
+    while offset < end:
+        if offset + _MINIMUM_BLOCK_SIZE > end:
+            raise ValueError(f"Truncated pcapng block at offset {offset}")
+
+        block_type_end = offset + 4
+        if buffer[offset:block_type_end] == _SECTION_HEADER_MAGIC:
+            endianness = _block_endianness(buffer, offset)
+            block_header = _BLOCK_HEADERS[endianness]
+        elif endianness is None:
+            raise ValueError("Not a pcapng capture: missing Section Header Block")
+        assert block_header is not None
+
+        block_type, block_length = block_header.unpack_from(buffer, offset)
+        block_end = offset + block_length
+        if block_length < _MINIMUM_BLOCK_SIZE or block_end > end:
+            raise ValueError(f"Truncated pcapng block at offset {offset}")
+
+        yield endianness, block_type, buffer, offset
+        offset = block_end
+
+
+def _stream_blocks(stream: BinaryIO) -> Iterator[_RawBlock]:
+    endianness: Optional[str] = None
+    block_header: Optional[struct.Struct] = None
+    while True:
+        header = stream.read(_MINIMUM_BLOCK_SIZE)
+        if not header:
+            return
+        if len(header) < _MINIMUM_BLOCK_SIZE:
+            raise ValueError("Truncated pcapng block at end of stream")
+
+        if header[:4] == _SECTION_HEADER_MAGIC:
+            endianness = _block_endianness(memoryview(header), 0)
+            block_header = _BLOCK_HEADERS[endianness]
+        elif endianness is None:
+            raise ValueError("Not a pcapng capture: missing Section Header Block")
+        assert block_header is not None
+
+        block_type, block_length = block_header.unpack_from(header)
+        if block_length < _MINIMUM_BLOCK_SIZE:
+            raise ValueError(f"Invalid pcapng block length {block_length}")
+        rest = stream.read(block_length - len(header))
+        if len(rest) < block_length - len(header):
+            raise ValueError("Truncated pcapng block at end of stream")
+
+        yield endianness, block_type, memoryview(header + rest), 0
+
+
+def _stream_headers(
+    stream: BinaryIO, predicate: Optional[PacketPredicate] = None
+) -> Iterator[Block]:
+    """Decode the blocks of a seekable stream, skipping over packet data."""
+    reader = payloads.CaptureReader(stream)
+    block_start = stream.tell()
+    # Seeking past the end of the stream does not fail, so skipped blocks are
+    # checked against its size instead.
+    stream_end = stream.seek(0, io.SEEK_END)
+    stream.seek(block_start)
+    endianness: Optional[str] = None
+    block_header: Optional[struct.Struct] = None
+    interfaces: List[Interface] = []
+    while True:
+        block_start = stream.tell()
+        header = stream.read(_MINIMUM_BLOCK_SIZE)
+        if not header:
+            return
+        if len(header) < _MINIMUM_BLOCK_SIZE:
+            raise ValueError("Truncated pcapng block at end of stream")
+
+        if header[:4] == _SECTION_HEADER_MAGIC:
+            endianness = _block_endianness(memoryview(header), 0)
+            block_header = _BLOCK_HEADERS[endianness]
+        elif endianness is None:
+            raise ValueError("Not a pcapng capture: missing Section Header Block")
+        assert block_header is not None
+
+        block_type, block_length = block_header.unpack_from(header)
+        if block_length < _MINIMUM_BLOCK_SIZE:
+            raise ValueError(f"Invalid pcapng block length {block_length}")
+        if block_type != ENHANCED_PACKET_BLOCK:
+            rest = stream.read(block_length - len(header))
+            if len(rest) < block_length - len(header):
+                raise ValueError("Truncated pcapng block at end of stream")
+            if block_type == INTERFACE_DESCRIPTION_BLOCK:
+                interface = _parse_interface(endianness, memoryview(header + rest), 0)
+                interfaces.append(interface)
+                yield interface
+            elif block_type == SECTION_HEADER_BLOCK:
+                interfaces = []
+            continue
+
+        fields = stream.read(_ENHANCED_PACKET_DATA_OFFSET - len(header))
+        if len(fields) < _ENHANCED_PACKET_DATA_OFFSET - len(header):
+            raise ValueError("Truncated pcapng block at end of stream")
+        block = header + fields
+        (
+            interface_id,
+            timestamp_high,
+            timestamp_low,
+            captured_length,
+            _,
+        ) = _ENHANCED_PACKET_HEADERS[endianness].unpack_from(block, 8)
+        kept_length = min(captured_length, payloads.HEADER_SIZE)
+        data = stream.read(kept_length)
+        if len(data) < kept_length:
+            raise ValueError("Truncated pcapng block at end of stream")
+
+        block_end = block_start + block_length
+        if block_end > stream_end:
+            raise ValueError("Truncated pcapng block at end of stream")
+        stream.seek(block_end)
+
+        interface = interfaces[interface_id]
+        timestamp_units = (timestamp_high << 32) | timestamp_low
+        buffer = memoryview(block + data)
+        if predicate is not None and not predicate(
+            interface, endianness, buffer, _ENHANCED_PACKET_DATA_OFFSET, timestamp_units
+        ):
+            continue
+        data_ref: Optional[payloads.DataRef] = None
+        if captured_length > kept_length:
+            data_ref = payloads.DataRef(
+                reader, block_start + _ENHANCED_PACKET_DATA_OFFSET, captured_length
+            )
+        yield EnhancedPacket(
+            interface_id,
+            interface,
+            endianness,
+            timestamp_units,
+            buffer[_ENHANCED_PACKET_DATA_OFFSET:],
+            data_ref,
+        )
+
+
+class Chunk(NamedTuple):
+    """A range of whole blocks in a pcapng buffer, that can be decoded alone.
+
+    Together with the offsets, this carries the state that the blocks depend
+    on: the endianness of the section, and the interfaces described so far.
+    """
+
+    start: int
+    end: int
+    endianness: Optional[str]
+    interfaces: Tuple[Interface, ...]
+
+
+def split_buffer(
+    buffer: Union[bytes, mmap.mmap, memoryview], chunk_size: int
+) -> List[Chunk]:
+    """Split a buffer containing a pcapng file into chunks of whole blocks.
+
+    Only block headers are read, so this is much cheaper than decoding the
+    blocks themselves. Each chunk is at least chunk_size bytes long, except
+    for the last one.
+    """
+    view = memoryview(buffer)
+    chunks: List[Chunk] = []
+    chunk = Chunk(0, 0, None, ())
+    interfaces: List[Interface] = []
+    for endianness, block_type, _, offset in _buffer_blocks(view):
+        if offset - chunk.start >= chunk_size:
+            chunks.append(chunk._replace(end=offset))
+            chunk = Chunk(offset, offset, endianness, tuple(interfaces))
+
+        if block_type == INTERFACE_DESCRIPTION_BLOCK:
+            interfaces.append(_parse_interface(endianness, view, offset))
+        elif block_type == SECTION_HEADER_BLOCK:
+            interfaces = []
+
+    if len(view) > chunk.start:
+        chunks.append(chunk._replace(end=len(view)))
+    return chunks
+
+
+def next_chunk(
+    buffer: Union[bytes, mmap.mmap, memoryview], chunk: Chunk, end: Optional[int] = None
+) -> Chunk:
+    """Return the chunk following the provided one, up to end.
+
+    Only the block headers of the provided chunk are read, to carry its state
+    over to the following chunk.
+
+    Args:
+      buffer: The buffer containing the pcapng file.
+      chunk: The chunk to continue from.
+      end: The end offset of the returned chunk, by default the end of buffer.
+    """
+    view = memoryview(buffer)
+    endianness = chunk.endianness
+    interfaces = list(chunk.interfaces)
+    for endianness, block_type, _, offset in _buffer_blocks(
+        view, chunk.start, chunk.end, chunk.endianness
+    ):
+        if block_type == INTERFACE_DESCRIPTION_BLOCK:
+            interfaces.append(_parse_interface(endianness, view, offset))
+        elif block_type == SECTION_HEADER_BLOCK:
+            interfaces = []
+
+    if end is None:
+        end = len(view)
+    return Chunk(chunk.end, end, endianness, tuple(interfaces))
+
+
+def read_chunk(
+    buffer: Union[bytes, mmap.mmap, memoryview],
+    chunk: Chunk,
+    predicate: Optional[PacketPredicate] = None,
+) -> Iterator[Block]:
+    """Yield the interfaces and packets found in a chunk of a pcapng buffer.
+
+    If a predicate is provided, only the packets it accepts are yielded.
+    """
+    return _decode_blocks(
+        _buffer_blocks(memoryview(buffer), chunk.start, chunk.end, chunk.endianness),
+        chunk.interfaces,
+        predicate,
+    )
+
+
+class PacketRun(NamedTuple):
+    """Consecutive packets from the same interface, located in a pcapng buffer.
+
+    Rather than views of the packet data, this holds the offset and length of
+    the data of each packet within the buffer, as compact arrays that can be
+    cheaply sent between processes.
+    """
+
+    interface_id: int
+    interface: Interface
+    endianness: str
+    timestamp_units: array.array
+    data_offsets: array.array
+    data_lengths: array.array
+
+
+def index_chunk(
+    buffer: Union[bytes, mmap.mmap, memoryview], chunk: Chunk
+) -> List[Union[Interface, PacketRun]]:
+    """Locate the interfaces and packets found in a chunk of a pcapng buffer."""
+    view = memoryview(buffer)
+    interfaces = list(chunk.interfaces)
+    index: List[Union[Interface, PacketRun]] = []
+    run: Optional[PacketRun] = None
+    for endianness, block_type, _, offset in _buffer_blocks(
+        view, chunk.start, chunk.end, chunk.endianness
+    ):
+        if block_type == ENHANCED_PACKET_BLOCK:
+            (
+                interface_id,
+                timestamp_high,
+                timestamp_low,
+                captured_length,
+                _,
+            ) = _ENHANCED_PACKET_HEADERS[endianness].unpack_from(view, offset + 8)
+            interface = interfaces[interface_id]
+            if (
+                run is None
+                or run.interface is not interface
+                or run.endianness != endianness
+            ):
+                run = PacketRun(
+                    interface_id,
+                    interface,
+                    endianness,
+                    array.array("Q"),
+                    array.array("Q"),
+                    array.array("Q"),
+                )
+                index.append(run)
+            run.timestamp_units.append((timestamp_high << 32) | timestamp_low)
+            run.data_offsets.append(offset + _ENHANCED_PACKET_DATA_OFFSET)
+            run.data_lengths.append(captured_length)
+        elif block_type == INTERFACE_DESCRIPTION_BLOCK:
+            interface = _parse_interface(endianness, view, offset)
+            interfaces.append(interface)
+            index.append(interface)
+            run = None
+        elif block_type == SECTION_HEADER_BLOCK:
+            interfaces = []
+            run = None
+
+    return index
+
+
+def read_buffer(buffer: Union[bytes, mmap.mmap, memoryview]) -> Iterator[Block]:
+    """Yield the interfaces and packets found in a buffer containing a pcapng file.
+
+    The packet data of the returned packets references the buffer directly.
+    """
+    return _decode_blocks(_buffer_blocks(memoryview(buffer)))
+
+
+def read_stream(
+    stream: BinaryIO,
+    predicate: Optional[PacketPredicate] = None,
+    headers_only: bool = False,
+) -> Iterator[Block]:
+    """Yield the interfaces and packets found in a pcapng stream.
+
+    If the stream is backed by a regular file, this maps it in memory rather
+    than reading it, otherwise blocks are read one at a time. If a predicate
+    is provided, only the packets it accepts are yielded.
+
+    If headers_only is set, and the stream is read rather than mapped but can
+    be seeked, only the start of the data of each packet is read (see
+    usbmon.payloads), and the rest is skipped over. The stream then needs to
+    remain open for as long as the data of the packets is accessed.
+    """
+    try:
+        fileno = stream.fileno()
+        offset = stream.tell()
+        mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        if headers_only and stream.seekable():
+            return _stream_headers(stream, predicate)
+        return _decode_blocks(_stream_blocks(stream), predicate=predicate)
+
+    return _decode_blocks(
+        _buffer_blocks(memoryview(mapped)[offset:]), predicate=predicate
+    )
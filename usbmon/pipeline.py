@@ -0,0 +1,277 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Pipelined reading of captures, overlapping I/O with decoding.
+
+A Pipeline splits reading a capture in three stages, connected by bounded
+queues:
+
+ - a reader thread reads the capture in large chunks, ahead of the decoder;
+ - a decoder thread parses the chunks into items (such as packets);
+ - the consumer, iterating over the pipeline, processes the items.
+
+This hides the latency of slow inputs, such as network filesystems or
+decompressing streams, behind the decoding. Each stage keeps its own counters,
+to tell which one limits the throughput.
+"""
+
+import dataclasses
+import io
+import queue
+import threading
+import time
+from typing import BinaryIO, Callable, Generic, Iterator, List, TypeVar, cast
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_BATCH_SIZE = 1024
+
+_T = TypeVar("_T")
+
+# Put in a queue after the last chunk or batch.
+_END = object()
+
+# How often the stages check whether the pipeline was closed, while blocked on
+# a queue.
+_STOP_CHECK_INTERVAL = 0.1
+
+
+@dataclasses.dataclass
+class StageCounters:
+    """Throughput counters of a pipeline stage.
+
+    Waiting time is spent blocked on the queues, either for input from the
+    previous stage, or for the next stage to make room for output.
+    """
+
+    name: str
+    items: int = 0
+    bytes: int = 0
+    busy_seconds: float = 0.0
+    waiting_seconds: float = 0.0
+
+    @property
+    def items_per_second(self) -> float:
+        if not self.busy_seconds:
+            return 0.0
+        return self.items / self.busy_seconds
+
+    def __str__(self) -> str:
+        counts = f"{self.items} items"
+        if self.bytes:
+            counts += f", {self.bytes} bytes"
+        return (
+            f"{self.name}: {counts}, {self.busy_seconds:.3f}s busy"
+            f" ({self.items_per_second:.0f} items/s),"
+            f" {self.waiting_seconds:.3f}s waiting"
+        )
+
+
+class _ChunkStream(io.RawIOBase):
+    """A stream over the chunks produced by the reader stage."""
+
+    def __init__(self, pipeline: "Pipeline"):
+        super().__init__()
+        self._pipeline = pipeline
+        self._chunk = memoryview(b"")
+        self._finished = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._chunk:
+            if self._finished:
+                return 0
+            chunk = self._pipeline._get(self._pipeline._chunks, self._pipeline.decoder)
+            if chunk is _END:
+                # The end is only queued once, but can be read more than once.
+                self._finished = True
+                return 0
+            self._chunk = memoryview(cast(bytes, chunk))
+
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+class _Stopped(Exception):
+    """Raised in the stages once the pipeline is closed."""
+
+
+class Pipeline(Generic[_T]):
+    """Reads and decodes a stream on background threads.
+
+    Iterating over the pipeline starts the stages, and yields the decoded items
+    in order. Errors in the reader or decoder stages are raised from the
+    iteration.
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        decode: Callable[[BinaryIO], Iterator[_T]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        """Set up the pipeline.
+
+        Args:
+          stream: The stream to read, from its current position.
+          decode: Decodes items from a stream, in the decoder thread. It is
+            passed a buffered stream providing the chunks read from stream.
+          chunk_size: How many bytes the reader reads at a time.
+          queue_size: How many chunks, and how many batches of items, can wait
+            between two stages.
+          batch_size: How many items the decoder hands over at a time.
+        """
+        self._stream = stream
+        self._decode = decode
+        self._chunk_size = chunk_size
+        self._batch_size = batch_size
+        self._chunks: "queue.Queue[object]" = queue.Queue(queue_size)
+        self._batches: "queue.Queue[object]" = queue.Queue(queue_size)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        self.reader = StageCounters("read")
+        self.decoder = StageCounters("decode")
+        self.consumer = StageCounters("consume")
+
+    @property
+    def counters(self) -> List[StageCounters]:
+        """The counters of all the stages, in pipeline order."""
+        return [self.reader, self.decoder, self.consumer]
+
+    def _put(self, output: "queue.Queue[object]", item, counters: StageCounters):
+        started = time.perf_counter()
+        try:
+            while True:
+                if self._stop.is_set():
+                    raise _Stopped()
+                try:
+                    output.put(item, timeout=_STOP_CHECK_INTERVAL)
+                    return
+                except queue.Full:
+                    pass
+        finally:
+            counters.waiting_seconds += time.perf_counter() - started
+
+    def _get(self, source: "queue.Queue[object]", counters: StageCounters) -> object:
+        started = time.perf_counter()
+        try:
+            while True:
+                if self._stop.is_set():
+                    raise _Stopped()
+                try:
+                    item = source.get(timeout=_STOP_CHECK_INTERVAL)
+                except queue.Empty:
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                return item
+        finally:
+            counters.waiting_seconds += time.perf_counter() - started
+
+    def _run_stage(
+        self,
+        stage: Callable[[], None],
+        output: "queue.Queue[object]",
+        counters: StageCounters,
+    ) -> None:
+        started = time.perf_counter()
+        try:
+            stage()
+            self._put(output, _END, counters)
+        except _Stopped:
+            pass
+        except Exception as error:
+            try:
+                self._put(output, error, counters)
+            except _Stopped:
+                pass
+        finally:
+            counters.busy_seconds = (
+                time.perf_counter() - started - counters.waiting_seconds
+            )
+
+    def _read(self) -> None:
+        while True:
+            chunk = self._stream.read(self._chunk_size)
+            if not chunk:
+                return
+            self.reader.items += 1
+            self.reader.bytes += len(chunk)
+            self._put(self._chunks, chunk, self.reader)
+
+    def _decode_chunks(self) -> None:
+        chunks = cast(BinaryIO, io.BufferedReader(_ChunkStream(self)))
+        batch: List[_T] = []
+        for item in self._decode(chunks):
+            batch.append(item)
+            if len(batch) >= self._batch_size:
+                self.decoder.items += len(batch)
+                self._put(self._batches, batch, self.decoder)
+                batch = []
+        if batch:
+            self.decoder.items += len(batch)
+            self._put(self._batches, batch, self.decoder)
+
+    def _start(self) -> None:
+        for stage, output, counters in (
+            (self._read, self._chunks, self.reader),
+            (self._decode_chunks, self._batches, self.decoder),
+        ):
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(stage, output, counters),
+                name=f"usbmon-pipeline-{counters.name}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def __iter__(self) -> Iterator[_T]:
+        if self._threads:
+            raise RuntimeError("A pipeline can only be iterated over once.")
+        self._start()
+        try:
+            while True:
+                batch = self._get(self._batches, self.consumer)
+                if batch is _END:
+                    return
+                started = time.perf_counter()
+                yield from cast(List[_T], batch)
+                self.consumer.items += len(cast(List[_T], batch))
+                self.consumer.busy_seconds += time.perf_counter() - started
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop the stages, and wait for them to finish."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self) -> "Pipeline[_T]":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
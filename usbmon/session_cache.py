@@ -0,0 +1,597 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""On-disk cache of parsed capture sessions.
+
+Each cache entry holds the packets of a capture, together with the pairs they
+were matched into, as a handful of flat columns: the kind, tag and timestamp
+of each packet, the offsets of their data within a single blob, and the packet
+indices of each pair and of the events still waiting for their match. Loading
+an entry only maps it in memory; packets are built from it when the session is
+first iterated.
+
+Entries are stored in a cache directory, named after a digest of the start of
+the capture and of the parse options, and are only used if the SHA-256 digest
+of the capture content they were built from matches. If the capture has grown
+since, and its original content is unchanged, as is the case for captures
+that are still being written, the entry is extended with the new packets
+rather than rebuilt. Once the directory grows past its maximum size, the least
+recently used entries are removed.
+"""
+
+import array
+import hashlib
+import io
+import logging
+import mmap
+import os
+import stat
+import struct
+import sys
+import tempfile
+import typing
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Union
+
+import pcapng
+
+from usbmon import capture_session, packet, pcap, pcapng_reader
+from usbmon.capture import usbmon_mmap, usbpcap
+
+SESSION_SUFFIX = ".usbsession"
+
+DEFAULT_MAX_SIZE = 1 << 30
+
+_MAGIC = b"USBSES\x00\x02"
+_HEADER = struct.Struct("<8sBBccIQq32sQQQQQ")
+_INTERFACE = struct.Struct("<HBB")
+_ALIGNMENT = 8
+
+_NATIVE_BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+
+_PCAPNG_FORMAT = b"n"
+_PCAP_FORMAT = b"p"
+
+# Entries are looked up by the digest of this much of the start of the
+# capture, so that they can be found again once the capture has grown.
+_KEY_PREFIX_SIZE = 64 << 10
+_HASH_BLOCK_SIZE = 1 << 20
+
+# Kinds of packets, each built differently out of their data.
+_USBMON_LITTLE_ENDIAN = 0
+_USBMON_BIG_ENDIAN = 1
+_USBPCAP = 2
+
+_USBMON_KINDS = {"<": _USBMON_LITTLE_ENDIAN, ">": _USBMON_BIG_ENDIAN}
+_USBMON_ENDIANNESS = {kind: endianness for endianness, kind in _USBMON_KINDS.items()}
+
+_Record = Union[pcapng_reader.Block, pcap.Record]
+
+
+class _Header(NamedTuple):
+    magic: bytes
+    # The columns are stored in native byte order, so that they can be used
+    # directly out of the mapped entry.
+    byte_order: int
+    retag_urbs: int
+    capture_format: bytes
+    # The state needed to continue reading a pcapng capture from its end.
+    resume_endianness: bytes
+    interface_count: int
+    capture_size: int
+    capture_mtime_ns: int
+    capture_digest: bytes
+    next_tag: int
+    packet_count: int
+    pair_count: int
+    pending_count: int
+    data_size: int
+
+
+class _DecodedPacket(NamedTuple):
+    """A packet, together with what is needed to build it again."""
+
+    kind: int
+    timestamp_ns: int
+    packet_data: memoryview
+    packet: packet.Packet
+
+
+class _CachedRecord(NamedTuple):
+    """The attributes of a packet record needed to decode a USBPcap packet."""
+
+    timestamp_ns: int
+    packet_data: memoryview
+
+
+def _check_link_type(link_type: int) -> None:
+    if link_type not in (pcapng.constants.link_types.LINKTYPE_USB_LINUX_MMAPPED, 249):
+        description = pcapng.constants.link_types.LINKTYPE_DESCRIPTIONS.get(
+            link_type, f"Unknown link type: 0x{link_type:04x}"
+        )
+        raise Exception(f"Expected USB capture, found {description}.")
+
+
+def _decode_records(records: Iterator[_Record]) -> Iterator[_DecodedPacket]:
+    for record in records:
+        if isinstance(record, pcapng_reader.Interface):
+            _check_link_type(record.link_type)
+            continue
+
+        if record.link_type == pcapng.constants.link_types.LINKTYPE_USB_LINUX_MMAPPED:
+            yield _DecodedPacket(
+                _USBMON_KINDS[record.endianness],
+                0,
+                record.packet_data,
+                usbmon_mmap.UsbmonMmapPacket(record.endianness, record.packet_data),
+            )
+        elif record.link_type == 249:
+            try:
+                usbpcap_packet = usbpcap.UsbpcapPacket(record)
+            except usbpcap.UnsupportedCaptureData:
+                continue
+            yield _DecodedPacket(
+                _USBPCAP, record.timestamp_ns, record.packet_data, usbpcap_packet
+            )
+        else:
+            _check_link_type(record.link_type)
+
+
+class _Entry:
+    """A cache entry, mapped in memory."""
+
+    def __init__(self, mapped: mmap.mmap):
+        view = memoryview(mapped)
+        if len(view) < _HEADER.size:
+            raise ValueError("Truncated session cache entry")
+        self.header = header = _Header._make(_HEADER.unpack_from(view))
+        if header.magic != _MAGIC or header.byte_order != _NATIVE_BYTE_ORDER:
+            raise ValueError("Not a session cache entry for this system")
+
+        offset = _HEADER.size
+        # Everything following the header, to rewrite the entry with a new one.
+        self.body = view[offset:]
+
+        def section(size: int) -> memoryview:
+            nonlocal offset
+            start = offset
+            end = start + size
+            if end > len(view):
+                raise ValueError("Truncated session cache entry")
+            offset = end + -end % _ALIGNMENT
+            return view[start:end]
+
+        packet_count = header.packet_count
+        self.interfaces = tuple(
+            pcapng_reader.Interface(*fields)
+            for fields in _INTERFACE.iter_unpack(
+                section(header.interface_count * _INTERFACE.size)
+            )
+        )
+        self.kinds = section(packet_count)
+        self.tags = section(packet_count * 8).cast("Q")
+        self.timestamps = section(packet_count * 8).cast("q")
+        self.data_offsets = section((packet_count + 1) * 8).cast("Q")
+        self.pair_firsts = section(header.pair_count * 8).cast("q")
+        self.pair_seconds = section(header.pair_count * 8).cast("q")
+        self.pending = section(header.pending_count * 8).cast("q")
+        self.data = section(header.data_size)
+
+    def resume_chunk(self) -> pcapng_reader.Chunk:
+        """Return the (empty) chunk following the part of the capture stored."""
+        endianness = self.header.resume_endianness
+        return pcapng_reader.Chunk(
+            self.header.capture_size,
+            self.header.capture_size,
+            None if endianness == b"\0" else endianness.decode("ascii"),
+            self.interfaces,
+        )
+
+    def build_packet(self, index: int) -> packet.Packet:
+        start = self.data_offsets[index]
+        end = self.data_offsets[index + 1]
+        data = self.data[start:end]
+        kind = self.kinds[index]
+        cached_packet: packet.Packet
+        if kind == _USBPCAP:
+            cached_packet = usbpcap.UsbpcapPacket(
+                _CachedRecord(self.timestamps[index], data)
+            )
+        else:
+            cached_packet = usbmon_mmap.UsbmonMmapPacket(_USBMON_ENDIANNESS[kind], data)
+        cached_packet.tag = self.tags[index]
+        return cached_packet
+
+    def pairs(self) -> Iterator[packet.PacketPair]:
+        for first, second in zip(self.pair_firsts, self.pair_seconds):
+            yield self.build_packet(first), (
+                None if second < 0 else self.build_packet(second)
+            )
+
+
+class CachedSession(capture_session.Session):
+    """A Session that can be stored in, and loaded from, the session cache.
+
+    The pairs loaded from a cache entry are only built once the session is
+    first iterated over. More packets can be added to the session, and stored
+    back as an extension of the entry.
+    """
+
+    def __init__(self, retag_urbs: bool = True, entry: Optional[_Entry] = None):
+        super().__init__(retag_urbs)
+        self._entry = entry
+        self._cached_pairs: Optional[capture_session._PairIndex] = None
+        # Index within the (extended) entry of the packets that are not stored
+        # in it yet, or that might have been retagged since they were.
+        self._packet_indices: typing.Dict[int, int] = {}
+        self._restored_packets: List[packet.Packet] = []
+        self._new_packets: List[_DecodedPacket] = []
+
+        if entry is not None:
+            self._next_tag = entry.header.next_tag
+            for index in entry.pending:
+                pending_packet = entry.build_packet(index)
+                self._packet_indices[id(pending_packet)] = index
+                self._restored_packets.append(pending_packet)
+                self._submitted_packets[pending_packet.tag] = pending_packet
+
+    def _add_records(self, records: Iterator[_Record]) -> None:
+        next_index = self._entry.header.packet_count if self._entry else 0
+        for decoded in _decode_records(records):
+            self._packet_indices[id(decoded.packet)] = next_index
+            next_index += 1
+            self._new_packets.append(decoded)
+            self.add(decoded.packet)
+
+    def _load_pairs(self) -> Optional[capture_session._PairIndex]:
+        if self._entry is not None and self._cached_pairs is None:
+            self._cached_pairs = capture_session._PairIndex(list(self._entry.pairs()))
+        return self._cached_pairs
+
+    def in_pairs(self) -> Iterator[packet.PacketPair]:
+        cached_pairs = self._load_pairs()
+        if cached_pairs is not None:
+            yield from cached_pairs.pairs
+        yield from super().in_pairs()
+
+    def pairs_for(
+        self, address: capture_session.Address
+    ) -> Iterator[packet.PacketPair]:
+        cached_pairs = self._load_pairs()
+        if cached_pairs is not None:
+            yield from cached_pairs.for_address(address)
+        yield from super().pairs_for(address)
+
+    def pairs_for_tag(self, tag: int) -> Iterator[packet.PacketPair]:
+        cached_pairs = self._load_pairs()
+        if cached_pairs is not None:
+            yield from cached_pairs.for_tag(tag)
+        yield from super().pairs_for_tag(tag)
+
+    def _pair_indexes(self) -> List[capture_session._PairIndex]:
+        cached_pairs = self._load_pairs()
+        if cached_pairs is None:
+            return super()._pair_indexes()
+        return [cached_pairs] + super()._pair_indexes()
+
+    def _serialize(
+        self,
+        capture_format: bytes,
+        capture_stat: os.stat_result,
+        capture_digest: bytes,
+        resume_chunk: Optional[pcapng_reader.Chunk],
+    ) -> List[Union[bytes, memoryview]]:
+        """Return the content of the cache entry for the session, in parts."""
+        kinds = array.array("B")
+        tags = array.array("Q")
+        timestamps = array.array("q")
+        data_offsets = array.array("Q", [0])
+        pair_firsts = array.array("q")
+        pair_seconds = array.array("q")
+        data: List[Union[bytes, memoryview]] = []
+        data_size = 0
+
+        entry = self._entry
+        if entry is not None:
+            kinds.frombytes(entry.kinds.cast("B"))
+            tags.frombytes(entry.tags.cast("B"))
+            timestamps.frombytes(entry.timestamps.cast("B"))
+            data_offsets.frombytes(entry.data_offsets[1:].cast("B"))
+            pair_firsts.frombytes(entry.pair_firsts.cast("B"))
+            pair_seconds.frombytes(entry.pair_seconds.cast("B"))
+            data.append(entry.data)
+            data_size = len(entry.data)
+        for restored_packet in self._restored_packets:
+            tags[self._packet_indices[id(restored_packet)]] = restored_packet.tag
+
+        for new_packet in self._new_packets:
+            kinds.append(new_packet.kind)
+            tags.append(new_packet.packet.tag)
+            timestamps.append(new_packet.timestamp_ns)
+            data.append(new_packet.packet_data)
+            data_size += len(new_packet.packet_data)
+            data_offsets.append(data_size)
+
+        for first, second in self._packet_pairs:
+            pair_firsts.append(self._packet_indices[id(first)])
+            pair_seconds.append(
+                -1 if second is None else self._packet_indices[id(second)]
+            )
+        pending = array.array(
+            "q",
+            (
+                self._packet_indices[id(pending_packet)]
+                for pending_packet in self._submitted_packets.values()
+            ),
+        )
+
+        interfaces: typing.Tuple[pcapng_reader.Interface, ...] = ()
+        resume_endianness = b"\0"
+        if resume_chunk is not None:
+            interfaces = resume_chunk.interfaces
+            if resume_chunk.endianness is not None:
+                resume_endianness = resume_chunk.endianness.encode("ascii")
+
+        header = _Header(
+            _MAGIC,
+            _NATIVE_BYTE_ORDER,
+            self._retag_urbs,
+            capture_format,
+            resume_endianness,
+            len(interfaces),
+            capture_stat.st_size,
+            capture_stat.st_mtime_ns,
+            capture_digest,
+            self._next_tag,
+            len(kinds),
+            len(pair_firsts),
+            len(pending),
+            data_size,
+        )
+        sections: List[typing.Sequence[Union[bytes, memoryview]]] = [
+            [_HEADER.pack(*header)],
+            [
+                _INTERFACE.pack(
+                    interface.link_type,
+                    interface.timestamp_base,
+                    interface.timestamp_exponent,
+                )
+                for interface in interfaces
+            ],
+            [kinds.tobytes()],
+            [tags.tobytes()],
+            [timestamps.tobytes()],
+            [data_offsets.tobytes()],
+            [pair_firsts.tobytes()],
+            [pair_seconds.tobytes()],
+            [pending.tobytes()],
+            data,
+        ]
+        parts: List[Union[bytes, memoryview]] = []
+        for section in sections:
+            parts.extend(section)
+            size = sum(len(part) for part in section)
+            parts.append(bytes(-size % _ALIGNMENT))
+        return parts
+
+    def _forget_new_packets(self) -> None:
+        """Drop the bookkeeping only needed to store the session."""
+        self._packet_indices.clear()
+        self._restored_packets.clear()
+        self._new_packets.clear()
+
+
+def _entry_path(cache_dir: str, capture: memoryview, retag_urbs: bool) -> str:
+    key_end = min(len(capture), _KEY_PREFIX_SIZE)
+    key = hashlib.sha256(b"retag_urbs=%d\0" % retag_urbs)
+    key.update(capture[:key_end])
+    return os.path.join(cache_dir, key.hexdigest()[:32] + SESSION_SUFFIX)
+
+
+def _update_digest(
+    digest: "hashlib._Hash", capture: memoryview, start: int, end: int
+) -> None:
+    for block_start in range(start, end, _HASH_BLOCK_SIZE):
+        block_end = min(end, block_start + _HASH_BLOCK_SIZE)
+        digest.update(capture[block_start:block_end])
+
+
+def _load_entry(entry_path: str) -> Optional[_Entry]:
+    try:
+        with open(entry_path, "rb") as entry_file:
+            mapped = mmap.mmap(entry_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return _Entry(mapped)
+    except (OSError, ValueError) as error:
+        if not isinstance(error, FileNotFoundError):
+            logging.debug("Ignoring session cache entry %s: %s", entry_path, error)
+        return None
+
+
+def _replace_entry(
+    entry_path: str, parts: typing.Sequence[Union[bytes, memoryview]]
+) -> bool:
+    """Write the entry, returning whether it succeeded."""
+    cache_dir = os.path.dirname(entry_path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Entries are replaced atomically, as other processes might be using
+        # the same cache directory, or have the previous entry mapped.
+        with tempfile.NamedTemporaryFile(
+            dir=cache_dir, suffix=".tmp", delete=False
+        ) as entry_file:
+            try:
+                entry_file.writelines(parts)
+            except BaseException:
+                os.unlink(entry_file.name)
+                raise
+        os.replace(entry_file.name, entry_path)
+    except OSError as error:
+        logging.debug("Unable to write session cache entry %s: %s", entry_path, error)
+        return False
+    return True
+
+
+def _write_entry(
+    entry_path: str, parts: typing.Sequence[Union[bytes, memoryview]], max_size: int
+) -> None:
+    if _replace_entry(entry_path, parts):
+        _evict(os.path.dirname(entry_path), max_size, entry_path)
+
+
+def _touch_entry(entry_path: str) -> None:
+    """Mark the entry as recently used, by updating its modification time."""
+    try:
+        os.utime(entry_path)
+    except OSError:
+        pass
+
+
+def _evict(cache_dir: str, max_size: int, keep: str) -> None:
+    """Remove the least recently used entries, until the cache fits max_size."""
+    entries = []
+    total_size = 0
+    with os.scandir(cache_dir) as directory:
+        for dir_entry in directory:
+            if not dir_entry.name.endswith(SESSION_SUFFIX):
+                continue
+            try:
+                entry_stat = dir_entry.stat()
+            except OSError:
+                continue
+            total_size += entry_stat.st_size
+            if dir_entry.path != keep:
+                entries.append(
+                    (entry_stat.st_mtime_ns, entry_stat.st_size, dir_entry.path)
+                )
+
+    entries.sort()
+    for _, entry_size, entry_path in entries:
+        if total_size <= max_size:
+            break
+        try:
+            os.unlink(entry_path)
+        except OSError:
+            continue
+        total_size -= entry_size
+
+
+def _refresh_entry(entry_path: str, entry: _Entry, capture_mtime_ns: int) -> None:
+    """Record a new modification time for an unchanged capture in its entry."""
+    header = entry.header._replace(capture_mtime_ns=capture_mtime_ns)
+    _replace_entry(entry_path, (_HEADER.pack(*header), entry.body))
+
+
+def _parse_mapped(
+    capture: memoryview,
+    capture_stat: os.stat_result,
+    cache_dir: str,
+    retag_urbs: bool,
+    max_size: int,
+) -> capture_session.Session:
+    capture_size = capture_stat.st_size
+    capture_format = (
+        _PCAP_FORMAT if pcap.is_pcap_bytes(bytes(capture[:4])) else _PCAPNG_FORMAT
+    )
+    entry_path = _entry_path(cache_dir, capture, retag_urbs)
+
+    entry = _load_entry(entry_path)
+    digest = hashlib.sha256()
+    if entry is not None:
+        header = entry.header
+        if (
+            header.capture_format != capture_format
+            or bool(header.retag_urbs) != retag_urbs
+            or header.capture_size > capture_size
+        ):
+            entry = None
+        elif (
+            header.capture_size == capture_size
+            and header.capture_mtime_ns == capture_stat.st_mtime_ns
+        ):
+            _touch_entry(entry_path)
+            return CachedSession(retag_urbs, entry)
+        else:
+            _update_digest(digest, capture, 0, header.capture_size)
+            if digest.digest() != header.capture_digest:
+                entry = None
+                digest = hashlib.sha256()
+            elif header.capture_size == capture_size:
+                _refresh_entry(entry_path, entry, capture_stat.st_mtime_ns)
+                _touch_entry(entry_path)
+                return CachedSession(retag_urbs, entry)
+
+    # Either build a new entry, or extend the existing one with the packets
+    # appended to the capture since.
+    session = CachedSession(retag_urbs, entry)
+    start = entry.header.capture_size if entry is not None else 0
+    resume_chunk: Optional[pcapng_reader.Chunk] = None
+    if capture_format == _PCAP_FORMAT:
+        session._add_records(pcap.read_buffer(capture, start or None))
+    else:
+        if entry is not None:
+            resume_chunk = entry.resume_chunk()._replace(end=capture_size)
+        else:
+            resume_chunk = pcapng_reader.Chunk(0, capture_size, None, ())
+        session._add_records(pcapng_reader.read_chunk(capture, resume_chunk))
+        resume_chunk = pcapng_reader.next_chunk(capture, resume_chunk)
+
+    _update_digest(digest, capture, start, capture_size)
+    _write_entry(
+        entry_path,
+        session._serialize(capture_format, capture_stat, digest.digest(), resume_chunk),
+        max_size,
+    )
+    session._forget_new_packets()
+    return session
+
+
+def parse_stream(
+    stream: BinaryIO,
+    cache_dir: str,
+    retag_urbs: bool = True,
+    max_size: int = DEFAULT_MAX_SIZE,
+) -> Optional[capture_session.Session]:
+    """Parse the provided capture stream into a Session, through the cache.
+
+    Args:
+      stream: A BinaryIO object backed by a regular file, positioned at its
+        start, that contains the pcapng or libpcap data to parse.
+      cache_dir: The directory to store the cache entries in. It is created if
+        needed.
+      retag_urbs: Whether to re-generate tags for the URBs based on UUIDs.
+      max_size: The maximum size, in bytes, that the entries in cache_dir can
+        add up to.
+
+    Returns:
+      A usbmon.capture_session.Session object, or None if the stream cannot be
+      cached, as it is not a regular file or is not at its start.
+    """
+    try:
+        fileno = stream.fileno()
+        if stream.tell() != 0:
+            return None
+        capture_stat = os.fstat(fileno)
+        if not stat.S_ISREG(capture_stat.st_mode) or not capture_stat.st_size:
+            return None
+        mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+    # The file might have grown after it was inspected.
+    capture_size = capture_stat.st_size
+    capture = memoryview(mapped)[:capture_size]
+    return _parse_mapped(capture, capture_stat, cache_dir, retag_urbs, max_size)
@@ -19,10 +19,10 @@
 """Utilities to parse and inspect USB setup packets."""
 
 import enum
+import functools
+import struct
 from typing import Optional
 
-import construct
-
 
 @enum.unique
 class Direction(enum.IntEnum):
@@ -59,53 +59,67 @@ class Recipient(enum.IntEnum):
     RESERVED = 4
 
 
-_USB_SETUP_PACKET = construct.Struct(
-    bmRequestType=construct.Union(
-        0,
-        parsed=construct.BitStruct(
-            direction=construct.Mapping(
-                construct.BitsInteger(1), {e: e.value for e in Direction}
-            ),
-            type=construct.Mapping(
-                construct.BitsInteger(2), {e: e.value for e in Type}
-            ),
-            recipient=construct.Mapping(
-                construct.BitsInteger(5), {e: e.value for e in Recipient}
-            ),
-        ),
-        raw=construct.Byte,
-    ),
-    bRequest=construct.Byte,
-    wValue=construct.Int16ul,
-    wIndex=construct.Int16ul,
-    wLength=construct.Int16ul,
-)
+_SETUP_PACKET = struct.Struct("<BBHHH")
+
+# Recipients 4 to 31 are all reserved.
+_RECIPIENTS = tuple(Recipient(min(bits, Recipient.RESERVED)) for bits in range(32))
+
+# Real captures keep repeating the same few setup packets (status polling, HID
+# reports, vendor requests), so decoded packets are shared between URBs.
+_CACHE_SIZE = 4096
 
 
 class SetupPacket:
+    """A decoded USB setup packet.
+
+    Setup packets are immutable, so the same instance can be shared by all the
+    URBs with the same setup bytes, as returned by parse().
+    """
+
+    __slots__ = (
+        "_raw",
+        "_request_type",
+        "_direction",
+        "_type",
+        "_recipient",
+        "_request",
+        "_value",
+        "_index",
+        "_length",
+    )
+
     def __init__(self, raw_packet: bytes):
         self._raw = raw_packet
-        self._parsed = _USB_SETUP_PACKET.parse(raw_packet)
+        (
+            self._request_type,
+            self._request,
+            self._value,
+            self._index,
+            self._length,
+        ) = _SETUP_PACKET.unpack(raw_packet)
+        self._direction = Direction(self._request_type >> 7)
+        self._type = Type((self._request_type >> 5) & 0x03)
+        self._recipient = _RECIPIENTS[self._request_type & 0x1F]
 
     @property
     def request_type(self) -> int:
-        return self._parsed.bmRequestType.raw
+        return self._request_type
 
     @property
     def direction(self) -> Direction:
-        return self._parsed.bmRequestType.parsed.direction
+        return self._direction
 
     @property
     def type(self) -> Type:
-        return self._parsed.bmRequestType.parsed.type
+        return self._type
 
     @property
     def recipient(self) -> Recipient:
-        return self._parsed.bmRequestType.parsed.recipient
+        return self._recipient
 
     @property
     def request(self) -> int:
-        return self._parsed.bRequest
+        return self._request
 
     @property
     def standard_request(self) -> Optional[StandardRequest]:
@@ -116,15 +130,15 @@ class SetupPacket:
 
     @property
     def value(self) -> int:
-        return self._parsed.wValue
+        return self._value
 
     @property
     def index(self) -> int:
-        return self._parsed.wIndex
+        return self._index
 
     @property
     def length(self) -> int:
-        return self._parsed.wLength
+        return self._length
 
     @property
     def raw(self) -> bytes:
@@ -138,3 +152,13 @@ class SetupPacket:
 
     def __repr__(self) -> str:
         return f"<usbmon.setup.SetupPacket {self.raw.hex()}>"
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def parse(raw_packet: bytes) -> SetupPacket:
+    """Return the decoded setup packet for its raw 8 bytes.
+
+    The most recently seen setup packets are cached, so repeated ones are only
+    decoded once, and share the same SetupPacket instance.
+    """
+    return SetupPacket(raw_packet)
@@ -15,9 +15,13 @@
 # SPDX-FileCopyrightText: © 2021 The usbmon-tools Authors
 # SPDX-License-Identifier: Apache-2.0
 
+from typing import BinaryIO, cast
+
 import click
 
 import usbmon.addresses
+import usbmon.compression
+import usbmon.filters
 
 
 class DeviceAddressType(click.ParamType):
@@ -38,3 +42,78 @@ class EndpointAddressType(click.ParamType):
             return usbmon.addresses.EndpointAddress.from_string(value)
         except (TypeError, ValueError):
             self.fail(f"{value!r} is not a valid endpoint address", param, ctx)
+
+
+class CaptureFileType(click.File):
+    """A capture file, transparently decompressed if needed."""
+
+    def __init__(self):
+        super().__init__(mode="rb")
+
+    def convert(self, value, param, ctx) -> BinaryIO:
+        capture_file = cast(BinaryIO, super().convert(value, param, ctx))
+        decompressed_file = usbmon.compression.open_stream(capture_file)
+        if decompressed_file is not capture_file and ctx is not None:
+            ctx.call_on_close(decompressed_file.close)
+        return decompressed_file
+
+
+class FilterExpressionType(click.ParamType):
+    name = "filter expression"
+
+    def convert(self, value: str, param, ctx) -> usbmon.filters.FilterExpression:
+        if isinstance(value, usbmon.filters.FilterExpression):
+            return value
+        try:
+            return usbmon.filters.FilterExpression(value)
+        except usbmon.filters.FilterSyntaxError as e:
+            self.fail(str(e), param, ctx)
+
+
+# Shared by all the tools, which skip the packets not matching the expression
+# before decoding them.
+filter_option = click.option(
+    "--filter",
+    "filter_expression",
+    help=(
+        "Only process the packets matching this expression, such as"
+        " 'bus==1 and dev in (5, 7) and xfer==BULK and dir==IN and len>64'."
+        " Fields: bus, dev, ep, xfer, dir, type, len, status."
+    ),
+    type=FilterExpressionType(),
+)
+
+
+# Shared by the tools that can stream packets as they are captured.
+follow_option = click.option(
+    "--follow / --no-follow",
+    help=(
+        "Keep reading packets as they are appended to the capture file, like"
+        " tail -f, until interrupted."
+    ),
+    default=False,
+)
+
+
+# Shared by the tools that can read captures through usbmon.pipeline.
+pipelined_option = click.option(
+    "--pipelined / --no-pipelined",
+    help=(
+        "Read and decode the capture on background threads, ahead of"
+        " processing it, and report the throughput of each stage. This hides"
+        " the latency of slow inputs, such as network filesystems."
+    ),
+    default=False,
+)
+
+
+# Shared by the tools that can parse captures through usbmon.session_cache.
+cache_dir_option = click.option(
+    "--cache-dir",
+    help=(
+        "Directory to cache parsed captures in, so that they load faster when"
+        " processed again. Defaults to the USBMON_CACHE_DIR environment variable."
+    ),
+    type=click.Path(file_okay=False),
+    envvar="USBMON_CACHE_DIR",
+)
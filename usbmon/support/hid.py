@@ -18,7 +18,7 @@
 
 import dataclasses
 import logging
-from typing import Iterator, Optional
+from typing import Iterable, Iterator, Optional
 
 import usbmon.addresses
 import usbmon.capture_session
@@ -69,7 +69,23 @@ def select(
     This function simplifies the logic behind the selection of packets in a capture,
     optionally including limiting to one specific address.
     """
-    for pair in session.in_pairs():
+    if device_address is not None:
+        # Only go through the pairs of the device, through the session's index.
+        return select_pairs(session.pairs_for(device_address), device_address)
+    return select_pairs(session.in_pairs())
+
+
+def select_pairs(
+    pairs: Iterable[usbmon.packet.PacketPair],
+    device_address: Optional[usbmon.addresses.DeviceAddress] = None,
+) -> Iterator[HIDPacket]:
+    """Extract packets pairs that match the HID protocol.
+
+    This is the same as select(), but works on any iterable of pairs, such as
+    the one returned by usbmon.capture_session.Session.stream().
+    """
+    device_key = device_address.key if device_address is not None else None
+    for pair in pairs:
         submission = usbmon.packet.get_submission(pair)
         callback = usbmon.packet.get_callback(pair)
 
@@ -80,10 +96,7 @@ def select(
             _LOGGER.debug("Ignoring singleton packet: {pair[0].tag}")
             continue
 
-        if (
-            device_address is not None
-            and submission.address.device_address != device_address
-        ):
+        if device_key is not None and submission.device_key != device_key:
             # No need to check second, they will be linked.
             continue
 
@@ -0,0 +1,222 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Follow captures as they are written to, like tail -f.
+
+A FollowedStream wraps a capture file that is still being written to. Reading
+from it waits for the requested data to be appended, rather than stopping at
+the current end of the file, so that the readers in usbmon.pcapng and
+usbmon.pcap handle partially written blocks transparently.
+
+On Linux, the wait is woken up by inotify. Elsewhere, or if inotify is not
+available, the file is polled for new data.
+"""
+
+import ctypes
+import ctypes.util
+import io
+import logging
+import os
+import select
+import threading
+import time
+from typing import BinaryIO, Optional
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+# From <sys/inotify.h>.
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+
+
+class _PollingWatcher:
+    """Wait for a file to change by sleeping between checks."""
+
+    def __init__(self):
+        self._woken = threading.Event()
+
+    def wait(self, timeout: float) -> None:
+        self._woken.wait(timeout)
+
+    def wake(self) -> None:
+        """Stop waiting, now and from then on."""
+        self._woken.set()
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyWatcher(_PollingWatcher):
+    """Wait for a file to change, woken up by inotify."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        watch = libc.inotify_add_watch(
+            self._fd, os.fsencode(path), _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE
+        )
+        if watch < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, os.strerror(errno), path)
+        # Written to by wake(), and never drained, so that waits stay woken up.
+        self._wake_read, self._wake_write = os.pipe()
+
+    def wait(self, timeout: float) -> None:
+        # The timeout still applies, in case the file changes in ways inotify
+        # does not report, such as on network filesystems.
+        readable, _, _ = select.select([self._fd, self._wake_read], [], [], timeout)
+        if self._fd in readable:
+            # Only the wake up matters, not which events were reported.
+            try:
+                while os.read(self._fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def wake(self) -> None:
+        os.write(self._wake_write, b"\0")
+
+    def close(self) -> None:
+        os.close(self._fd)
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+
+def _make_watcher(stream: BinaryIO) -> _PollingWatcher:
+    path = getattr(stream, "name", None)
+    if isinstance(path, str):
+        try:
+            return _InotifyWatcher(path)
+        except (AttributeError, OSError, TypeError) as error:
+            logging.debug("Polling %s, inotify unavailable: %s", path, error)
+    return _PollingWatcher()
+
+
+class FollowedStream(io.BufferedIOBase):
+    """A read-only stream that waits for data to be appended to a file.
+
+    Only the data not yet read is buffered, so memory use does not grow with
+    the length of the capture.
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        idle_timeout: Optional[float] = None,
+    ):
+        """Follow a file opened for reading.
+
+        Args:
+          stream: The file to follow, from its current position.
+          poll_interval: How long to wait for new data before checking the file
+            again, in seconds.
+          idle_timeout: If provided, reach the end of the stream once no data
+            was appended to the file for this many seconds. Otherwise, the
+            file is followed until stop() is called.
+        """
+        super().__init__()
+        self._stream = stream
+        self._poll_interval = poll_interval
+        self._idle_timeout = idle_timeout
+        self._pending = bytearray()
+        self._watcher = _make_watcher(stream)
+        self._stopped = False
+        # Serializes stop() with close(), which can be called from other threads.
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> Optional[str]:
+        return getattr(self._stream, "name", None)
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self, size: int) -> None:
+        """Buffer data until size bytes are available, or the stream is idle."""
+        last_data = time.monotonic()
+        while len(self._pending) < size:
+            data = self._stream.read(size - len(self._pending))
+            if data:
+                self._pending += data
+                last_data = time.monotonic()
+                continue
+
+            if self._stopped:
+                return
+            timeout = self._poll_interval
+            if self._idle_timeout is not None:
+                remaining = last_data + self._idle_timeout - time.monotonic()
+                if remaining <= 0:
+                    return
+                timeout = min(timeout, remaining)
+            self._watcher.wait(timeout)
+
+    def peek(self, size: int = 1) -> bytes:
+        self._fill(max(size, 1))
+        return bytes(self._pending)
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            if self._idle_timeout is None:
+                raise io.UnsupportedOperation(
+                    "Cannot read to the end of a followed stream without an idle"
+                    " timeout."
+                )
+            while True:
+                available = len(self._pending)
+                self._fill(available + io.DEFAULT_BUFFER_SIZE)
+                if len(self._pending) == available:
+                    break
+            size = len(self._pending)
+        elif not self._pending:
+            # Most reads are for data already written, which needs no copy.
+            data = self._stream.read(size)
+            if len(data) == size:
+                return data
+            self._pending += data
+
+        self._fill(size)
+        data = bytes(self._pending[:size])
+        del self._pending[:size]
+        return data
+
+    def read1(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+    def stop(self) -> None:
+        """Reach the end of the stream, rather than wait for more data.
+
+        This can be called from another thread, to interrupt a pending read.
+        """
+        with self._lock:
+            self._stopped = True
+            if not self.closed:
+                self._watcher.wake()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self.closed:
+                self._watcher.close()
+            super().close()
@@ -15,7 +15,7 @@
 # SPDX-FileCopyrightText: © 2021 The usbmon-tools Authors
 # SPDX-License-Identifier: Apache-2.0
 
-from absl.testing import parameterized
+from absl.testing import absltest, parameterized
 
 import usbmon.addresses
 
@@ -74,3 +74,32 @@ class EndpointAddressTest(parameterized.TestCase):
     def test_device_address(self):
         received = usbmon.addresses.EndpointAddress(1, 2, 5)
         self.assertEqual(received.device_address, usbmon.addresses.DeviceAddress(1, 2))
+
+
+class KeyTest(absltest.TestCase):
+    def test_endpoint_key_roundtrip(self):
+        address = usbmon.addresses.EndpointAddress(3, 127, 5)
+
+        self.assertEqual(address.key, 3 << 16 | 127 << 8 | 5)
+        self.assertEqual(usbmon.addresses.endpoint_from_key(address.key), address)
+        self.assertIs(
+            usbmon.addresses.endpoint_from_key(address.key),
+            usbmon.addresses.endpoint_from_key(address.key),
+        )
+
+    def test_device_key(self):
+        address = usbmon.addresses.EndpointAddress(3, 127, 5)
+
+        self.assertEqual(
+            usbmon.addresses.device_key(address.key), address.device_address.key
+        )
+        self.assertIs(
+            usbmon.addresses.device_from_key(address.key), address.device_address
+        )
+
+    def test_prefix_matcher(self):
+        matcher = usbmon.addresses.prefix_matcher("1.2.")
+
+        self.assertTrue(matcher(usbmon.addresses.pack(1, 2, 1)))
+        self.assertTrue(matcher(usbmon.addresses.pack(1, 2, 1)))
+        self.assertFalse(matcher(usbmon.addresses.pack(1, 23, 1)))
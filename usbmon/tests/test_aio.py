@@ -0,0 +1,200 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.aio."""
+
+import asyncio
+import concurrent.futures
+import io
+import os
+
+from absl.testing import absltest
+
+import usbmon.aio
+import usbmon.capture.live
+import usbmon.capture_session
+import usbmon.pcapng
+import usbmon.tail
+
+_TESTDATA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../testdata"
+)
+_TEST1_PATH = os.path.join(_TESTDATA_PATH, "test1.pcap")
+_USBPCAP1_PATH = os.path.join(_TESTDATA_PATH, "usbpcap1.pcap")
+
+
+def _expected_pairs(path):
+    with open(path, "rb") as capture_file:
+        session = usbmon.capture_session.Session()
+        return [
+            (str(first), str(second))
+            for first, second in session.stream(
+                usbmon.pcapng.read_packets(capture_file)
+            )
+        ]
+
+
+async def _collect_packets(packets):
+    return [str(packet) async for packet in packets]
+
+
+async def _collect_pairs(pairs):
+    return [(str(first), str(second)) async for first, second in pairs]
+
+
+class _Interrupted(BaseException):
+    pass
+
+
+class _InterruptedStream(io.RawIOBase):
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        raise _Interrupted()
+
+
+class AioTest(absltest.TestCase):
+    def test_packets(self):
+        with open(_TEST1_PATH, "rb") as capture_file:
+            expected = [
+                str(packet) for packet in usbmon.pcapng.read_packets(capture_file)
+            ]
+
+        for batch_size in (None, 1, 5):
+            with self.subTest(batch_size=batch_size):
+                packets = asyncio.run(
+                    _collect_packets(
+                        usbmon.aio.packets(
+                            _TEST1_PATH, batch_size=batch_size, queue_size=1
+                        )
+                    )
+                )
+
+                self.assertEqual(packets, expected)
+
+    def test_pairs_concurrently(self):
+        async def collect_all():
+            return await asyncio.gather(
+                _collect_pairs(usbmon.aio.pairs(_TEST1_PATH, batch_size=2)),
+                _collect_pairs(usbmon.aio.pairs(_USBPCAP1_PATH, batch_size=7)),
+            )
+
+        test1_pairs, usbpcap1_pairs = asyncio.run(collect_all())
+
+        self.assertEqual(test1_pairs, _expected_pairs(_TEST1_PATH))
+        self.assertEqual(usbpcap1_pairs, _expected_pairs(_USBPCAP1_PATH))
+
+    def test_async_stream(self):
+        with open(_USBPCAP1_PATH, "rb") as capture_file:
+            capture = capture_file.read()
+
+        async def collect():
+            stream = asyncio.StreamReader()
+
+            async def feed():
+                for offset in range(0, len(capture), 1000):
+                    piece_end = offset + 1000
+                    stream.feed_data(capture[offset:piece_end])
+                    await asyncio.sleep(0)
+                stream.feed_eof()
+
+            feeder = asyncio.ensure_future(feed())
+            pairs = await _collect_pairs(usbmon.aio.pairs(stream))
+            await feeder
+            return pairs
+
+        self.assertEqual(asyncio.run(collect()), _expected_pairs(_USBPCAP1_PATH))
+
+    def test_live_source(self):
+        with open(_TEST1_PATH, "rb") as capture_file:
+            source = usbmon.capture.live.EmulatedRing.from_capture(capture_file, 512)
+
+        with source:
+            pairs = asyncio.run(_collect_pairs(usbmon.aio.pairs(source)))
+
+        self.assertEqual(pairs, _expected_pairs(_TEST1_PATH))
+
+    def test_stop_early(self):
+        async def collect_first():
+            stream = asyncio.StreamReader()
+            with open(_USBPCAP1_PATH, "rb") as capture_file:
+                # The stream is never closed, so reading only stops early.
+                stream.feed_data(capture_file.read())
+            packets = usbmon.aio.packets(stream)
+            async for packet in packets:
+                await packets.aclose()
+                return str(packet)
+
+        with open(_USBPCAP1_PATH, "rb") as capture_file:
+            expected = str(next(usbmon.pcapng.read_packets(capture_file)))
+        self.assertEqual(asyncio.run(collect_first()), expected)
+
+    def test_follow(self):
+        async def collect_first():
+            with open(_TEST1_PATH, "rb") as capture_file:
+                # The capture is smaller than a batch, and stops growing.
+                followed = usbmon.tail.FollowedStream(
+                    capture_file, poll_interval=0.05, idle_timeout=2
+                )
+                packets = usbmon.aio.packets(followed, follow=True)
+                first = await asyncio.wait_for(packets.__anext__(), timeout=1)
+                await packets.aclose()
+                return str(first)
+
+        with open(_TEST1_PATH, "rb") as capture_file:
+            expected = str(next(usbmon.pcapng.read_packets(capture_file)))
+        self.assertEqual(asyncio.run(collect_first()), expected)
+
+    def test_stop_following(self):
+        with open(_TEST1_PATH, "rb") as capture_file:
+            expected = [
+                str(packet) for packet in usbmon.pcapng.read_packets(capture_file)
+            ]
+
+        async def follow(executor):
+            packets = usbmon.aio.packets(_TEST1_PATH, follow=True, executor=executor)
+            followed = []
+            async for packet in packets:
+                followed.append(str(packet))
+                if len(followed) == len(expected):
+                    # The worker is now waiting for packets that never come.
+                    break
+            await packets.aclose()
+            # Only runs once the worker stopped following the capture.
+            await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(executor, lambda: None),
+                timeout=10,
+            )
+            return followed
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(asyncio.run(follow(executor)), expected)
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(_collect_packets(usbmon.aio.packets(io.BytesIO(b"\0" * 64))))
+
+    def test_interrupted(self):
+        async def collect():
+            return await asyncio.wait_for(
+                _collect_packets(usbmon.aio.packets(_InterruptedStream())), timeout=10
+            )
+
+        with self.assertRaisesRegex(RuntimeError, "interrupted"):
+            asyncio.run(collect())
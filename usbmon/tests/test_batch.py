@@ -0,0 +1,233 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.batch."""
+
+import array
+import collections
+import os
+import struct
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+
+import usbmon.addresses
+import usbmon.capture.usbmon_mmap
+import usbmon.capture_session
+import usbmon.constants
+import usbmon.pcapng
+
+try:
+    import usbmon.batch
+except ImportError:
+    _HAS_NUMPY = False
+else:
+    _HAS_NUMPY = True
+
+_TEST1_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../testdata/test1.pcap"
+)
+
+
+def _make_packet(tag: int, packet_type: str, ts_usec: int) -> bytes:
+    return struct.pack(
+        "<QBBBBHB1sqiiII8siiII",
+        tag,
+        ord(packet_type),
+        usbmon.constants.XferType.BULK,
+        0x81,
+        2,
+        1,
+        0x2D,
+        b"\x00",
+        1550331849,
+        ts_usec,
+        0,
+        0,
+        0,
+        b"\x00" * 8,
+        0,
+        0,
+        0,
+        0,
+    )
+
+
+def _session_pairs(raw_packets, retag_urbs):
+    session = usbmon.capture_session.Session(retag_urbs=retag_urbs)
+    for raw_packet in raw_packets:
+        session.add(usbmon.capture.usbmon_mmap.UsbmonMmapPacket("<", raw_packet))
+    return [
+        (first.tag, first.type, second.type if second else None)
+        for first, second in session.in_pairs()
+    ]
+
+
+def _batch_pairs(packet_batch):
+    return [
+        (first.tag, first.type, second.type if second else None)
+        for first, second in packet_batch.in_pairs()
+    ]
+
+
+@absltest.skipUnless(_HAS_NUMPY, "NumPy is not installed")
+class PacketBatchTest(absltest.TestCase):
+    def test_parse_file(self):
+        packet_batch = usbmon.pcapng.parse_file_batch(_TEST1_PATH)
+        session = usbmon.pcapng.parse_file(_TEST1_PATH)
+
+        self.assertLen(packet_batch, 16)
+        self.assertEqual(
+            [str(packet) for packet in session.in_pairs()],
+            [str(packet) for packet in packet_batch.in_pairs()],
+        )
+
+    @mock.patch.object(usbmon.pcapng, "_MINIMUM_CHUNK_SIZE", 512)
+    def test_parse_file_jobs(self):
+        packet_batch = usbmon.pcapng.parse_file_batch(_TEST1_PATH, jobs=2)
+        session = usbmon.pcapng.parse_file(_TEST1_PATH)
+
+        self.assertEqual(
+            [str(packet) for packet in session.in_pairs()],
+            [str(packet) for packet in packet_batch.in_pairs()],
+        )
+
+    def test_counters(self):
+        packet_batch = usbmon.pcapng.parse_file_batch(_TEST1_PATH)
+        session = usbmon.pcapng.parse_file(_TEST1_PATH)
+
+        self.assertEqual(
+            collections.Counter(packet.direction for packet in session),
+            packet_batch.count_by_direction(),
+        )
+        self.assertEqual(
+            collections.Counter(packet.address for packet in session),
+            packet_batch.count_by_address(),
+        )
+        self.assertEqual(
+            collections.Counter(packet.xfer_type for packet in session),
+            packet_batch.count_by_xfer_type(),
+        )
+
+    def test_select(self):
+        packet_batch = usbmon.pcapng.parse_file_batch(_TEST1_PATH)
+        address = usbmon.addresses.EndpointAddress(1, 2, 1)
+
+        selected = packet_batch.select(packet_batch.address_mask(address))
+
+        self.assertLen(selected, 12)
+        for packet in selected:
+            self.assertEqual(packet.address, address)
+        self.assertEqual(
+            [packet.payload for packet in packet_batch if packet.address == address],
+            [packet.payload for packet in selected],
+        )
+
+    def test_late_callback(self):
+        raw_packets = [
+            _make_packet(1, "C", 0),
+            _make_packet(1, "S", 500_000),
+            _make_packet(2, "S", 500_100),
+            _make_packet(1, "C", 500_200),
+            _make_packet(2, "C", 500_300),
+            _make_packet(3, "S", 500_400),
+        ]
+
+        for retag_urbs in (True, False):
+            packet_batch = usbmon.batch.from_packets("<", raw_packets)
+            if retag_urbs:
+                packet_batch.retag()
+            self.assertEqual(
+                _session_pairs(raw_packets, retag_urbs), _batch_pairs(packet_batch)
+            )
+
+    def test_unmatched_submission(self):
+        raw_packets = [
+            _make_packet(1000, "S", 0),
+            _make_packet(1, "S", 100),
+            _make_packet(1, "C", 200),
+        ]
+
+        packet_batch = usbmon.batch.from_packets("<", raw_packets)
+        packet_batch.retag()
+
+        self.assertEqual(
+            [
+                (
+                    0,
+                    usbmon.constants.PacketType.SUBMISSION,
+                    usbmon.constants.PacketType.CALLBACK,
+                ),
+                (1000, usbmon.constants.PacketType.SUBMISSION, None),
+            ],
+            _batch_pairs(packet_batch),
+        )
+        self.assertEqual(_session_pairs(raw_packets, True), _batch_pairs(packet_batch))
+
+    def test_dropped_packet(self):
+        with open(_TEST1_PATH, "rb") as test_file:
+            raw_packets = [
+                bytes(packet_data)
+                for _, packet_data in usbmon.pcapng.read_usbmon_data(test_file)
+            ]
+        del raw_packets[0]
+
+        packet_batch = usbmon.batch.from_packets("<", raw_packets)
+        packet_batch.retag()
+
+        self.assertEqual(_session_pairs(raw_packets, True), _batch_pairs(packet_batch))
+
+    @mock.patch.object(usbmon.pcapng, "_MINIMUM_CHUNK_SIZE", 512)
+    def test_no_packets(self):
+        with open(_TEST1_PATH, "rb") as capture_file:
+            capture = capture_file.read()
+        # Only keep the section header and interface description blocks.
+        headers_end = 0
+        for _ in range(2):
+            (block_length,) = struct.unpack_from("<I", capture, headers_end + 4)
+            headers_end += block_length
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        path = os.path.join(temp_dir.name, "empty.pcap")
+        with open(path, "wb") as capture_file:
+            capture_file.write(capture[:headers_end])
+
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                packet_batch = usbmon.pcapng.parse_file_batch(path, jobs=jobs)
+
+                self.assertLen(packet_batch, 0)
+                self.assertEqual(list(packet_batch.in_pairs()), [])
+
+    def test_short_packet(self):
+        raw_packets = [_make_packet(1, "S", 0), b"\0" * 10]
+
+        with self.assertRaisesRegex(ValueError, "shorter than"):
+            usbmon.batch.from_packets("<", raw_packets)
+        with self.assertRaisesRegex(ValueError, "shorter than"):
+            usbmon.batch.from_buffer(
+                "<",
+                b"".join(raw_packets),
+                [array.array("Q", [0, 64])],
+                [array.array("Q", [64, 10])],
+            )
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,106 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.capture_index."""
+
+import datetime
+import os
+import shutil
+import tempfile
+
+from absl.testing import absltest
+
+import usbmon.addresses
+import usbmon.capture_index
+import usbmon.pcapng
+
+_TEST1_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../testdata/test1.pcap"
+)
+
+
+class CaptureIndexTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._capture_path = os.path.join(temp_dir.name, "test1.pcap")
+        shutil.copy(_TEST1_PATH, self._capture_path)
+
+    def test_parse_file_address(self):
+        device_address = usbmon.addresses.DeviceAddress(1, 2)
+        expected = [
+            str(packet)
+            for packet in usbmon.pcapng.parse_file(self._capture_path, retag_urbs=False)
+            if packet.address.device_address == device_address
+        ]
+
+        session = usbmon.pcapng.parse_file(
+            self._capture_path, retag_urbs=False, address=device_address
+        )
+
+        self.assertEqual([str(packet) for packet in session], expected)
+        self.assertTrue(
+            os.path.exists(usbmon.capture_index.index_path(self._capture_path))
+        )
+
+    def test_parse_file_time_range(self):
+        timestamps = sorted(
+            packet.timestamp for packet in usbmon.pcapng.parse_file(self._capture_path)
+        )
+
+        session = usbmon.pcapng.parse_file(
+            self._capture_path, start=timestamps[2], end=timestamps[5]
+        )
+
+        self.assertLen(list(session), 4)
+
+    def test_load(self):
+        capture_stat = os.stat(self._capture_path)
+        self.assertIsNone(usbmon.capture_index.load(self._capture_path, capture_stat))
+
+        usbmon.pcapng.parse_file(
+            self._capture_path, address=usbmon.addresses.DeviceAddress(1, 2)
+        )
+        (indexed_chunk,) = usbmon.capture_index.load(self._capture_path, capture_stat)
+
+        self.assertTrue(
+            indexed_chunk.may_contain(usbmon.addresses.EndpointAddress(1, 2, 1))
+        )
+        self.assertTrue(indexed_chunk.overlaps(datetime.datetime(2000, 1, 1), None))
+        self.assertFalse(indexed_chunk.overlaps(None, datetime.datetime(2000, 1, 1)))
+        self.assertEqual(
+            usbmon.capture_index.select(
+                [indexed_chunk], end=datetime.datetime(2000, 1, 1)
+            ),
+            [],
+        )
+
+    def test_load_outdated(self):
+        usbmon.pcapng.parse_file(
+            self._capture_path, address=usbmon.addresses.DeviceAddress(1, 2)
+        )
+        capture_stat = os.stat(self._capture_path)
+        os.utime(
+            self._capture_path,
+            ns=(capture_stat.st_atime_ns, capture_stat.st_mtime_ns + 1),
+        )
+
+        self.assertIsNone(
+            usbmon.capture_index.load(self._capture_path, os.stat(self._capture_path))
+        )
@@ -20,9 +20,11 @@
 
 import binascii
 import collections
+import datetime
 
 from absl.testing import absltest
 
+import usbmon.addresses
 import usbmon.capture.usbmon_mmap
 import usbmon.capture_session
 
@@ -91,6 +93,54 @@ class SessionTest(absltest.TestCase):
         self.assertLen(list(session), 14)
         self.assertLen(list(session.in_pairs()), 8)
 
+    def test_stream(self):
+        def packets():
+            for base64_packet in _SESSION_BASE64[1:-1]:
+                yield usbmon.capture.usbmon_mmap.UsbmonMmapPacket(
+                    "<", binascii.a2b_base64(base64_packet)
+                )
+
+        session = usbmon.capture_session.Session(retag_urbs=True)
+        for packet in packets():
+            session.add(packet)
+        expected_pairs = [
+            (first.tag, first.type, second and second.type)
+            for first, second in session.in_pairs()
+        ]
+
+        streaming_session = usbmon.capture_session.Session(retag_urbs=True)
+        streamed_pairs = [
+            (first.tag, first.type, second and second.type)
+            for first, second in streaming_session.stream(packets())
+        ]
+
+        self.assertEqual(expected_pairs, streamed_pairs)
+        self.assertEmpty(list(streaming_session.in_pairs()))
+        self.assertLen(streaming_session.device_descriptors, 1)
+
+    def test_expire_pending(self):
+        # Drop the callback of the first control URB, so that its submission
+        # never completes.
+        expiring_session = _SESSION_BASE64[:1] + _SESSION_BASE64[4:]
+        packets = [
+            usbmon.capture.usbmon_mmap.UsbmonMmapPacket(
+                "<", binascii.a2b_base64(base64_packet)
+            )
+            for base64_packet in expiring_session
+        ]
+
+        session = usbmon.capture_session.Session(
+            retag_urbs=True, max_pending_age=datetime.timedelta(seconds=1)
+        )
+        pairs = list(session.stream(packets))
+
+        self.assertLen(pairs, 7)
+        first, second = pairs[0]
+        self.assertIs(first, packets[0])
+        self.assertIsNone(second)
+        self.assertEqual(1, session.expired_count)
+        self.assertEqual(1, session.stuck_count)
+
 
 class ConstructedSessionTest(absltest.TestCase):
     def setUp(self):
@@ -103,5 +153,109 @@ class ConstructedSessionTest(absltest.TestCase):
             )
             self.session.add(packet)
 
+    def test_in_order(self):
+        expected = sorted(
+            (packet for pair in self.session.in_pairs() for packet in pair if packet),
+            key=lambda packet: packet.timestamp,
+        )
+
+        self.assertEqual(expected, list(self.session))
+        self.assertEqual(
+            expected, list(self.session.in_order(window=datetime.timedelta(0)))
+        )
+
     def test_device_descriptors(self):
         self.assertLen(self.session.device_descriptors, 2)
+
+    def test_pairs_for(self):
+        all_pairs = list(self.session.in_pairs())
+        for address in (
+            usbmon.addresses.DeviceAddress(1, 1),
+            usbmon.addresses.DeviceAddress(1, 2),
+            usbmon.addresses.EndpointAddress(1, 1, 1),
+            usbmon.addresses.EndpointAddress(1, 2, 0),
+            usbmon.addresses.DeviceAddress(2, 1),
+        ):
+            with self.subTest(address=address):
+                if isinstance(address, usbmon.addresses.EndpointAddress):
+                    expected = [
+                        pair for pair in all_pairs if pair[0].address == address
+                    ]
+                else:
+                    expected = [
+                        pair
+                        for pair in all_pairs
+                        if pair[0].address.device_address == address
+                    ]
+
+                self.assertEqual(expected, list(self.session.pairs_for(address)))
+
+    def test_pairs_for_tag(self):
+        for first, second in self.session.in_pairs():
+            self.assertEqual(
+                [(first, second)], list(self.session.pairs_for_tag(first.tag))
+            )
+        self.assertEmpty(list(self.session.pairs_for_tag(1 << 40)))
+
+    def test_between(self):
+        packets = list(self.session)
+        self.assertEqual(packets, list(self.session.between(None, None)))
+
+        start, end = packets[3].timestamp, packets[10].timestamp
+        time_slice = self.session.between(start, end)
+
+        self.assertEqual(
+            [packet for packet in packets if start <= packet.timestamp <= end],
+            list(time_slice.in_order()),
+        )
+        self.assertEqual(
+            [
+                pair
+                for pair in self.session.in_pairs()
+                if any(packet and start <= packet.timestamp <= end for packet in pair)
+            ],
+            list(time_slice.in_pairs()),
+        )
+        device_address = usbmon.addresses.DeviceAddress(1, 1)
+        self.assertEqual(
+            [
+                pair
+                for pair in time_slice.in_pairs()
+                if pair[0].address.device_address == device_address
+            ],
+            list(time_slice.pairs_for(device_address)),
+        )
+
+    def test_around(self):
+        packets = list(self.session)
+        middle = packets[8].timestamp
+        window = datetime.timedelta(milliseconds=100)
+
+        self.assertEqual(
+            [
+                packet
+                for packet in packets
+                if middle - window <= packet.timestamp <= middle + window
+            ],
+            list(self.session.around(middle, window)),
+        )
+        self.assertEmpty(
+            list(self.session.around(packets[-1].timestamp + window * 2, window))
+        )
+
+    def test_between_while_adding(self):
+        session = usbmon.capture_session.Session(retag_urbs=True)
+        packets = [
+            usbmon.capture.usbmon_mmap.UsbmonMmapPacket(
+                "<", binascii.a2b_base64(base64_packet)
+            )
+            for base64_packet in _SESSION_BASE64
+        ]
+        for packet in packets[:8]:
+            session.add(packet)
+        time_slice = session.between(None, None)
+        for packet in packets[8:]:
+            session.add(packet)
+
+        self.assertLen(list(time_slice), 8)
+        self.assertEqual(list(session), list(session.between(None, None)))
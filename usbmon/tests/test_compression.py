@@ -0,0 +1,109 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.compression."""
+
+import gzip
+import io
+import lzma
+import os
+import tempfile
+
+from absl.testing import absltest
+
+import usbmon.compression
+import usbmon.pcapng
+
+_TESTDATA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../testdata"
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _compress(compression, data):
+    if compression == usbmon.compression.GZIP:
+        # Concatenated members, as appended to by gzip >> capture.pcapng.gz.
+        middle = len(data) // 2
+        return gzip.compress(data[:middle]) + gzip.compress(data[middle:])
+    elif compression == usbmon.compression.XZ:
+        return lzma.compress(data)
+    return zstandard.ZstdCompressor().compress(data)
+
+
+class CompressionTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._temp_dir = temp_dir.name
+
+    def _compressions(self):
+        compressions = [usbmon.compression.GZIP, usbmon.compression.XZ]
+        if zstandard is not None:
+            compressions.append(usbmon.compression.ZSTD)
+        return compressions
+
+    def test_parse_file(self):
+        for filename in ("test1.pcap", "usbpcap1.pcap"):
+            path = os.path.join(_TESTDATA_PATH, filename)
+            with open(path, "rb") as capture_file:
+                data = capture_file.read()
+            expected = [str(packet) for packet in usbmon.pcapng.parse_file(path)]
+
+            for compression in self._compressions():
+                with self.subTest(filename=filename, compression=compression):
+                    compressed_path = os.path.join(self._temp_dir, filename)
+                    with open(compressed_path, "wb") as compressed_file:
+                        compressed_file.write(_compress(compression, data))
+
+                    session = usbmon.pcapng.parse_file(compressed_path)
+
+                    self.assertEqual([str(packet) for packet in session], expected)
+
+    def test_open_stream(self):
+        with open(os.path.join(_TESTDATA_PATH, "test1.pcap"), "rb") as capture_file:
+            data = capture_file.read()
+
+        for compression in self._compressions():
+            with self.subTest(compression=compression):
+                compressed = io.BytesIO(_compress(compression, data))
+                self.assertEqual(usbmon.compression.detect(compressed), compression)
+
+                with usbmon.compression.open_stream(
+                    compressed, chunk_size=100, queue_size=1
+                ) as decompressed:
+                    self.assertEqual(decompressed.read(), data)
+
+    def test_uncompressed(self):
+        uncompressed = io.BytesIO(b"\x0a\x0d\x0d\x0a")
+
+        self.assertIsNone(usbmon.compression.detect(uncompressed))
+        self.assertIs(usbmon.compression.open_stream(uncompressed), uncompressed)
+
+    def test_corrupted(self):
+        compressed = gzip.compress(b"\0" * 1000)
+        corrupted = io.BytesIO(compressed[:-8] + b"\xff" * 8)
+
+        # gzip.BadGzipFile, a subclass of OSError, only exists since Python 3.8.
+        with usbmon.compression.open_stream(corrupted) as decompressed:
+            with self.assertRaises(OSError):
+                decompressed.read()
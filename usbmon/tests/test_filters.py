@@ -0,0 +1,220 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.filters."""
+
+import io
+import os
+
+from absl.testing import absltest
+
+import usbmon.addresses
+import usbmon.constants
+import usbmon.filters
+import usbmon.pcapng
+
+try:
+    import usbmon.batch
+except ImportError:
+    _HAS_NUMPY = False
+else:
+    _HAS_NUMPY = True
+
+_TESTDATA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../testdata"
+)
+
+
+def _filters(packets):
+    """Return filters that each match some of the packets."""
+    timestamps = sorted(packet.timestamp for packet in packets)
+    last_packet = packets[-1]
+    return [
+        usbmon.filters.PacketFilter(bus=last_packet.busnum, device=last_packet.devnum),
+        usbmon.filters.PacketFilter(
+            bus=last_packet.busnum,
+            device=last_packet.devnum,
+            endpoint=last_packet.endpoint,
+        ),
+        usbmon.filters.PacketFilter(xfer_type=usbmon.constants.XferType.CONTROL),
+        usbmon.filters.PacketFilter(direction=usbmon.constants.Direction.IN),
+        usbmon.filters.PacketFilter(
+            start=timestamps[len(timestamps) // 4], end=timestamps[-2]
+        ),
+    ]
+
+
+_EXPRESSIONS = (
+    "bus==1",
+    "type==C and len>0",
+    "xfer in (CONTROL, BULK) and dir==IN",
+    "not (status<0) or length>=64",
+    "ep not in (0, 0x1)",
+    "status != 0 and not dev==2",
+    "type==S and xfer==control and len==0",
+)
+
+
+class PacketFilterTest(absltest.TestCase):
+    def test_parse_file(self):
+        for filename in ("test1.pcap", "usbpcap1.pcap"):
+            path = os.path.join(_TESTDATA_PATH, filename)
+            packets = list(usbmon.pcapng.parse_file(path, retag_urbs=False))
+            for packet_filter in _filters(packets):
+                expected = [
+                    str(packet) for packet in packets if packet_filter.matches(packet)
+                ]
+                self.assertNotEmpty(expected)
+                for native in (True, False):
+                    with self.subTest(
+                        filename=filename, packet_filter=packet_filter, native=native
+                    ):
+                        with open(path, "rb") as capture_file:
+                            # Wrapping the file prevents reading through its index.
+                            session = usbmon.pcapng.parse_stream(
+                                io.BytesIO(capture_file.read()),
+                                retag_urbs=False,
+                                native=native,
+                                packet_filter=packet_filter,
+                            )
+
+                        self.assertEqual([str(packet) for packet in session], expected)
+
+    def test_from_address(self):
+        device_address = usbmon.addresses.DeviceAddress(1, 2)
+        endpoint_address = usbmon.addresses.EndpointAddress(1, 2, 3)
+
+        self.assertEqual(
+            usbmon.filters.PacketFilter.from_address(device_address).address,
+            device_address,
+        )
+        self.assertEqual(
+            usbmon.filters.PacketFilter.from_address(endpoint_address).address,
+            endpoint_address,
+        )
+        self.assertIsNone(usbmon.filters.PacketFilter(bus=1).address)
+
+    def test_combined_with_address(self):
+        with self.assertRaises(ValueError):
+            usbmon.pcapng.parse_file(
+                os.path.join(_TESTDATA_PATH, "test1.pcap"),
+                address=usbmon.addresses.DeviceAddress(1, 2),
+                packet_filter=usbmon.filters.PacketFilter(bus=1),
+            )
+
+
+class FilterExpressionTest(absltest.TestCase):
+    def test_parse_file(self):
+        for filename in ("test1.pcap", "usbpcap1.pcap"):
+            path = os.path.join(_TESTDATA_PATH, filename)
+            packets = list(usbmon.pcapng.parse_file(path, retag_urbs=False))
+            for text in _EXPRESSIONS:
+                expression = usbmon.filters.FilterExpression(text)
+                expected = [
+                    str(packet) for packet in packets if expression.matches(packet)
+                ]
+                for native in (True, False):
+                    with self.subTest(filename=filename, text=text, native=native):
+                        with open(path, "rb") as capture_file:
+                            session = usbmon.pcapng.parse_stream(
+                                io.BytesIO(capture_file.read()),
+                                retag_urbs=False,
+                                native=native,
+                                packet_filter=usbmon.filters.PacketFilter(
+                                    expression=expression
+                                ),
+                            )
+
+                        self.assertEqual([str(packet) for packet in session], expected)
+
+    def test_matches(self):
+        packets = list(
+            usbmon.pcapng.parse_file(
+                os.path.join(_TESTDATA_PATH, "test1.pcap"), retag_urbs=False
+            )
+        )
+        # The last packet is a pending interrupt IN submission to 1.2.1.
+        last_packet = packets[-1]
+        for text, expected in (
+            ("bus==1 and dev==2 and ep==1", True),
+            ("xfer==INTERRUPT and dir==IN and type==SUBMISSION", True),
+            ("status<0", True),
+            ("dev in (5, 7) or xfer==BULK", False),
+            ("dev==002 and ep==0x01", True),
+            ("dev==020", False),
+            ("not (dir==OUT or type==C)", True),
+            (f"len>{last_packet.length}", False),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(
+                    usbmon.filters.FilterExpression(text).matches(last_packet),
+                    expected,
+                )
+
+    def test_syntax_errors(self):
+        for text in (
+            "",
+            "bus==",
+            "bus=1",
+            "bus==1 and",
+            "(bus==1",
+            "bus in 1",
+            "bus not 1",
+            "foo==1",
+            "xfer==FOO",
+            "dir==1 1",
+            "dev==0x",
+            "dev==0x1g",
+            "dev==08a",
+        ):
+            with self.subTest(text=text):
+                with self.assertRaises(usbmon.filters.FilterSyntaxError):
+                    usbmon.filters.FilterExpression(text)
+
+    def test_address(self):
+        self.assertEqual(
+            usbmon.filters.FilterExpression("bus==1 and dev==2 and len>0").address,
+            usbmon.addresses.DeviceAddress(1, 2),
+        )
+        self.assertEqual(
+            usbmon.filters.PacketFilter(
+                expression=usbmon.filters.FilterExpression(
+                    "ep==3 and dev==2 and bus==1"
+                )
+            ).address,
+            usbmon.addresses.EndpointAddress(1, 2, 3),
+        )
+        # Addresses are printed as 1:005, so zero-padded numbers are decimal.
+        self.assertEqual(
+            usbmon.filters.FilterExpression("bus==001 and dev==005").address,
+            usbmon.addresses.DeviceAddress(1, 5),
+        )
+        self.assertIsNone(usbmon.filters.FilterExpression("bus==1 or dev==2").address)
+        self.assertIsNone(usbmon.filters.FilterExpression("bus==1").address)
+
+    @absltest.skipUnless(_HAS_NUMPY, "NumPy is not installed")
+    def test_mask(self):
+        path = os.path.join(_TESTDATA_PATH, "test1.pcap")
+        packet_batch = usbmon.pcapng.parse_file_batch(path)
+        for text in _EXPRESSIONS:
+            expression = usbmon.filters.FilterExpression(text)
+            with self.subTest(text=text):
+                self.assertEqual(
+                    list(expression.mask(packet_batch)),
+                    [expression.matches(packet) for packet in packet_batch],
+                )
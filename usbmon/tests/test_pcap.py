@@ -0,0 +1,148 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.pcap."""
+
+import io
+import os
+import struct
+import tempfile
+
+from absl.testing import absltest
+
+import usbmon.constants
+import usbmon.filters
+import usbmon.pcap
+import usbmon.pcapng
+import usbmon.pcapng_reader
+
+_TESTDATA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../testdata"
+)
+
+
+def _convert_to_pcap(path: str, magic: int, exponent: int) -> bytes:
+    """Convert a little-endian pcapng capture into a classic libpcap one."""
+    with open(path, "rb") as pcapng_file:
+        blocks = list(usbmon.pcapng_reader.read_buffer(pcapng_file.read()))
+
+    (interface,) = [
+        block for block in blocks if isinstance(block, usbmon.pcapng_reader.Interface)
+    ]
+    output = [struct.pack("<IHHiIII", magic, 2, 4, 0, 0, 65535, interface.link_type)]
+    for block in blocks:
+        if isinstance(block, usbmon.pcapng_reader.EnhancedPacket):
+            units = round(block.timestamp * 10**exponent)
+            ts_sec, ts_frac = divmod(units, 10**exponent)
+            data = bytes(block.packet_data)
+            output.append(struct.pack("<IIII", ts_sec, ts_frac, len(data), len(data)))
+            output.append(data)
+
+    return b"".join(output)
+
+
+class PcapTest(absltest.TestCase):
+    def test_parse_bytes(self):
+        for filename in ("test1.pcap", "usbpcap1.pcap"):
+            path = os.path.join(_TESTDATA_PATH, filename)
+            expected = [str(packet) for packet in usbmon.pcapng.parse_file(path)]
+            for magic, exponent in (
+                (usbmon.pcap.MICROSECOND_MAGIC, 6),
+                (usbmon.pcap.NANOSECOND_MAGIC, 9),
+            ):
+                with self.subTest(filename=filename, exponent=exponent):
+                    pcap_data = _convert_to_pcap(path, magic, exponent)
+
+                    session = usbmon.pcap.parse_bytes(pcap_data)
+
+                    self.assertEqual([str(packet) for packet in session], expected)
+
+    def test_autodetect(self):
+        pcap_data = _convert_to_pcap(
+            os.path.join(_TESTDATA_PATH, "test1.pcap"),
+            usbmon.pcap.MICROSECOND_MAGIC,
+            6,
+        )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pcap_path = os.path.join(temp_dir, "test1.pcap")
+            with open(pcap_path, "wb") as pcap_file:
+                pcap_file.write(pcap_data)
+            self.assertLen(list(usbmon.pcapng.parse_file(pcap_path)), 16)
+
+        self.assertLen(list(usbmon.pcapng.parse_bytes(pcap_data)), 16)
+        self.assertLen(list(usbmon.pcapng.parse_stream(io.BytesIO(pcap_data))), 16)
+        self.assertLen(
+            list(usbmon.pcapng.parse_stream(io.BufferedReader(io.BytesIO(pcap_data)))),
+            16,
+        )
+
+    def test_packet_filter(self):
+        path = os.path.join(_TESTDATA_PATH, "usbpcap1.pcap")
+        packet_filter = usbmon.filters.PacketFilter(
+            direction=usbmon.constants.Direction.IN
+        )
+        expected = [
+            str(packet)
+            for packet in usbmon.pcapng.parse_file(path, retag_urbs=False)
+            if packet_filter.matches(packet)
+        ]
+        pcap_data = _convert_to_pcap(path, usbmon.pcap.NANOSECOND_MAGIC, 9)
+
+        session = usbmon.pcapng.parse_stream(
+            io.BytesIO(pcap_data), retag_urbs=False, packet_filter=packet_filter
+        )
+
+        self.assertEqual([str(packet) for packet in session], expected)
+
+    def test_big_endian_records(self):
+        pcap_data = (
+            struct.pack(
+                ">IHHiIII", usbmon.pcap.NANOSECOND_MAGIC, 2, 4, 0, 0, 65535, 220
+            )
+            + struct.pack(">IIII", 1, 500_000_000, 3, 3)
+            + b"abc"
+        )
+        stream = io.BytesIO(pcap_data)
+
+        self.assertTrue(usbmon.pcap.is_pcap_stream(stream))
+        (record,) = usbmon.pcap.read_records(stream)
+
+        self.assertEqual(record.endianness, ">")
+        self.assertEqual(record.link_type, 220)
+        self.assertAlmostEqual(record.timestamp, 1.5)
+        self.assertEqual(bytes(record.packet_data), b"abc")
+
+    def test_truncated(self):
+        pcap_data = struct.pack(
+            "<IHHiIII", usbmon.pcap.MICROSECOND_MAGIC, 2, 4, 0, 0, 65535, 220
+        ) + struct.pack("<IIII", 1, 0, 64, 64)
+
+        with self.assertRaises(ValueError):
+            list(usbmon.pcap.read_records(io.BytesIO(pcap_data)))
+        with self.assertRaises(ValueError):
+            list(usbmon.pcap.read_records(io.BytesIO(pcap_data + b"\0" * 65), True))
+
+    def test_headers_only(self):
+        path = os.path.join(_TESTDATA_PATH, "test1.pcap")
+        expected = [str(packet) for packet in usbmon.pcapng.parse_file(path)]
+        pcap_data = _convert_to_pcap(path, usbmon.pcap.MICROSECOND_MAGIC, 6)
+
+        session = usbmon.pcapng.parse_stream(io.BytesIO(pcap_data), headers_only=True)
+
+        self.assertEqual([str(packet) for packet in session], expected)
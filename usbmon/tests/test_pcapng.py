@@ -18,7 +18,9 @@
 # SPDX-License-Identifier: Apache-2.0
 """Tests for usbmon.pcapng."""
 
+import io
 import os
+from unittest import mock
 
 from absl.testing import absltest
 
@@ -31,6 +33,9 @@ class PcapTest(absltest.TestCase):
         self._test1_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)), "../../testdata/test1.pcap"
         )
+        self._usbpcap1_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "../../testdata/usbpcap1.pcap"
+        )
 
     def test_parse_file(self):
         session = usbmon.pcapng.parse_file(self._test1_path)
@@ -47,3 +52,44 @@ class PcapTest(absltest.TestCase):
         with open(self._test1_path, "rb") as test1_file:
             session = usbmon.pcapng.parse_stream(test1_file)
             self.assertLen(list(session), 16)
+
+    def test_parse_stream_unmapped(self):
+        with open(self._test1_path, "rb") as test1_file:
+            stream = io.BufferedReader(io.BytesIO(test1_file.read()))
+
+        session = usbmon.pcapng.parse_stream(stream)
+        self.assertLen(list(session), 16)
+
+    def test_parse_stream_headers_only(self):
+        for path in (self._test1_path, self._usbpcap1_path):
+            with self.subTest(path=os.path.basename(path)):
+                with open(path, "rb") as capture_file:
+                    stream = io.BytesIO(capture_file.read())
+                expected = [str(packet) for packet in usbmon.pcapng.parse_file(path)]
+
+                session = usbmon.pcapng.parse_stream(stream, headers_only=True)
+
+                self.assertEqual([str(packet) for packet in session], expected)
+
+    def test_native_matches_pcapng(self):
+        for path in (self._test1_path, self._usbpcap1_path):
+            with self.subTest(path=os.path.basename(path)):
+                native = usbmon.pcapng.parse_file(path)
+                fallback = usbmon.pcapng.parse_file(path, native=False)
+
+                self.assertEqual(
+                    [str(native_packet) for native_packet in native],
+                    [str(fallback_packet) for fallback_packet in fallback],
+                )
+
+    @mock.patch.object(usbmon.pcapng, "_MINIMUM_CHUNK_SIZE", 512)
+    def test_parse_file_jobs(self):
+        for path in (self._test1_path, self._usbpcap1_path):
+            with self.subTest(path=os.path.basename(path)):
+                serial = usbmon.pcapng.parse_file(path)
+                parallel = usbmon.pcapng.parse_file(path, jobs=2)
+
+                self.assertEqual(
+                    [str(pair) for pair in parallel.in_pairs()],
+                    [str(pair) for pair in serial.in_pairs()],
+                )
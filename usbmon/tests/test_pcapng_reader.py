@@ -0,0 +1,174 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.pcapng_reader."""
+
+import io
+import struct
+
+import pcapng
+from absl.testing import absltest
+
+import usbmon.pcapng_reader
+
+
+def _block(endianness: str, block_type: int, body: bytes) -> bytes:
+    length = 12 + len(body)
+    return (
+        struct.pack(endianness + "II", block_type, length)
+        + body
+        + struct.pack(endianness + "I", length)
+    )
+
+
+def _capture(endianness: str) -> bytes:
+    section_header = _block(
+        endianness,
+        usbmon.pcapng_reader.SECTION_HEADER_BLOCK,
+        struct.pack(endianness + "IHHq", 0x1A2B3C4D, 1, 0, -1),
+    )
+    # Nanosecond resolution, through the if_tsresol option.
+    interface = _block(
+        endianness,
+        usbmon.pcapng_reader.INTERFACE_DESCRIPTION_BLOCK,
+        struct.pack(endianness + "HHIHHB3xHH", 220, 0, 0, 9, 1, 9, 0, 0),
+    )
+    # An Interface Statistics Block, which should be skipped.
+    statistics = _block(endianness, 5, struct.pack(endianness + "III", 0, 0, 0))
+    packet = _block(
+        endianness,
+        usbmon.pcapng_reader.ENHANCED_PACKET_BLOCK,
+        struct.pack(endianness + "IIIII", 0, 0, 1_500_000_000, 3, 3) + b"abc\x00",
+    )
+    return section_header + interface + statistics + packet
+
+
+class PcapngReaderTest(absltest.TestCase):
+    def test_read_buffer(self):
+        for endianness in ("<", ">"):
+            with self.subTest(endianness=endianness):
+                interface, packet = usbmon.pcapng_reader.read_buffer(
+                    _capture(endianness)
+                )
+
+                self.assertEqual(interface, usbmon.pcapng_reader.Interface(220, 10, 9))
+                self.assertEqual(packet.endianness, endianness)
+                self.assertEqual(packet.link_type, 220)
+                self.assertAlmostEqual(packet.timestamp, 1.5)
+                self.assertEqual(packet.timestamp_ns, 1_500_000_000)
+                self.assertEqual(bytes(packet.packet_data), b"abc")
+
+    def test_to_nanoseconds(self):
+        for interface, units, expected in (
+            (usbmon.pcapng_reader.Interface(220), 1_580_243_827_456_221, None),
+            (usbmon.pcapng_reader.Interface(220, 10, 9), 7, 7),
+            (usbmon.pcapng_reader.Interface(220, 10, 12), 7_999, 7),
+            (usbmon.pcapng_reader.Interface(220, 2, 10), 512, 500_000_000),
+        ):
+            with self.subTest(interface=interface):
+                if expected is None:
+                    expected = units * 1000
+                self.assertEqual(interface.to_nanoseconds(units), expected)
+
+    def test_timestamp_ns_python_pcapng(self):
+        stream = io.BytesIO(_capture("<"))
+        scanned_packets = [
+            block
+            for block in pcapng.FileScanner(stream)
+            if isinstance(block, pcapng.blocks.EnhancedPacket)
+        ]
+
+        self.assertLen(scanned_packets, 1)
+        self.assertEqual(
+            usbmon.pcapng_reader.timestamp_ns(scanned_packets[0]), 1_500_000_000
+        )
+
+    def test_read_stream(self):
+        stream = io.BytesIO(_capture(">"))
+
+        blocks = list(usbmon.pcapng_reader.read_stream(stream))
+
+        self.assertLen(blocks, 2)
+        self.assertEqual(bytes(blocks[1].packet_data), b"abc")
+
+    def test_read_stream_headers_only(self):
+        data = bytes(range(100))
+        capture = _capture("<") + _block(
+            "<",
+            usbmon.pcapng_reader.ENHANCED_PACKET_BLOCK,
+            struct.pack("<IIIII", 0, 0, 0, len(data), len(data)) + data,
+        )
+
+        blocks = list(
+            usbmon.pcapng_reader.read_stream(io.BytesIO(capture), headers_only=True)
+        )
+
+        self.assertLen(blocks, 3)
+        short_packet, long_packet = blocks[1:]
+        self.assertEqual(bytes(short_packet.packet_data), b"abc")
+        self.assertIsNone(short_packet.data_ref)
+        self.assertEqual(bytes(long_packet.packet_data), data[:64])
+        self.assertEqual(long_packet.data_ref.read(), data)
+        self.assertEqual(long_packet.data_ref.read(90), data[90:])
+
+    def test_truncated(self):
+        truncated = _capture("<")[:-2]
+
+        with self.assertRaises(ValueError):
+            list(usbmon.pcapng_reader.read_buffer(truncated))
+        with self.assertRaises(ValueError):
+            list(usbmon.pcapng_reader.read_stream(io.BytesIO(truncated)))
+        with self.assertRaises(ValueError):
+            list(
+                usbmon.pcapng_reader.read_stream(
+                    io.BytesIO(truncated), headers_only=True
+                )
+            )
+
+    def test_missing_section_header(self):
+        with self.assertRaises(ValueError):
+            list(usbmon.pcapng_reader.read_buffer(_capture("<")[28:]))
+
+    def test_split_buffer(self):
+        capture = _capture("<") * 3
+
+        chunks = usbmon.pcapng_reader.split_buffer(capture, 1)
+        self.assertLen(chunks, 12)
+
+        index = [
+            entry
+            for chunk in chunks
+            for entry in usbmon.pcapng_reader.index_chunk(capture, chunk)
+        ]
+        packets = [
+            block
+            for block in usbmon.pcapng_reader.read_buffer(capture)
+            if isinstance(block, usbmon.pcapng_reader.EnhancedPacket)
+        ]
+        runs = [
+            entry
+            for entry in index
+            if isinstance(entry, usbmon.pcapng_reader.PacketRun)
+        ]
+        self.assertLen(runs, 3)
+        for run, packet in zip(runs, packets):
+            (offset,) = run.data_offsets
+            (length,) = run.data_lengths
+            end = offset + length
+            self.assertEqual(capture[offset:end], packet.packet_data)
+            self.assertEqual(list(run.timestamp_units), [packet.timestamp_units])
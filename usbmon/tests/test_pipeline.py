@@ -0,0 +1,101 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.pipeline."""
+
+import io
+import os
+import threading
+
+from absl.testing import absltest
+
+import usbmon.addresses
+import usbmon.filters
+import usbmon.pcapng
+import usbmon.pipeline
+
+_TESTDATA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../testdata"
+)
+
+
+def _read(filename):
+    with open(os.path.join(_TESTDATA_PATH, filename), "rb") as capture_file:
+        return capture_file.read()
+
+
+class PipelineTest(absltest.TestCase):
+    def test_read_packets(self):
+        for filename in ("test1.pcap", "usbpcap1.pcap"):
+            data = _read(filename)
+            expected = [
+                str(packet) for packet in usbmon.pcapng.read_packets(io.BytesIO(data))
+            ]
+            for chunk_size in (1, 100, usbmon.pipeline.DEFAULT_CHUNK_SIZE):
+                with self.subTest(filename=filename, chunk_size=chunk_size):
+                    packet_pipeline = usbmon.pcapng.read_packets_pipelined(
+                        io.BytesIO(data), chunk_size=chunk_size, queue_size=1
+                    )
+
+                    self.assertEqual(
+                        [str(packet) for packet in packet_pipeline], expected
+                    )
+                    reader, decoder, consumer = packet_pipeline.counters
+                    self.assertEqual(reader.bytes, len(data))
+                    self.assertEqual(decoder.items, len(expected))
+                    self.assertEqual(consumer.items, len(expected))
+
+    def test_parse_stream(self):
+        data = _read("test1.pcap")
+        packet_filter = usbmon.filters.PacketFilter.from_address(
+            usbmon.addresses.DeviceAddress(1, 1)
+        )
+
+        session = usbmon.pcapng.parse_stream(
+            io.BytesIO(data), packet_filter=packet_filter, pipelined=True
+        )
+
+        expected = usbmon.pcapng.parse_stream(
+            io.BytesIO(data), packet_filter=packet_filter
+        )
+        self.assertNotEmpty(list(expected))
+        self.assertEqual(
+            [str(packet) for packet in session], [str(packet) for packet in expected]
+        )
+
+    def test_stop_early(self):
+        data = _read("usbpcap1.pcap")
+        packet_pipeline = usbmon.pcapng.read_packets_pipelined(
+            io.BytesIO(data), chunk_size=64, queue_size=1
+        )
+
+        with packet_pipeline:
+            for _ in packet_pipeline:
+                break
+
+        self.assertEmpty(
+            [
+                thread
+                for thread in threading.enumerate()
+                if thread.name.startswith("usbmon-pipeline-")
+            ]
+        )
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            list(usbmon.pcapng.read_packets_pipelined(io.BytesIO(b"\0" * 64)))
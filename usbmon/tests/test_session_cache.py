@@ -0,0 +1,192 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.session_cache."""
+
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+
+import usbmon.addresses
+import usbmon.pcapng
+import usbmon.pcapng_reader
+import usbmon.session_cache
+
+_TESTDATA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../testdata"
+)
+
+
+def _dump(session):
+    device_addresses = sorted(
+        {first.address.device_address for first, _ in session.in_pairs()}
+    )
+    return (
+        [str(packet) for packet in session]
+        + [(first.tag, second and second.tag) for first, second in session.in_pairs()]
+        + [str(packet) for packet in session.between(None, None)]
+        + [
+            (
+                str(device_address),
+                [
+                    (first.tag, second and second.tag)
+                    for first, second in session.pairs_for(device_address)
+                ],
+            )
+            for device_address in device_addresses
+        ]
+    )
+
+
+class SessionCacheTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._temp_dir = temp_dir.name
+        self._cache_dir = os.path.join(temp_dir.name, "cache")
+
+    def _entries(self):
+        return os.listdir(self._cache_dir)
+
+    def test_parse_file(self):
+        for filename in ("test1.pcap", "usbpcap1.pcap"):
+            path = os.path.join(_TESTDATA_PATH, filename)
+            for retag_urbs in (True, False):
+                with self.subTest(filename=filename, retag_urbs=retag_urbs):
+                    expected = _dump(usbmon.pcapng.parse_file(path, retag_urbs))
+
+                    cold_session = usbmon.pcapng.parse_file(
+                        path, retag_urbs, cache_dir=self._cache_dir
+                    )
+                    with mock.patch.object(
+                        usbmon.session_cache.CachedSession,
+                        "_add_records",
+                        side_effect=AssertionError("Entry not used"),
+                    ):
+                        warm_session = usbmon.pcapng.parse_file(
+                            path, retag_urbs, cache_dir=self._cache_dir
+                        )
+
+                    self.assertEqual(_dump(cold_session), expected)
+                    self.assertEqual(_dump(warm_session), expected)
+
+        # One entry per capture and options.
+        self.assertLen(self._entries(), 4)
+
+    def test_extend(self):
+        with open(os.path.join(_TESTDATA_PATH, "test1.pcap"), "rb") as capture_file:
+            capture = capture_file.read()
+        expected = _dump(usbmon.pcapng.parse_bytes(capture))
+        # Split the capture at a block boundary, about half way through.
+        split = usbmon.pcapng_reader.split_buffer(capture, len(capture) // 2)[0].end
+
+        path = os.path.join(self._temp_dir, "growing.pcap")
+        with open(path, "wb") as capture_file:
+            capture_file.write(capture[:split])
+        with mock.patch.object(usbmon.session_cache, "_KEY_PREFIX_SIZE", 256):
+            usbmon.pcapng.parse_file(path, cache_dir=self._cache_dir)
+            with open(path, "ab") as capture_file:
+                capture_file.write(capture[split:])
+
+            extended_session = usbmon.pcapng.parse_file(path, cache_dir=self._cache_dir)
+            warm_session = usbmon.pcapng.parse_file(path, cache_dir=self._cache_dir)
+
+        self.assertEqual(_dump(extended_session), expected)
+        self.assertEqual(_dump(warm_session), expected)
+        self.assertLen(self._entries(), 1)
+
+    def test_changed_capture(self):
+        with open(os.path.join(_TESTDATA_PATH, "usbpcap1.pcap"), "rb") as capture_file:
+            capture = capture_file.read()
+        path = os.path.join(self._temp_dir, "changed.pcap")
+        with open(path, "wb") as capture_file:
+            capture_file.write(capture)
+        usbmon.pcapng.parse_file(path, cache_dir=self._cache_dir)
+
+        # Change the last byte of data of the last packet, past the prefix the
+        # entry is keyed by.
+        (chunk,) = usbmon.pcapng_reader.split_buffer(capture, len(capture))
+        *_, last_run = usbmon.pcapng_reader.index_chunk(capture, chunk)
+        changed_offset = last_run.data_offsets[-1] + last_run.data_lengths[-1] - 1
+        changed = bytearray(capture)
+        changed[changed_offset] ^= 0xFF
+        with open(path, "wb") as capture_file:
+            capture_file.write(changed)
+        os.utime(path, ns=(0, 0))
+
+        session = usbmon.pcapng.parse_file(path, cache_dir=self._cache_dir)
+
+        self.assertEqual(
+            _dump(session), _dump(usbmon.pcapng.parse_bytes(bytes(changed)))
+        )
+        self.assertNotEqual(_dump(session), _dump(usbmon.pcapng.parse_bytes(capture)))
+
+    def test_touched_capture(self):
+        with open(os.path.join(_TESTDATA_PATH, "test1.pcap"), "rb") as capture_file:
+            capture = capture_file.read()
+        expected = _dump(usbmon.pcapng.parse_bytes(capture))
+        path = os.path.join(self._temp_dir, "touched.pcap")
+        with open(path, "wb") as capture_file:
+            capture_file.write(capture)
+        cold_session = usbmon.pcapng.parse_file(path, cache_dir=self._cache_dir)
+        (entry_name,) = self._entries()
+        entry_path = os.path.join(self._cache_dir, entry_name)
+        cold_inode = os.stat(entry_path).st_ino
+
+        # Same content, new modification time: the entry is rewritten with it.
+        os.utime(path, ns=(0, 0))
+        refreshed_session = usbmon.pcapng.parse_file(path, cache_dir=self._cache_dir)
+        with mock.patch.object(
+            usbmon.session_cache,
+            "_update_digest",
+            side_effect=AssertionError("Capture digested again"),
+        ):
+            warm_session = usbmon.pcapng.parse_file(path, cache_dir=self._cache_dir)
+
+        # The entry is replaced rather than written to, as it is still mapped.
+        self.assertNotEqual(os.stat(entry_path).st_ino, cold_inode)
+        self.assertEqual(self._entries(), [entry_name])
+        self.assertEqual(_dump(cold_session), expected)
+        self.assertEqual(_dump(refreshed_session), expected)
+        self.assertEqual(_dump(warm_session), expected)
+
+    def test_eviction(self):
+        for filename in ("test1.pcap", "usbpcap1.pcap"):
+            with open(os.path.join(_TESTDATA_PATH, filename), "rb") as capture_file:
+                usbmon.session_cache.parse_stream(
+                    capture_file, self._cache_dir, max_size=1
+                )
+
+        # Only the most recent entry is kept, even though it is too big.
+        (entry,) = self._entries()
+        with open(os.path.join(_TESTDATA_PATH, "usbpcap1.pcap"), "rb") as capture_file:
+            expected_path = usbmon.session_cache._entry_path(
+                self._cache_dir, memoryview(capture_file.read()), True
+            )
+        self.assertEqual(os.path.join(self._cache_dir, entry), expected_path)
+
+    def test_filtered(self):
+        with self.assertRaises(ValueError):
+            usbmon.pcapng.parse_file(
+                os.path.join(_TESTDATA_PATH, "test1.pcap"),
+                address=usbmon.addresses.DeviceAddress(1, 2),
+                cache_dir=self._cache_dir,
+            )
@@ -39,3 +39,37 @@ class SetupTest(absltest.TestCase):
         )
 
         self.assertEqual(setup.direction, usbmon.setup.Direction.DEVICE_TO_HOST)
+
+    def test_bit_fields(self):
+        setup = usbmon.setup.SetupPacket(b"\x41\x01\x02\x03\x04\x05\x06\x07")
+
+        self.assertEqual(setup.request_type, 0x41)
+        self.assertEqual(setup.direction, usbmon.setup.Direction.HOST_TO_DEVICE)
+        self.assertEqual(setup.type, usbmon.setup.Type.VENDOR)
+        self.assertEqual(setup.recipient, usbmon.setup.Recipient.INTERFACE)
+        self.assertIsNone(setup.standard_request)
+        self.assertEqual(setup.request, 0x01)
+        self.assertEqual(setup.value, 0x0302)
+        self.assertEqual(setup.index, 0x0504)
+        self.assertEqual(setup.length, 0x0706)
+
+    def test_reserved_recipient(self):
+        setup = usbmon.setup.SetupPacket(b"\xbf\x00\x00\x00\x00\x00\x00\x00")
+
+        self.assertEqual(setup.type, usbmon.setup.Type.CLASS)
+        self.assertEqual(setup.recipient, usbmon.setup.Recipient.RESERVED)
+
+    def test_parse_shares_instances(self):
+        setup = usbmon.setup.parse(setup_packet)
+
+        self.assertIs(usbmon.setup.parse(bytes(setup_packet)), setup)
+        self.assertEqual(str(setup), "s 80 06 0100 0000 0028")
+
+    def test_read_only(self):
+        setup = usbmon.setup.parse(setup_packet)
+
+        with self.assertRaises(AttributeError):
+            setup.value = 0x0200  # type: ignore
+        with self.assertRaises(AttributeError):
+            setup.new_field = 0  # type: ignore
+        self.assertEqual(usbmon.setup.parse(setup_packet).value, 0x0100)
@@ -0,0 +1,131 @@
+# python
+#
+# Copyright 2026 The usbmon-tools Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-FileCopyrightText: © 2026 The usbmon-tools Authors
+# SPDX-License-Identifier: Apache-2.0
+"""Tests for usbmon.tail."""
+
+import io
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from absl.testing import absltest
+
+import usbmon.capture_session
+import usbmon.pcapng
+import usbmon.tail
+
+_TESTDATA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../../testdata"
+)
+
+
+def _stream_pairs(packets):
+    session = usbmon.capture_session.Session(retag_urbs=False)
+    return [(str(first), str(second)) for first, second in session.stream(packets)]
+
+
+class FollowedStreamTest(absltest.TestCase):
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self._path = os.path.join(temp_dir.name, "growing.pcap")
+
+    def _follow(self, capture, piece_size):
+        """Stream the pairs of a capture, while it is being written."""
+        with open(self._path, "wb"):
+            pass
+
+        def write():
+            with open(self._path, "ab") as capture_file:
+                for offset in range(0, len(capture), piece_size):
+                    piece_end = offset + piece_size
+                    capture_file.write(capture[offset:piece_end])
+                    capture_file.flush()
+                    time.sleep(0.001)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            with open(self._path, "rb") as capture_file:
+                followed = usbmon.tail.FollowedStream(
+                    capture_file, poll_interval=0.05, idle_timeout=0.3
+                )
+                return _stream_pairs(usbmon.pcapng.read_packets(followed, follow=True))
+        finally:
+            writer.join()
+
+    def test_follow(self):
+        for filename in ("test1.pcap", "usbpcap1.pcap"):
+            with self.subTest(filename=filename):
+                with open(os.path.join(_TESTDATA_PATH, filename), "rb") as capture:
+                    data = capture.read()
+                expected = _stream_pairs(usbmon.pcapng.read_packets(io.BytesIO(data)))
+
+                # Pieces that split blocks at arbitrary offsets.
+                self.assertEqual(self._follow(data, 777), expected)
+
+    def test_follow_polling(self):
+        with open(os.path.join(_TESTDATA_PATH, "test1.pcap"), "rb") as capture:
+            data = capture.read()
+        expected = _stream_pairs(usbmon.pcapng.read_packets(io.BytesIO(data)))
+
+        with mock.patch.object(
+            usbmon.tail, "_InotifyWatcher", side_effect=OSError("unavailable")
+        ):
+            pairs = self._follow(data, 100)
+
+        self.assertEqual(pairs, expected)
+
+    def _stop(self):
+        """Read from an idle file, until another thread stops following it."""
+        with open(self._path, "wb"):
+            pass
+
+        with open(self._path, "rb") as capture_file:
+            followed = usbmon.tail.FollowedStream(capture_file, poll_interval=60)
+            stopper = threading.Timer(0.1, followed.stop)
+            stopper.start()
+            started = time.monotonic()
+            data = followed.read(10)
+            stopper.join()
+
+        self.assertEqual(data, b"")
+        self.assertLess(time.monotonic() - started, 30)
+
+    def test_stop(self):
+        self._stop()
+
+    def test_stop_polling(self):
+        with mock.patch.object(
+            usbmon.tail, "_InotifyWatcher", side_effect=OSError("unavailable")
+        ):
+            self._stop()
+
+    def test_truncated(self):
+        with open(os.path.join(_TESTDATA_PATH, "test1.pcap"), "rb") as capture:
+            data = capture.read()
+        with open(self._path, "wb") as capture_file:
+            capture_file.write(data[:-10])
+
+        with open(self._path, "rb") as capture_file:
+            followed = usbmon.tail.FollowedStream(capture_file, idle_timeout=0.1)
+            with self.assertRaisesRegex(ValueError, "Truncated"):
+                list(usbmon.pcapng.read_packets(followed))
@@ -17,14 +17,20 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import collections
+import datetime
 import sys
-from typing import BinaryIO, MutableMapping
+from typing import BinaryIO, Iterable, MutableMapping, Optional
 
 import click
 
 import usbmon
 import usbmon.addresses
+import usbmon.capture_session
+import usbmon.filters
+import usbmon.packet
 import usbmon.pcapng
+import usbmon.pipeline
+from usbmon.support import click_helpers
 
 
 @click.command()
@@ -37,34 +43,114 @@ import usbmon.pcapng
     ),
     default="",
 )
+@click.option(
+    "--max-pending-age",
+    help=(
+        "Expire URBs still waiting for their completion after this many seconds "
+        "of capture time, and report how many were stuck."
+    ),
+    type=click.FloatRange(min=0),
+)
+@click_helpers.filter_option
+@click_helpers.follow_option
+@click_helpers.pipelined_option
+@click_helpers.cache_dir_option
 @click.argument(
     "pcap-file",
-    type=click.File(mode="rb"),
+    type=click_helpers.CaptureFileType(),
     required=True,
 )
-def main(*, address_prefix: str, pcap_file: BinaryIO) -> None:
+def main(
+    *,
+    address_prefix: str,
+    max_pending_age: Optional[float],
+    filter_expression: Optional[usbmon.filters.FilterExpression],
+    follow: bool,
+    pipelined: bool,
+    cache_dir: Optional[str],
+    pcap_file: BinaryIO,
+) -> None:
     if sys.version_info < (3, 7):
         raise Exception("Unsupported Python version, please use at least Python 3.7.")
+    if cache_dir is not None and max_pending_age is not None:
+        raise click.UsageError("--cache-dir cannot be used with --max-pending-age.")
+    if cache_dir is not None and follow:
+        raise click.UsageError("--cache-dir cannot be used with --follow.")
+    if cache_dir is not None and pipelined:
+        raise click.UsageError("--cache-dir cannot be used with --pipelined.")
+    if follow and pipelined:
+        raise click.UsageError("--follow cannot be used with --pipelined.")
 
     direction_counter: MutableMapping[
         usbmon.constants.Direction, int
     ] = collections.Counter()
-    addresses_counter: MutableMapping[
-        usbmon.addresses.EndpointAddress, int
-    ] = collections.Counter()
+    # Keyed by packed address, see usbmon.addresses.pack().
+    addresses_counter: MutableMapping[int, int] = collections.Counter()
     xfer_type_counter: MutableMapping[
         usbmon.constants.XferType, int
     ] = collections.Counter()
 
-    session = usbmon.pcapng.parse_stream(pcap_file, retag_urbs=True)
-
-    for packet in session:
-        if not str(packet.address).startswith(address_prefix):
-            continue
-
-        direction_counter[packet.direction] += 1
-        addresses_counter[packet.address] += 1
-        xfer_type_counter[packet.xfer_type] += 1
+    session: usbmon.capture_session.Session
+    cached_filter: Optional[usbmon.filters.FilterExpression] = None
+    packet_pipeline: Optional[usbmon.pipeline.Pipeline[usbmon.packet.Packet]] = None
+    pairs: Iterable[usbmon.packet.PacketPair]
+    if cache_dir is not None:
+        session = usbmon.pcapng.parse_stream(
+            pcap_file, retag_urbs=True, cache_dir=cache_dir
+        )
+        pairs = session.in_pairs()
+        # The cached session holds the whole capture, which is filtered below.
+        cached_filter = filter_expression
+    else:
+        session = usbmon.capture_session.Session(
+            retag_urbs=True,
+            max_pending_age=(
+                datetime.timedelta(seconds=max_pending_age)
+                if max_pending_age is not None
+                else None
+            ),
+        )
+        packet_filter = (
+            usbmon.filters.PacketFilter(expression=filter_expression)
+            if filter_expression is not None
+            else None
+        )
+        packets: Iterable[usbmon.packet.Packet]
+        if pipelined:
+            packet_pipeline = usbmon.pcapng.read_packets_pipelined(
+                pcap_file, packet_filter=packet_filter
+            )
+            packets = packet_pipeline
+        else:
+            # Only the descriptors' payloads are looked at, and read back.
+            packets = usbmon.pcapng.read_packets(
+                pcap_file,
+                packet_filter=packet_filter,
+                follow=follow,
+                headers_only=True,
+            )
+        pairs = session.stream(packets)
+
+    matches_prefix = usbmon.addresses.prefix_matcher(address_prefix)
+    try:
+        for pair in pairs:
+            for packet in pair:
+                if packet is None:
+                    continue
+                address_key = packet.address_key
+                if not matches_prefix(address_key):
+                    continue
+                if cached_filter is not None and not cached_filter.matches(packet):
+                    continue
+
+                direction_counter[packet.direction] += 1
+                addresses_counter[address_key] += 1
+                xfer_type_counter[packet.xfer_type] += 1
+    except KeyboardInterrupt:
+        # Following a capture only stops when interrupted, which reports the
+        # statistics collected so far.
+        if not follow:
+            raise
 
     print("Identified descriptors:")
 
@@ -81,13 +167,25 @@ def main(*, address_prefix: str, pcap_file: BinaryIO) -> None:
         print(f"  {direction!s}: {count}")
 
     print(" Per address:")
-    for endpoint_address, count in addresses_counter.items():
-        print(f"  {endpoint_address!s}: {count}")
+    for address_key, count in addresses_counter.items():
+        print(f"  {usbmon.addresses.endpoint_from_key(address_key)!s}: {count}")
 
     print(" Per transfer type:")
     for xfertype, count in xfer_type_counter.items():
         print(f"  {xfertype!s}: {count}")
 
+    if max_pending_age is not None:
+        print()
+        print("Pending URBs:")
+        print(f" Expired: {session.expired_count}")
+        print(f" Stuck: {session.stuck_count}")
+
+    if packet_pipeline is not None:
+        print()
+        print("Pipeline stages:")
+        for counters in packet_pipeline.counters:
+            print(f" {counters}")
+
 
 if __name__ == "__main__":
     main()
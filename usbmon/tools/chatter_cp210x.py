@@ -27,6 +27,7 @@ import usbmon
 import usbmon.addresses
 import usbmon.chatter
 import usbmon.constants
+import usbmon.filters
 import usbmon.pcapng
 from usbmon.support import click_helpers, cp210x, extractors
 
@@ -51,24 +52,43 @@ CP210X_XFER_TYPES = (
         " wire setup control commands will be printed."
     ),
 )
+@click_helpers.filter_option
+@click_helpers.cache_dir_option
 @click.argument(
     "pcap-file",
-    type=click.File(mode="rb"),
+    type=click_helpers.CaptureFileType(),
     required=True,
 )
 def main(
     *,
     device_address: Optional[usbmon.addresses.DeviceAddress],
     all_controls: bool,
+    filter_expression: Optional[usbmon.filters.FilterExpression],
+    cache_dir: Optional[str],
     pcap_file: BinaryIO,
 ) -> int:
     if sys.version_info < (3, 7):
         raise Exception("Unsupported Python version, please use at least Python 3.7.")
+    if cache_dir is not None and filter_expression is not None:
+        raise click.UsageError("--cache-dir cannot be used with --filter.")
 
     direction: Optional[usbmon.constants.Direction] = None
     reconstructed_packet: bytes = b""
 
-    session = usbmon.pcapng.parse_stream(pcap_file, retag_urbs=True)
+    session = usbmon.pcapng.parse_stream(
+        pcap_file,
+        retag_urbs=True,
+        # The cached session holds the whole capture, which is filtered below.
+        packet_filter=(
+            usbmon.filters.PacketFilter.from_address(
+                device_address, expression=filter_expression
+            )
+            if cache_dir is None
+            and (device_address is not None or filter_expression is not None)
+            else None
+        ),
+        cache_dir=cache_dir,
+    )
 
     try:
         device_address = extractors.find_device_in_session(
@@ -80,7 +100,7 @@ def main(
     except extractors.DeviceSearchError as e:
         raise click.UsageError(str(e)) from e
 
-    for pair in session.in_pairs():
+    for pair in session.pairs_for(device_address):
         submission = usbmon.packet.get_submission(pair)
         callback = usbmon.packet.get_callback(pair)
 
@@ -91,10 +111,6 @@ def main(
             logging.debug(f"Ignoring singleton packet: {pair[0].tag}")
             continue
 
-        if submission.address.device_address != device_address:
-            # No need to check second, they will be linked.
-            continue
-
         if submission.xfer_type == usbmon.constants.XferType.BULK:
             if submission.direction != direction and reconstructed_packet:
                 assert direction is not None
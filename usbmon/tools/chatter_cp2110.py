@@ -26,6 +26,7 @@ import click
 import usbmon
 import usbmon.addresses
 import usbmon.chatter
+import usbmon.filters
 import usbmon.pcapng
 import usbmon.support.hid
 from usbmon.support import click_helpers, cp2110, extractors
@@ -37,13 +38,17 @@ from usbmon.support import click_helpers, cp2110, extractors
     help="USB address of the CP2110 device to extract chatter of.",
     type=click_helpers.DeviceAddressType(),
 )
+@click_helpers.filter_option
 @click.argument(
     "pcap-file",
-    type=click.File(mode="rb"),
+    type=click_helpers.CaptureFileType(),
     required=True,
 )
 def main(
-    *, device_address: Optional[usbmon.addresses.DeviceAddress], pcap_file: BinaryIO
+    *,
+    device_address: Optional[usbmon.addresses.DeviceAddress],
+    filter_expression: Optional[usbmon.filters.FilterExpression],
+    pcap_file: BinaryIO,
 ) -> int:
     if sys.version_info < (3, 7):
         raise Exception("Unsupported Python version, please use at least Python 3.7.")
@@ -51,7 +56,17 @@ def main(
     direction: Optional[usbmon.constants.Direction] = None
     reconstructed_packet: bytes = b""
 
-    session = usbmon.pcapng.parse_stream(pcap_file, retag_urbs=True)
+    session = usbmon.pcapng.parse_stream(
+        pcap_file,
+        retag_urbs=True,
+        packet_filter=(
+            usbmon.filters.PacketFilter.from_address(
+                device_address, expression=filter_expression
+            )
+            if device_address is not None or filter_expression is not None
+            else None
+        ),
+    )
 
     try:
         device_address = extractors.find_device_in_session(
@@ -18,12 +18,15 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import sys
-from typing import BinaryIO
+from typing import BinaryIO, Iterable, Optional
 
 import click
 
 import usbmon
 import usbmon.addresses
+import usbmon.capture_session
+import usbmon.filters
+import usbmon.packet
 import usbmon.pcapng
 import usbmon.support.hid
 from usbmon.support import click_helpers
@@ -36,20 +39,48 @@ from usbmon.support import click_helpers
     type=click_helpers.DeviceAddressType(),
     required=True,
 )
+@click_helpers.filter_option
+@click_helpers.follow_option
+@click_helpers.cache_dir_option
 @click.argument(
     "pcap-file",
-    type=click.File(mode="rb"),
+    type=click_helpers.CaptureFileType(),
     required=True,
 )
 def main(
-    *, device_address: usbmon.addresses.DeviceAddress, pcap_file: BinaryIO
+    *,
+    device_address: usbmon.addresses.DeviceAddress,
+    filter_expression: Optional[usbmon.filters.FilterExpression],
+    follow: bool,
+    cache_dir: Optional[str],
+    pcap_file: BinaryIO,
 ) -> None:
     if sys.version_info < (3, 7):
         raise Exception("Unsupported Python version, please use at least Python 3.7.")
+    if cache_dir is not None and filter_expression is not None:
+        raise click.UsageError("--cache-dir cannot be used with --filter.")
+    if cache_dir is not None and follow:
+        raise click.UsageError("--cache-dir cannot be used with --follow.")
 
-    session = usbmon.pcapng.parse_stream(pcap_file, retag_urbs=True)
-    for packet in usbmon.support.hid.select(session, device_address=device_address):
-        print(usbmon.support.hid.dump_packet(packet), "\n")
+    pairs: Iterable[usbmon.packet.PacketPair]
+    if cache_dir is not None:
+        # The cached session holds the whole capture, select_pairs() filters it.
+        pairs = usbmon.pcapng.parse_stream(
+            pcap_file, retag_urbs=True, cache_dir=cache_dir
+        ).in_pairs()
+    else:
+        session = usbmon.capture_session.Session(retag_urbs=True)
+        pairs = session.stream(
+            usbmon.pcapng.read_packets(
+                pcap_file,
+                packet_filter=usbmon.filters.PacketFilter.from_address(
+                    device_address, expression=filter_expression
+                ),
+                follow=follow,
+            )
+        )
+    for packet in usbmon.support.hid.select_pairs(pairs, device_address=device_address):
+        print(usbmon.support.hid.dump_packet(packet), "\n", flush=follow)
 
 
 if __name__ == "__main__":
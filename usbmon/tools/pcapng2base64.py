@@ -16,26 +16,23 @@
 #
 # SPDX-FileCopyrightText: © 2019 The usbmon-tools Authors
 # SPDX-License-Identifier: Apache-2.0
-"""Extract the packets from a pcapng capture in base64 format."""
+"""Extract the packets from a pcapng (or libpcap) capture in base64 format."""
 
 import binascii
 import sys
-from typing import BinaryIO
+from typing import BinaryIO, Iterator, Optional
 
 import click
 import pcapng
 
+import usbmon.filters
+import usbmon.pcap
+from usbmon.support import click_helpers
 
-@click.command()
-@click.argument(
-    "pcap-file",
-    type=click.File(mode="rb"),
-    required=True,
-)
-def main(*, pcap_file: BinaryIO) -> None:
-    if sys.version_info < (3, 7):
-        raise Exception("Unsupported Python version, please use at least Python 3.7.")
 
+def _pcapng_payloads(
+    pcap_file: BinaryIO, filter_expression: Optional[usbmon.filters.FilterExpression]
+) -> Iterator[bytes]:
     scanner = pcapng.FileScanner(pcap_file)
     for block in scanner:
         if isinstance(block, pcapng.blocks.InterfaceDescription):
@@ -50,7 +47,49 @@ def main(*, pcap_file: BinaryIO) -> None:
         elif isinstance(block, pcapng.blocks.EnhancedPacket):
             assert block.interface_id == 0
             _, _, payload = block.packet_payload_info
-            print(binascii.b2a_base64(payload, newline=False).decode("ascii"))
+            if filter_expression is None or filter_expression.matches_usbmon(
+                block.section.endianness, payload
+            ):
+                yield payload
+
+
+def _pcap_payloads(
+    pcap_file: BinaryIO, filter_expression: Optional[usbmon.filters.FilterExpression]
+) -> Iterator[bytes]:
+    for record in usbmon.pcap.read_records(pcap_file):
+        if record.link_type != pcapng.constants.link_types.LINKTYPE_USB_LINUX_MMAPPED:
+            raise Exception(
+                f"In file {pcap_file.name}: expected USB capture, "
+                f"found link type {record.link_type}."
+            )
+        if filter_expression is None or filter_expression.matches_usbmon(
+            record.endianness, record.packet_data
+        ):
+            yield bytes(record.packet_data)
+
+
+@click.command()
+@click_helpers.filter_option
+@click.argument(
+    "pcap-file",
+    type=click_helpers.CaptureFileType(),
+    required=True,
+)
+def main(
+    *,
+    filter_expression: Optional[usbmon.filters.FilterExpression],
+    pcap_file: BinaryIO,
+) -> None:
+    if sys.version_info < (3, 7):
+        raise Exception("Unsupported Python version, please use at least Python 3.7.")
+
+    if usbmon.pcap.is_pcap_stream(pcap_file):
+        payloads = _pcap_payloads(pcap_file, filter_expression)
+    else:
+        payloads = _pcapng_payloads(pcap_file, filter_expression)
+
+    for payload in payloads:
+        print(binascii.b2a_base64(payload, newline=False).decode("ascii"))
 
 
 if __name__ == "__main__":
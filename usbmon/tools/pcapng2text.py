@@ -35,11 +35,17 @@ with a few notable changes:
 """
 
 import sys
-from typing import BinaryIO
+from typing import BinaryIO, Optional
 
 import click
 
+import usbmon.addresses
+import usbmon.capture_session
+import usbmon.filters
+import usbmon.packet
 import usbmon.pcapng
+import usbmon.pipeline
+from usbmon.support import click_helpers
 
 
 @click.command()
@@ -50,7 +56,7 @@ import usbmon.pcapng
         "Only packets with source or destination matching this prefix "
         "will be printed out."
     ),
-    required=True,
+    default="",
 )
 @click.option(
     "--retag-urbs / --no-retag-urbs",
@@ -62,21 +68,70 @@ import usbmon.pcapng
     default=True,
     show_default=True,
 )
+@click_helpers.filter_option
+@click_helpers.follow_option
+@click_helpers.pipelined_option
 @click.argument(
     "pcap-file",
-    type=click.File(mode="rb"),
+    type=click_helpers.CaptureFileType(),
     required=True,
 )
-def main(*, address_prefix: str, retag_urbs: bool, pcap_file: BinaryIO) -> None:
+def main(
+    *,
+    address_prefix: str,
+    retag_urbs: bool,
+    filter_expression: Optional[usbmon.filters.FilterExpression],
+    follow: bool,
+    pipelined: bool,
+    pcap_file: BinaryIO,
+) -> None:
     if sys.version_info < (3, 7):
         raise Exception("Unsupported Python version, please use at least Python 3.7.")
+    if follow and pipelined:
+        raise click.UsageError("--follow cannot be used with --pipelined.")
+
+    packet_filter = (
+        usbmon.filters.PacketFilter(expression=filter_expression)
+        if filter_expression is not None
+        else None
+    )
+    matches_prefix = usbmon.addresses.prefix_matcher(address_prefix)
 
-    session = usbmon.pcapng.parse_stream(pcap_file, retag_urbs=retag_urbs)
+    if follow:
+        # Packets are printed as their URB completes, rather than sorted.
+        streaming_session = usbmon.capture_session.Session(retag_urbs=retag_urbs)
+        for pair in streaming_session.stream(
+            usbmon.pcapng.read_packets(
+                pcap_file, packet_filter=packet_filter, follow=True
+            )
+        ):
+            for packet in pair:
+                if packet is not None and matches_prefix(packet.address_key):
+                    print(str(packet), flush=True)
+        return
+
+    packet_pipeline: Optional[usbmon.pipeline.Pipeline[usbmon.packet.Packet]] = None
+    if pipelined:
+        packet_pipeline = usbmon.pcapng.read_packets_pipelined(
+            pcap_file, packet_filter=packet_filter
+        )
+        session = usbmon.capture_session.Session(retag_urbs=retag_urbs)
+        for parsed_packet in packet_pipeline:
+            session.add(parsed_packet)
+    else:
+        session = usbmon.pcapng.parse_stream(
+            pcap_file, retag_urbs=retag_urbs, packet_filter=packet_filter
+        )
     for packet in session:
-        if not str(packet.address).startswith(address_prefix):
+        if not matches_prefix(packet.address_key):
             continue
         print(str(packet))
 
+    if packet_pipeline is not None:
+        # Reported separately from the converted capture.
+        for counters in packet_pipeline.counters:
+            print(counters, file=sys.stderr)
+
 
 if __name__ == "__main__":
     main()